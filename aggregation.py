@@ -0,0 +1,135 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+AGGREGATE_FIELDS = ("long_tokens", "short_tokens", "net_tokens", "long_usd", "short_usd", "net_usd", "count")
+
+
+def empty_aggregate() -> Dict:
+    """Aggregate for an asset nobody holds"""
+    return {"long_tokens": 0, "short_tokens": 0, "net_tokens": 0,
+            "long_usd": 0, "short_usd": 0, "net_usd": 0, "count": 0}
+
+
+def _extract(positions: List[Dict], prices: Dict[str, float],
+             coins: Optional[Sequence[str]] = None) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Single pass over the raw payload into (coins, trader rows, coin columns, sizes).
+
+    Only coins with a known price are kept, in order of first appearance unless `coins`
+    fixes the columns. Everything after this pass is array arithmetic.
+    """
+    discover = coins is None
+    coin_index: Dict[str, int] = {} if discover else {coin: j for j, coin in enumerate(coins)}
+    per_trader, cols, sizes = [], [], []
+    for trader_data in positions:
+        kept = 0
+        for entry in trader_data["positions"]:
+            position = entry["position"]
+            coin = position["coin"]
+            j = coin_index.get(coin)
+            if j is None:
+                if not discover or coin not in prices:
+                    continue
+                j = coin_index[coin] = len(coin_index)
+            cols.append(j)
+            sizes.append(position["szi"])
+            kept += 1
+        per_trader.append(kept)
+
+    rows = np.repeat(np.arange(len(positions), dtype=np.int64), per_trader)
+    return (list(coin_index), rows, np.array(cols, dtype=np.int64),
+            np.array(sizes, dtype=np.float64))  # numpy parses the szi strings in C
+
+
+def snapshot_to_arrays(positions: List[Dict], prices: Dict[str, float],
+                       coins: Optional[Sequence[str]] = None) -> Tuple[List[str], List[str], np.ndarray, np.ndarray]:
+    """Turn one snapshot of trader positions into arrays.
+
+    Returns (addresses, coins, sizes, price_vector) where `sizes` is a trader x coin matrix of
+    signed position sizes and `price_vector` holds the price of each coin.
+    """
+    coins, rows, cols, sizes = _extract(positions, prices, coins)
+    # bincount sums duplicate (trader, coin) entries the same way the old loop did
+    size_matrix = np.bincount(
+        rows * len(coins) + cols, weights=sizes, minlength=len(positions) * len(coins)
+    ).reshape(len(positions), len(coins))
+
+    price_vector = np.array([prices[coin] for coin in coins], dtype=np.float64)
+    addresses = [trader_data.get("address") for trader_data in positions]
+    return addresses, coins, size_matrix, price_vector
+
+
+def _totals(long_tokens: np.ndarray, short_tokens: np.ndarray, count: np.ndarray,
+            price_vector: np.ndarray) -> Dict[str, np.ndarray]:
+    long_usd = long_tokens * price_vector
+    short_usd = short_tokens * price_vector
+    return {
+        "long_tokens": long_tokens,
+        "short_tokens": short_tokens,
+        "net_tokens": long_tokens - short_tokens,
+        "long_usd": long_usd,
+        "short_usd": short_usd,
+        "net_usd": long_usd - short_usd,
+        "count": count,
+    }
+
+
+def aggregate_arrays(sizes: np.ndarray, price_vector: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-coin long/short/net tokens, USD values and holder counts from a trader x coin matrix"""
+    return _totals(np.clip(sizes, 0, None).sum(axis=0), np.clip(-sizes, 0, None).sum(axis=0),
+                   np.count_nonzero(sizes, axis=0), price_vector)
+
+
+def aggregate_all(positions: List[Dict], prices: Dict[str, float],
+                  coins: Optional[Sequence[str]] = None) -> Dict[str, Dict]:
+    """Aggregate a snapshot for every priced coin that at least one trader holds.
+
+    Works on the flat (coin, size) vectors rather than the dense matrix, so the cost is
+    proportional to the number of open positions, not traders x coins.
+    """
+    coins, _, cols, sizes = _extract(positions, prices, coins)
+    n = len(coins)
+    price_vector = np.array([prices[coin] for coin in coins], dtype=np.float64)
+    totals = _totals(
+        np.bincount(cols, weights=np.clip(sizes, 0, None), minlength=n),
+        np.bincount(cols, weights=np.clip(-sizes, 0, None), minlength=n),
+        np.bincount(cols[sizes != 0], minlength=n),
+        price_vector,
+    )
+
+    columns = {field: totals[field].tolist() for field in AGGREGATE_FIELDS}
+    return {
+        coin: {field: columns[field][j] for field in AGGREGATE_FIELDS}
+        for j, coin in enumerate(coins)
+        if columns["count"][j]
+    }
+
+
+def build_position_index(positions: List[Dict], prices: Dict[str, float]) -> Dict[str, Dict[str, Dict]]:
+    """Normalize raw clearinghouseState results into {address: {coin: position}}.
+
+    Each position carries signed `size`, `usd_value` (at the mark price when known, else the
+    reported positionValue), `entry_px` and `leverage`. Traders whose fetch failed are left
+    out rather than reported as flat.
+    """
+    index = {}
+    for trader_data in positions:
+        if not trader_data.get("ok", True):
+            continue
+        coins = {}
+        for entry in trader_data["positions"]:
+            position = entry["position"]
+            size = float(position["szi"])
+            if size == 0.0:
+                continue
+            coin = position["coin"]
+            price = prices.get(coin)
+            leverage = position.get("leverage") or {}
+            coins[coin] = {
+                "size": size,
+                "usd_value": abs(size) * price if price else float(position.get("positionValue") or 0.0),
+                "entry_px": float(position["entryPx"]) if position.get("entryPx") is not None else None,
+                "leverage": leverage.get("value") if isinstance(leverage, dict) else leverage,
+            }
+        index[trader_data["address"]] = coins
+    return index
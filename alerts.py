@@ -0,0 +1,489 @@
+"""Positioning-shift alerts evaluated on every new data point.
+
+Rules (configured in `alerts.json`, see alerts.example.json; `coin` may be "*" for every coin):
+
+- `net_usd_sigma`: the change in net_usd over `ticks` ticks is more than `sigma` standard
+  deviations away from the mean of the same change over the last `window` ticks
+- `long_short_ratio`: long_usd / short_usd crosses `threshold` ("above", "below" or "both")
+- `side_flips`: at least `min_flips` tracked traders are on the other side of a coin than
+  `ticks` ticks ago (long -> short or short -> long), ignoring positions under `min_usd`
+
+An alert fires when a rule's condition starts to hold for a coin and direction. While it keeps
+holding on later ticks nothing new is sent (dedup), and after firing the same rule, coin and
+direction stay silent for `cooldown_minutes`. Cooldowns are kept in a state file, so restarting
+the collector does not resend. Alerts are appended to a JSONL file and/or POSTed to a webhook
+from a background thread, so a slow endpoint never delays a tick.
+
+The collector evaluates the rules right after storing each data point. `python alerts.py`
+instead follows the store from another process, and `--replay` runs the rules over the stored
+history and prints what would have fired.
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from data_cache import parse_timestamp
+from position_history import PositionHistory
+from storage import DATA_DIR, SegmentStore
+
+ALERTS_CONFIG = os.environ.get("ALERTS_CONFIG", "alerts.json")
+ALERTS_FILE = "alerts.jsonl"
+STATE_FILE = "alerts_state.json"
+
+DEFAULT_CONFIG = {
+    "sinks": {"file": os.path.join(DATA_DIR, ALERTS_FILE)},
+    "rules": [
+        {"name": "btc_net_usd_1tick", "type": "net_usd_sigma", "coin": "BTC", "ticks": 1, "sigma": 4},
+        {"name": "eth_net_usd_1tick", "type": "net_usd_sigma", "coin": "ETH", "ticks": 1, "sigma": 4},
+        {"name": "net_usd_1h", "type": "net_usd_sigma", "coin": "*", "ticks": 12, "sigma": 3, "min_usd": 1_000_000},
+        {"name": "btc_net_side", "type": "long_short_ratio", "coin": "BTC", "threshold": 1.0},
+        {"name": "eth_net_side", "type": "long_short_ratio", "coin": "ETH", "threshold": 1.0},
+        {"name": "side_flips", "type": "side_flips", "coin": "*", "min_flips": 10, "ticks": 1},
+    ],
+}
+
+
+class Tick:
+    """One data point as seen by the rules, with per-coin trader sides derived once and shared"""
+
+    def __init__(self, data_point: Dict):
+        self.data_point = data_point
+        self.timestamp = str(data_point.get("timestamp"))
+        self.aggregates: Dict[str, Dict] = data_point.get("asset_positions") or {
+            "BTC": data_point.get("btc_positions") or {}, "ETH": data_point.get("eth_positions") or {}}
+        self._sides: Optional[Dict[str, Dict[str, int]]] = None
+
+    def coins(self, coin: str) -> Iterable[str]:
+        return self.aggregates.keys() if coin == "*" else (coin,)
+
+    def sides(self) -> Dict[str, Dict[str, int]]:
+        """coin -> {address: +1 long / -1 short}; tracked traders with no position are left out"""
+        if self._sides is None:
+            sides: Dict[str, Dict[str, int]] = {}
+            for address, coins in (self.data_point.get("position_index") or {}).items():
+                for coin, position in coins.items():
+                    sides.setdefault(coin, {})[address] = 1 if position["size"] > 0 else -1
+            self._sides = sides
+        return self._sides
+
+    def tracked(self) -> set:
+        """Traders whose positions were fetched this tick"""
+        return set(self.data_point.get("position_index") or ())
+
+
+class WindowStats:
+    """Mean and standard deviation of the last `size` values, updated in O(1)"""
+
+    def __init__(self, size: int):
+        self.values = deque(maxlen=size)
+        self.s = self.ss = 0.0
+        self._evictions = 0
+
+    def add(self, value: float):
+        if len(self.values) == self.values.maxlen:
+            old = self.values[0]
+            self.s -= old
+            self.ss -= old * old
+            self._evictions += 1
+        self.values.append(value)
+        self.s += value
+        self.ss += value * value
+        if self._evictions >= self.values.maxlen:
+            # Re-sum now and then so subtracting evicted values does not accumulate error
+            self.s = sum(self.values)
+            self.ss = sum(v * v for v in self.values)
+            self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def mean(self) -> float:
+        return self.s / len(self.values)
+
+    def std(self) -> float:
+        n = len(self.values)
+        return math.sqrt(max(0.0, (self.ss - self.s * self.s / n) / (n - 1))) if n > 1 else 0.0
+
+
+class Rule:
+    """Base class: `evaluate` returns the conditions holding this tick as (coin, direction, details)"""
+
+    type = ""
+
+    def __init__(self, name: str, coin: str = "BTC", cooldown_minutes: float = 60, **params):
+        self.name = name
+        self.coin = coin
+        self.cooldown_seconds = cooldown_minutes * 60
+        if params:
+            raise ValueError(f"Unknown parameter(s) for {self.type} rule {name}: {', '.join(params)}")
+
+    def evaluate(self, tick: Tick) -> List[Tuple[str, str, Dict]]:
+        raise NotImplementedError
+
+
+class NetUsdSigmaRule(Rule):
+    type = "net_usd_sigma"
+
+    def __init__(self, name: str, coin: str = "BTC", ticks: int = 1, sigma: float = 3.0, window: int = 288,
+                 min_history: int = 30, min_usd: float = 0.0, **params):
+        super().__init__(name, coin, **params)
+        self.ticks = max(1, ticks)
+        self.sigma = sigma
+        self.window = window
+        self.min_history = min_history
+        self.min_usd = min_usd  # ignore changes smaller than this, however unusual
+        self._net: Dict[str, deque] = {}
+        self._changes: Dict[str, WindowStats] = {}
+
+    def evaluate(self, tick: Tick) -> List[Tuple[str, str, Dict]]:
+        breaches = []
+        for coin in tick.coins(self.coin):
+            net_usd = (tick.aggregates.get(coin) or {}).get("net_usd")
+            if net_usd is None:
+                continue
+            history = self._net.get(coin)
+            if history is None:
+                history = self._net[coin] = deque(maxlen=self.ticks)
+                self._changes[coin] = WindowStats(self.window)
+            if len(history) == self.ticks:
+                change = net_usd - history[0]
+                stats = self._changes[coin]
+                # Judge the change against the history before it, then add it
+                if len(stats) >= self.min_history and abs(change) >= self.min_usd:
+                    mean, std = stats.mean(), stats.std()
+                    if std > 0 and abs(change - mean) > self.sigma * std:
+                        z = (change - mean) / std
+                        breaches.append((coin, "up" if z > 0 else "down", {
+                            "value": change, "z_score": z, "threshold": self.sigma,
+                            "message": f"{coin} net position {'rose' if z > 0 else 'fell'} ${abs(change):,.0f} "
+                                       f"over {self.ticks} tick(s) ({z:+.1f} sigma)",
+                        }))
+                stats.add(change)
+            history.append(net_usd)
+        return breaches
+
+
+class LongShortRatioRule(Rule):
+    type = "long_short_ratio"
+
+    def __init__(self, name: str, coin: str = "BTC", threshold: float = 1.0, direction: str = "both", **params):
+        super().__init__(name, coin, **params)
+        if direction not in ("above", "below", "both"):
+            raise ValueError(f"direction must be above, below or both, not {direction!r}")
+        self.threshold = threshold
+        self.direction = direction
+        self._previous: Dict[str, float] = {}
+
+    def evaluate(self, tick: Tick) -> List[Tuple[str, str, Dict]]:
+        breaches = []
+        for coin in tick.coins(self.coin):
+            aggregate = tick.aggregates.get(coin) or {}
+            long_usd, short_usd = aggregate.get("long_usd") or 0.0, aggregate.get("short_usd") or 0.0
+            if not long_usd and not short_usd:
+                continue
+            ratio = long_usd / short_usd if short_usd else math.inf
+            previous = self._previous.get(coin)
+            self._previous[coin] = ratio
+            if previous is None:
+                continue
+            crossed = None
+            if previous < self.threshold <= ratio and self.direction != "below":
+                crossed = "above"
+            elif previous > self.threshold >= ratio and self.direction != "above":
+                crossed = "below"
+            if crossed:
+                breaches.append((coin, crossed, {
+                    "value": ratio if math.isfinite(ratio) else None, "previous": previous if math.isfinite(previous) else None,
+                    "threshold": self.threshold,
+                    "message": f"{coin} long/short ratio crossed {crossed} {self.threshold:g} "
+                               f"({previous:.2f} -> {ratio:.2f})",
+                }))
+        return breaches
+
+
+class SideFlipRule(Rule):
+    type = "side_flips"
+
+    def __init__(self, name: str, coin: str = "BTC", min_flips: int = 10, ticks: int = 1, min_usd: float = 0.0,
+                 **params):
+        super().__init__(name, coin, **params)
+        self.min_flips = min_flips
+        self.ticks = max(1, ticks)
+        self.min_usd = min_usd
+        self._history: deque = deque(maxlen=self.ticks)  # (tracked, sides) of earlier ticks
+
+    def _sides(self, tick: Tick) -> Dict[str, Dict[str, int]]:
+        if not self.min_usd:
+            return tick.sides()
+        index = tick.data_point.get("position_index") or {}
+        return {coin: {a: s for a, s in sides.items() if index[a][coin]["usd_value"] >= self.min_usd}
+                for coin, sides in tick.sides().items()}
+
+    def evaluate(self, tick: Tick) -> List[Tuple[str, str, Dict]]:
+        tracked, sides = tick.tracked(), self._sides(tick)
+        breaches = []
+        if len(self._history) == self.ticks and tracked:
+            old_tracked, old_sides = self._history[0]
+            for coin in (sides.keys() | old_sides.keys() if self.coin == "*" else (self.coin,)):
+                now, before = sides.get(coin, {}), old_sides.get(coin, {})
+                # Only traders whose positions are known at both ticks can have flipped
+                flips = [a for a, side in now.items() if before.get(a) == -side and a in old_tracked]
+                if len(flips) < self.min_flips:
+                    continue
+                to_long = sum(1 for a in flips if now[a] > 0)
+                direction = "to_long" if to_long * 2 >= len(flips) else "to_short"
+                breaches.append((coin, direction, {
+                    "value": len(flips), "to_long": to_long, "to_short": len(flips) - to_long,
+                    "threshold": self.min_flips, "traders": sorted(flips)[:20],
+                    "message": f"{len(flips)} traders flipped {coin} over {self.ticks} tick(s) "
+                               f"({to_long} to long, {len(flips) - to_long} to short)",
+                }))
+        if tracked:
+            self._history.append((tracked, sides))
+        return breaches
+
+
+RULE_TYPES = {rule.type: rule for rule in (NetUsdSigmaRule, LongShortRatioRule, SideFlipRule)}
+
+
+def build_rules(configs: List[Dict]) -> List[Rule]:
+    rules = []
+    for config in configs:
+        config = dict(config)
+        rule_type = config.pop("type", None)
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"Unknown alert rule type {rule_type!r} (expected one of {', '.join(RULE_TYPES)})")
+        config.setdefault("name", f"{rule_type}_{len(rules)}")
+        rules.append(RULE_TYPES[rule_type](**config))
+    return rules
+
+
+# ---- sinks ------------------------------------------------------------------------------
+
+class FileSink:
+    """Appends alerts as JSON lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, alert: Dict):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(alert, default=str) + "\n")
+
+    def close(self):
+        pass
+
+
+class WebhookSink:
+    """POSTs alerts as JSON from a background thread, retrying with backoff"""
+
+    def __init__(self, url: str, timeout: float = 5.0, retries: int = 3):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.sent = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=1000)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="alert-webhook")
+        self._thread.start()
+
+    def send(self, alert: Dict):
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.failed += 1
+            print(f"⚠️ Alert webhook queue full, dropping {alert['rule']} alert")
+
+    def _run(self):
+        import requests  # only needed once a webhook is configured; keeps collector startup light
+        while True:
+            alert = self._queue.get()
+            if alert is None:
+                break
+            for attempt in range(self.retries + 1):
+                try:
+                    response = requests.post(self.url, json=alert, timeout=self.timeout)
+                    response.raise_for_status()
+                    self.sent += 1
+                    break
+                except requests.RequestException as e:
+                    if attempt == self.retries:
+                        self.failed += 1
+                        print(f"⚠️ Alert webhook failed after {self.retries + 1} attempts: {e}")
+                    else:
+                        time.sleep(0.5 * 2 ** attempt)
+
+    def close(self, timeout: float = 5.0):
+        """Send what is queued, waiting at most `timeout` seconds"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+def build_sinks(config: Dict) -> List:
+    sinks = []
+    if config.get("file"):
+        sinks.append(FileSink(config["file"]))
+    if config.get("webhook"):
+        sinks.append(WebhookSink(config["webhook"], config.get("webhook_timeout", 5.0)))
+    return sinks
+
+
+# ---- engine -----------------------------------------------------------------------------
+
+class AlertEngine:
+    """Evaluates every rule on each data point and sends new alerts to the sinks"""
+
+    def __init__(self, rules: List[Rule], sinks: List, state_path: Optional[str] = None, clock=time.time):
+        self.rules = rules
+        self.sinks = sinks
+        self.state_path = state_path
+        self.clock = clock
+        self._active: set = set()  # (rule, coin, direction) holding on the previous tick
+        self._last_fired: Dict[str, float] = {}
+        self.rule_seconds: Dict[str, float] = {rule.name: 0.0 for rule in rules}
+        self.last_eval_seconds = 0.0
+        self.fired = 0
+        self.suppressed = 0
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as f:
+                self._last_fired = json.load(f).get("last_fired", {})
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = ALERTS_CONFIG, directory: str = DATA_DIR) -> "AlertEngine":
+        """Rules and sinks from a JSON config file, or the built-in defaults if it does not exist"""
+        config = DEFAULT_CONFIG
+        if path and os.path.exists(path):
+            with open(path) as f:
+                config = json.load(f)
+        return cls(build_rules(config["rules"]), build_sinks(config.get("sinks", {})),
+                   os.path.join(directory, STATE_FILE))
+
+    def evaluate(self, data_point: Dict, send: bool = True) -> List[Dict]:
+        """Alerts newly firing for this data point; with send=False only the rule state advances"""
+        started = time.perf_counter()
+        tick = Tick(data_point)
+        now = self.clock()
+        active, alerts = set(), []
+        for rule in self.rules:
+            rule_started = time.perf_counter()
+            breaches = rule.evaluate(tick)
+            self.rule_seconds[rule.name] += time.perf_counter() - rule_started
+            for coin, direction, details in breaches:
+                key = (rule.name, coin, direction)
+                active.add(key)
+                if key in self._active:
+                    continue  # still the same episode
+                cooldown_key = "|".join(key)
+                if now - self._last_fired.get(cooldown_key, -math.inf) < rule.cooldown_seconds:
+                    self.suppressed += 1
+                    continue
+                self._last_fired[cooldown_key] = now
+                alerts.append({
+                    "id": f"{cooldown_key}|{tick.timestamp}",
+                    "rule": rule.name, "type": rule.type, "coin": coin, "direction": direction,
+                    "data_timestamp": tick.timestamp,
+                    "fired_at": datetime.fromtimestamp(now).isoformat(),
+                    **details,
+                })
+        self._active = active
+        self.last_eval_seconds = time.perf_counter() - started
+
+        if alerts and send:
+            self.fired += len(alerts)
+            for alert in alerts:
+                for sink in self.sinks:
+                    sink.send(alert)
+            self._save_state()
+        return alerts
+
+    def prime(self, data_points: Iterable[Dict]):
+        """Feed history so the rules have context, without sending or starting cooldowns"""
+        last_fired = dict(self._last_fired)
+        for data_point in data_points:
+            self.evaluate(data_point, send=False)
+        self._last_fired = last_fired
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        # Keep the file small: drop entries older than a week, or than the longest cooldown if
+        # a rule has one longer than that, since they can no longer suppress anything
+        longest = max((rule.cooldown_seconds for rule in self.rules), default=0)
+        horizon = self.clock() - max(86400 * 7, longest)
+        self._last_fired = {key: ts for key, ts in self._last_fired.items() if ts >= horizon}
+        temp = f"{self.state_path}.tmp"
+        with open(temp, "w") as f:
+            json.dump({"last_fired": self._last_fired}, f)
+        os.replace(temp, self.state_path)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def stored_data_points(records: Iterable[Dict], history: PositionHistory) -> Iterable[Dict]:
+    """Stored records with their delta-encoded positions expanded back into a position_index"""
+    for record in records:
+        history.extend([record])
+        if "position_delta" in record:
+            record = {k: v for k, v in record.items() if k != "position_delta"}
+            record["position_index"] = history.index_at()
+        yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate positioning-shift alert rules on the data point store")
+    parser.add_argument("--config", default=ALERTS_CONFIG, help="rules and sinks (default: %(default)s, "
+                                                                "built-in defaults if missing)")
+    parser.add_argument("--dir", default=DATA_DIR, help="store directory (default: %(default)s)")
+    parser.add_argument("--replay", action="store_true", help="run the rules over the stored history and "
+                                                              "print the alerts instead of following")
+    parser.add_argument("--warmup", type=int, default=300, help="stored points to prime the rules with")
+    parser.add_argument("--poll-seconds", type=float, default=0.25)
+    args = parser.parse_args()
+
+    store = SegmentStore(args.dir)
+    engine = AlertEngine.from_config(args.config, args.dir)
+    history = PositionHistory()
+    print(f"Loaded {len(engine.rules)} alert rule(s): {', '.join(rule.name for rule in engine.rules)}")
+
+    if args.replay:
+        engine.sinks, engine.state_path = [], None
+        engine._last_fired = {}
+        # Cooldowns follow the data's clock, not the wall clock
+        for data_point in stored_data_points(store.iter_records(), history):
+            engine.clock = lambda ts=parse_timestamp(data_point.get("timestamp")): ts or time.time()
+            for alert in engine.evaluate(data_point):
+                print(f"🚨 {alert['data_timestamp']} [{alert['rule']}] {alert['message']}")
+        print(f"{engine.fired} alert(s), {engine.suppressed} suppressed by cooldowns")
+        return
+
+    records, position = store.read_since(None)
+    # The newest `warmup` points prime the rules; with --warmup 0 none do (records[-0:] is all of them)
+    split = max(len(records) - max(args.warmup, 0), 0)
+    history.extend(records[:split])
+    engine.prime(stored_data_points(records[split:], history))
+    print(f"Following {store.directory}/ for new data points...")
+    try:
+        while True:
+            records, position = store.read_since(position)
+            for data_point in stored_data_points(records, history):
+                for alert in engine.evaluate(data_point):
+                    print(f"🚨 [{alert['rule']}] {alert['message']}")
+            time.sleep(args.poll_seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Columnar, headless analysis of collected data points.
+
+Usage:
+    python analysis.py                 # report only (JSON + Parquet), no plots
+    python analysis.py --plots         # also save backtest_analysis.png
+    python analysis.py --plots --show  # and open a window (needs a display)
+"""
+import argparse
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from point_buffer import PointBuffer
+from storage import DATA_DIR, SegmentStore
+
+REPORT_PREFIX = "backtest_report"
+
+
+def load_frame(records: List[Dict]) -> pd.DataFrame:
+    """Load data points into one wide frame with (coin, field) columns, indexed by timestamp.
+
+    Fields are `price` plus the aggregate fields (long/short/net tokens and USD, count) for
+    every tracked asset. The nested per-asset dicts are flattened by pandas in bulk; only the
+    top-level sub-dicts are picked out per record. Records written before all-asset tracking
+    fall back to their btc_/eth_ fields.
+    """
+    if not records:
+        return pd.DataFrame()
+
+    aggregates = [
+        r.get("asset_positions") or {"BTC": r.get("btc_positions") or {}, "ETH": r.get("eth_positions") or {}}
+        for r in records
+    ]
+    prices = [
+        r.get("asset_prices") or {"BTC": r.get("btc_price"), "ETH": r.get("eth_price")}
+        for r in records
+    ]
+
+    positions = pd.json_normalize(aggregates, sep="|")
+    positions.columns = pd.MultiIndex.from_tuples([tuple(c.split("|", 1)) for c in positions.columns])
+    price_frame = pd.DataFrame.from_records(prices)
+    price_frame.columns = pd.MultiIndex.from_tuples([(coin, "price") for coin in price_frame.columns])
+
+    frame = pd.concat([price_frame, positions], axis=1).apply(pd.to_numeric, errors="coerce")
+    frame.index = pd.to_datetime(pd.Series([r["timestamp"] for r in records]), format="mixed")
+    frame.index.name = "timestamp"
+    frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+    return frame.sort_index(axis=1)
+
+
+def buffer_frame(buffer: PointBuffer, start: Optional[float] = None, end: Optional[float] = None) -> pd.DataFrame:
+    """The same frame as load_frame, built from a PointBuffer's columns without any dicts"""
+    timestamps, coins, columns = buffer.range(start, end)
+    if not len(timestamps):
+        return pd.DataFrame()
+
+    frame = pd.DataFrame(
+        np.concatenate([columns[name] for name in columns], axis=1),
+        columns=pd.MultiIndex.from_tuples([(coin, name) for name in columns for coin in coins]),
+    )
+    frame.index = pd.DatetimeIndex([datetime.fromtimestamp(ts) for ts in timestamps], name="timestamp")
+    frame = frame.dropna(axis=1, how="all")
+    frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+    return frame.sort_index(axis=1)
+
+
+def field(frame: pd.DataFrame, name: str) -> pd.DataFrame:
+    """One field for every coin, e.g. field(frame, 'net_usd') -> columns BTC, ETH, ..."""
+    if name not in frame.columns.get_level_values(1):
+        return pd.DataFrame(index=frame.index)
+    return frame.xs(name, axis=1, level=1)
+
+
+def build_report(frame: pd.DataFrame, min_points: int = 3) -> Dict:
+    """Summary statistics and position/price correlations for every tracked asset"""
+    if frame.empty:
+        return {"data_points": 0, "assets": {}}
+
+    prices = field(frame, "price")
+    net_usd = field(frame, "net_usd").reindex(columns=prices.columns)
+    net_tokens = field(frame, "net_tokens").reindex(columns=prices.columns)
+    long_usd = field(frame, "long_usd").reindex(columns=prices.columns)
+    short_usd = field(frame, "short_usd").reindex(columns=prices.columns)
+
+    # Whole-frame operations: one pass computes every coin at once
+    price_change = prices.pct_change(fill_method=None)
+    position_change = net_usd.diff()
+    correlation = price_change.corrwith(position_change)
+    # Does this tick's position change lead the next tick's price move?
+    lead_correlation = price_change.shift(-1).corrwith(position_change)
+    observations = prices.notna().sum()
+    first_price = prices.bfill().iloc[0]
+    last_price = prices.ffill().iloc[-1]
+
+    assets = {}
+    for coin in prices.columns:
+        if observations[coin] < min_points:
+            continue
+        assets[coin] = {
+            "data_points": int(observations[coin]),
+            "price_first": _num(first_price[coin]),
+            "price_last": _num(last_price[coin]),
+            "price_change_pct": _num((last_price[coin] / first_price[coin] - 1) * 100),
+            "position_price_correlation": _num(correlation.get(coin)),
+            "position_leads_price_correlation": _num(lead_correlation.get(coin)),
+            "net_usd_mean": _num(net_usd[coin].mean()),
+            "net_usd_last": _num(net_usd[coin].ffill().iloc[-1]),
+            "net_tokens_mean": _num(net_tokens[coin].mean()),
+            "long_usd_mean": _num(long_usd[coin].mean()),
+            "short_usd_mean": _num(short_usd[coin].mean()),
+            "net_usd_change_std": _num(position_change[coin].std()),
+        }
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "data_points": len(frame),
+        "start": frame.index[0].isoformat(),
+        "end": frame.index[-1].isoformat(),
+        "duration_hours": (frame.index[-1] - frame.index[0]).total_seconds() / 3600,
+        "assets": assets,
+    }
+
+
+def _num(value) -> Optional[float]:
+    """JSON-safe float (NaN/inf become null)"""
+    if value is None:
+        return None
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def write_report(report: Dict, frame: pd.DataFrame, prefix: str = REPORT_PREFIX, parquet: bool = True) -> List[str]:
+    """Write the report as JSON and the frame as Parquet, replacing any previous run's files"""
+    written = []
+    with open(f"{prefix}.json", "w") as f:
+        json.dump(report, f, indent=2)
+    written.append(f"{prefix}.json")
+
+    if parquet and not frame.empty:
+        flat = frame.copy()
+        flat.columns = [f"{coin}_{name}" for coin, name in flat.columns]
+        try:
+            flat.to_parquet(f"{prefix}.parquet")
+            written.append(f"{prefix}.parquet")
+        except ImportError:
+            print("⚠️ pyarrow/fastparquet not installed, skipping Parquet output")
+    return written
+
+
+def plot(frame: pd.DataFrame, report: Dict, path: str = "backtest_analysis.png", show: bool = False):
+    """The original four-panel BTC/ETH chart; only imports matplotlib when called"""
+    import matplotlib
+    if not show:
+        matplotlib.use("Agg")  # Headless: render to file without a display
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+    prices = field(frame, "price")
+    net_usd = field(frame, "net_usd")
+
+    for col, coin in enumerate(["BTC", "ETH"]):
+        if coin not in prices.columns:
+            continue
+        ax = axes[0, col]
+        ax_twin = ax.twinx()
+        ax.plot(frame.index, prices[coin], 'b-', label=f'{coin} Price')
+        ax_twin.plot(frame.index, net_usd[coin] / 1_000_000, 'r-', label='Net Position (USD)')
+        ax.set_xlabel('Time')
+        ax.set_ylabel(f'{coin} Price ($)', color='b')
+        ax_twin.set_ylabel('Net Position ($M)', color='r')
+        ax.set_title(f'{coin} Price vs Top 100 Traders Net Position (USD)')
+        ax.tick_params(axis='y', labelcolor='b')
+        ax_twin.tick_params(axis='y', labelcolor='r')
+
+        changes = pd.DataFrame({
+            "price": prices[coin].pct_change(fill_method=None),
+            "position": net_usd[coin].diff(),
+        }).dropna()
+        stats = report["assets"].get(coin, {})
+        corr = stats.get("position_price_correlation")
+        ax = axes[1, col]
+        ax.scatter(changes["position"] / 1_000_000, changes["price"] * 100)
+        ax.set_xlabel('Position Change ($M)')
+        ax.set_ylabel('Price Change %')
+        ax.set_title(f'{coin} Position Change vs Price Change\nCorrelation: '
+                     f'{corr:.3f}' if corr is not None else f'{coin} Position Change vs Price Change')
+
+    plt.tight_layout()
+    plt.savefig(path)
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def print_summary(report: Dict, assets: List[str] = ("BTC", "ETH")):
+    print("\n=== BACKTEST RESULTS ===")
+    print(f"Data points collected: {report['data_points']}")
+    print(f"Duration: {report.get('duration_hours', 0):.1f} hours")
+    print(f"Assets analysed: {len(report['assets'])}")
+    for coin in assets:
+        stats = report["assets"].get(coin)
+        if not stats:
+            continue
+        corr = stats["position_price_correlation"]
+        print(f"\n{coin} Analysis:")
+        print(f"  Price change: {stats['price_change_pct']:.2f}%")
+        print(f"  Position correlation with price change: {corr:.3f}" if corr is not None
+              else "  Position correlation with price change: n/a")
+        print(f"  Average net position (USD): ${stats['net_usd_mean']:,.2f}")
+        print(f"  Average net position (tokens): {stats['net_tokens_mean']:.4f} {coin}")
+
+
+def analyze(points: Union[List[Dict], PointBuffer], plots: bool = False, show: bool = False,
+            prefix: str = REPORT_PREFIX, parquet: bool = True) -> Dict:
+    """Full pipeline: load, summarise, write the report and optionally plot.
+
+    `points` is a list of data points or a PointBuffer (including any history it spilled).
+    """
+    frame = buffer_frame(points) if isinstance(points, PointBuffer) else load_frame(points)
+    if len(frame) < 2:
+        print("Not enough data points for analysis")
+        return {}
+
+    report = build_report(frame)
+    print_summary(report)
+    written = write_report(report, frame, prefix, parquet)
+    if plots:
+        plot(frame, report, show=show)
+        written.append("backtest_analysis.png")
+    print(f"\nReport written to {', '.join(written)}")
+    return report
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Analyse collected data points")
+    parser.add_argument("--dir", default=DATA_DIR, help="data store directory (default: %(default)s)")
+    parser.add_argument("--plots", action="store_true", help="save the BTC/ETH chart")
+    parser.add_argument("--show", action="store_true", help="open the chart in a window")
+    parser.add_argument("--no-parquet", action="store_true", help="skip the Parquet frame export")
+    parser.add_argument("--out", default=REPORT_PREFIX, help="output file prefix (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    # Stream the store into columns rather than holding every record as a dict
+    points = PointBuffer.from_records(SegmentStore(args.dir).iter_records())
+    analyze(points, plots=args.plots or args.show, show=args.show,
+            prefix=args.out, parquet=not args.no_parquet)
+
+
+if __name__ == "__main__":
+    main()
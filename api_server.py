@@ -1,64 +1,321 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import json
-import glob
+import argparse
 import os
-from datetime import datetime, timedelta
-import requests
-import asyncio
-import aiohttp
+import threading
+import time
+from datetime import datetime
+from price_feed import PriceFeed
+from storage import SegmentStore
+from data_cache import DataCache
+import numpy as np
+from downsample import bucket_mean, lttb_indices
+from rolling_stats import RollingStatsEngine
+from leaderboard_cache import LeaderboardCache
+from position_history import PositionHistory
+from point_buffer import PointBuffer
+from rollups import TIERS, Compactor, rows_to_columns
+from event_stream import DataPointBroadcaster, aggregate_deltas, event_id
+from metrics import COLLECTOR_METRICS_FILE, MetricsRegistry, load_snapshot
+from background_refresh import BackgroundRefresher
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Vercel frontend
 
+price_feed = PriceFeed()  # Shared across requests so prices are fetched at most once per TTL
+
+store = SegmentStore()
+data_cache = DataCache(store)  # Loaded once, then refreshed only when the store changes
+
 def get_latest_data():
     """Get the most recent backtest data"""
-    try:
-        data_files = sorted(glob.glob("backtest_data_*.json"))
-        if not data_files:
-            return []
+    return data_cache.get()
+
+leaderboard_cache = LeaderboardCache()
+# Open streams per process, each holding a server thread (deploy/gunicorn.conf.py sets the default)
+broadcaster = DataPointBroadcaster(data_cache, max_subscribers=int(os.environ.get('API_MAX_STREAMS', 0)) or None)
+
+api_metrics = MetricsRegistry()
+request_seconds = api_metrics.histogram("api_request_seconds", "API request handling time", ("endpoint",))
+request_count = api_metrics.counter("api_requests_total", "API requests by status", ("endpoint", "status"))
+
+@app.before_request
+def start_timer():
+    request.environ['metrics.started'] = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = request.environ.get('metrics.started')
+    if started is not None:
+        # Label by route pattern, not raw path, to keep label cardinality bounded
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+        request_count.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+stats_engine = RollingStatsEngine()
+stats_lock = threading.Lock()
+stats_reload_count = -1
+
+def update_stats():
+    """Feed data points the stats engine has not seen yet; never rescans older history"""
+    global stats_engine, stats_reload_count
+    with stats_lock:
+        data_cache.get()
+        if data_cache.reloads != stats_reload_count:
+            # The stored history was rewritten: start over from the longest window only
+            stats_reload_count = data_cache.reloads
+            stats_engine = RollingStatsEngine()
+            latest = data_cache.last_timestamp()
+            start = latest - stats_engine.max_window if latest is not None else None
+        else:
+            start = stats_engine.last_timestamp
         
-        with open(data_files[-1], 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading data: {e}")
-        return []
+        _, new_records = data_cache.range(start=start)
+        for record in new_records:
+            stats_engine.update(record)
+        return stats_engine
+
+SERIES_FIELDS = [
+    'btc_price', 'eth_price',
+    'btc_net_position_usd', 'eth_net_position_usd',
+    'btc_net_position_tokens', 'eth_net_position_tokens',
+]
+
+def parse_time_param(value):
+    """Parse a start/end query parameter given as epoch seconds or an ISO timestamp"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+def parse_resolution(value):
+    """Parse a bucket width such as '300', '15m', '1h' or '1d' into seconds"""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    error = f'resolution must be a positive duration such as 300, 15m or 1h, not {value!r}'
+    unit = units.get(value[-1:].lower())
+    try:
+        seconds = float(value[:-1] if unit else value) * (unit or 1)
+    except ValueError:
+        raise ValueError(error)
+    if not 0 < seconds < float('inf'):
+        raise ValueError(error)
+    return seconds
+
+DOWNSAMPLE_METHODS = ('lttb', 'mean')
+
+# series field -> (buffer field, coin)
+SERIES_COLUMNS = {
+    'btc_price': ('price', 'BTC'),
+    'eth_price': ('price', 'ETH'),
+    'btc_net_position_usd': ('net_usd', 'BTC'),
+    'eth_net_position_usd': ('net_usd', 'ETH'),
+    'btc_net_position_tokens': ('net_tokens', 'BTC'),
+    'eth_net_position_tokens': ('net_tokens', 'ETH'),
+}
+
+# data_cache holds every point in memory, so the columns do too: a bounded ring would re-read
+# and re-parse the store for every request reaching past it
+series_buffer = PointBuffer(capacity=None)
+series_lock = threading.Lock()
+series_state = {'reloads': -1, 'records': 0}
+
+def update_series():
+    """Feed new data points into the columnar time-series buffer"""
+    global series_buffer
+    with series_lock:
+        data = data_cache.get()
+        if data_cache.reloads != series_state['reloads']:
+            series_buffer = PointBuffer(capacity=None)
+            series_state.update(reloads=data_cache.reloads, records=0)
+        if len(data) > series_state['records']:
+            series_buffer.extend(data[series_state['records']:])
+            series_state['records'] = len(data)
+        return series_buffer
+
+def select_series(timestamps, coins, columns, stat=lambda field: field):
+    """Series arrays from (rows x coins) columns, keeping only rows that have every field"""
+    series = {}
+    for name, (field, coin) in SERIES_COLUMNS.items():
+        values = columns[stat(field)]
+        series[name] = values[:, coins.index(coin)] if coin in coins else np.full(len(timestamps), np.nan)
+    complete = np.logical_and.reduce([np.isfinite(values) for values in series.values()]) if len(timestamps) else []
+    return complete, {name: values[complete] for name, values in series.items()}
+
+def series_columns(start, end):
+    """Epoch timestamps and one array per series field, for points that have every field"""
+    timestamps, coins, columns = update_series().range(start, end, fields=('price', 'net_usd', 'net_tokens'))
+    complete, series = select_series(timestamps, coins, columns)
+    return timestamps, timestamps[complete], series
+
+# Rollup tiers written by the collector's compaction stage; read-only here
+TIER_SECONDS = dict(TIERS)
+tier_caches = {name: DataCache(tier_store, legacy=False) for name, _, tier_store in Compactor(store).tiers}
+
+def tier_oldest(tier):
+    """Epoch seconds of the oldest point (or rollup bucket) a tier holds"""
+    return (data_cache if tier == 'raw' else tier_caches[tier]).first_timestamp()
+
+def choose_tier(start, granularity):
+    """The coarsest tier whose buckets are no wider than `granularity` seconds; if its history
+    does not reach back to `start` (raw points past retention), the next coarser one that does"""
+    names = ['raw'] + [name for name, _ in TIERS]
+    widths = [0] + [seconds for _, seconds in TIERS]
+    chosen = max(i for i, width in enumerate(widths) if width <= granularity)
+    if start is not None:
+        for i in range(chosen, len(names)):
+            oldest = tier_oldest(names[i])
+            if oldest is not None and oldest <= start:
+                return names[i]
+    # Nothing reaches back that far; before the first compaction there are no rollups at all
+    return names[chosen] if tier_oldest(names[chosen]) is not None else 'raw'
+
+def tier_series_columns(tier, start, end):
+    """Like series_columns for a rollup tier: bucket starts and bucket means, followed by the raw
+    points newer than the tier's last closed bucket. Also returns each row's point count, to
+    weight any further bucketing."""
+    _, rows = tier_caches[tier].range(start, end)
+    starts, coins, columns = rows_to_columns(rows)
+    complete, series = select_series(starts, coins, columns, lambda field: f'{field}_mean')
+    weights = columns['row_points'][complete] if len(rows) else np.array([])
+    
+    covered_until = starts[-1] + TIER_SECONDS[tier] if len(rows) else start
+    timestamps, tail_times, tail = series_columns(covered_until, end)
+    row_times = np.concatenate((starts[complete], tail_times))
+    series = {name: np.concatenate((series[name], tail[name])) for name in SERIES_FIELDS}
+    return timestamps, row_times, series, np.concatenate((weights, np.ones(len(tail_times))))
+
+def format_timestamp(ts):
+    """Epoch seconds -> the 'YYYY-MM-DD HH:MM:SS[.ffffff]' form data points are stored with"""
+    return datetime.fromtimestamp(ts).isoformat(sep=' ')
+
+def series_row(point):
+    """Flatten a stored data point into a time-series row"""
+    return {
+        'timestamp': point['timestamp'],
+        'btc_price': point['btc_price'],
+        'eth_price': point['eth_price'],
+        'btc_net_position_usd': point['btc_positions']['net_usd'],
+        'eth_net_position_usd': point['eth_positions']['net_usd'],
+        'btc_net_position_tokens': point['btc_positions']['net_tokens'],
+        'eth_net_position_tokens': point['eth_positions']['net_tokens'],
+    }
 
 @app.route('/api/time-series', methods=['GET'])
 def get_time_series():
-    """Get historical time series data for the dashboard"""
+    """Get historical time series data for the dashboard
+    
+    Query parameters:
+      start, end  -- range bounds as epoch seconds or ISO timestamps
+      hours       -- used when start is omitted: last N hours before end/now (default 24)
+      max_points  -- downsample to at most this many points
+      resolution  -- average into fixed buckets, e.g. '15m', '1h', '1d'
+      method      -- 'lttb' (default, shape-preserving) or 'mean' when using max_points
+      field       -- series LTTB preserves the shape of (default btc_net_position_usd)
+      tier        -- 'raw', '1h' or '1d' to override the automatic choice
+    
+    Long ranges are served from the hourly/daily rollups: the coarsest tier no wider than the
+    requested resolution (or range / max_points) is used, so a 90-day chart reads ~90 daily
+    rows instead of ~26k raw points. Rollup rows are bucket means; the X-Series-Tier response
+    header names the tier used.
+    """
     try:
-        # Get query parameters
-        hours = request.args.get('hours', '24')  # Default to last 24 hours
-        hours = int(hours)
-        
-        data = get_latest_data()
+        end = parse_time_param(request.args.get('end'))
+        start = parse_time_param(request.args.get('start'))
+        if start is None:
+            hours = float(request.args.get('hours', '24'))  # Default to last 24 hours
+            start = (end if end is not None else datetime.now().timestamp()) - hours * 3600
         
-        # Filter to last N hours
-        cutoff_time = datetime.now() - timedelta(hours=hours)
+        resolution = request.args.get('resolution')
+        max_points = request.args.get('max_points')
+        method = request.args.get('method', 'lttb')
         
-        filtered_data = []
-        for point in data:
+        if method not in DOWNSAMPLE_METHODS:
+            return jsonify({'error': f'Unknown method: {method}', 'methods': list(DOWNSAMPLE_METHODS)}), 400
+        if resolution is not None:
             try:
-                timestamp = datetime.fromisoformat(point['timestamp'].replace('Z', '+00:00'))
-                if timestamp >= cutoff_time:
-                    filtered_data.append({
-                        'timestamp': point['timestamp'],
-                        'btc_price': point['btc_price'],
-                        'eth_price': point['eth_price'],
-                        'btc_net_position_usd': point['btc_positions']['net_usd'],
-                        'eth_net_position_usd': point['eth_positions']['net_usd'],
-                        'btc_net_position_tokens': point['btc_positions']['net_tokens'],
-                        'eth_net_position_tokens': point['eth_positions']['net_tokens'],
-                    })
-            except Exception as e:
-                continue
-                
-        return jsonify(filtered_data)
+                parse_resolution(resolution)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        if max_points is not None and int(max_points) < 2:
+            return jsonify({'error': 'max_points must be at least 2'}), 400
+        
+        tier = request.args.get('tier')
+        if tier is None:
+            if resolution is not None:
+                granularity = parse_resolution(resolution)
+            elif max_points is not None:
+                granularity = ((end if end is not None else datetime.now().timestamp()) - start) / int(max_points)
+            else:
+                granularity = 0
+            tier = choose_tier(start, granularity)
+        elif tier != 'raw' and tier not in TIER_SECONDS:
+            return jsonify({'error': f'Unknown tier: {tier}'}), 400
+        
+        # Columns straight from the in-memory buffer or the rollups; no per-point dicts until the response
+        if tier == 'raw':
+            timestamps, row_times, series = series_columns(start, end)
+            weights = None
+        else:
+            timestamps, row_times, series, weights = tier_series_columns(tier, start, end)
+        last_event_id = event_id(float(timestamps[-1])) if len(timestamps) else None
         
+        if resolution is None and max_points is not None and method == 'mean' and len(row_times) > int(max_points):
+            # Pick a bucket width that yields at most max_points aligned buckets
+            resolution_seconds = (row_times[-1] - row_times[0]) / (int(max_points) - 1) * 1.0001
+        elif resolution is not None:
+            resolution_seconds = parse_resolution(resolution)
+        else:
+            resolution_seconds = None
+        if tier != 'raw':
+            # Rollup rows are already one per bucket; this also buckets the raw points after them
+            resolution_seconds = max(resolution_seconds or 0, TIER_SECONDS[tier])
+        
+        if resolution_seconds:
+            row_times, series = bucket_mean(row_times, series, resolution_seconds, weights)
+        if resolution is None and method != 'mean' and max_points is not None and len(row_times) > int(max_points):
+            field = request.args.get('field', 'btc_net_position_usd')
+            if field not in SERIES_FIELDS:
+                return jsonify({'error': f'Unknown field: {field}'}), 400
+            keep = lttb_indices(row_times.tolist(), series[field].tolist(), int(max_points))
+            row_times, series = row_times[keep], {name: values[keep] for name, values in series.items()}
+        
+        values = {name: series[name].tolist() for name in SERIES_FIELDS}
+        rows = [
+            {'timestamp': format_timestamp(ts), **{name: values[name][i] for name in SERIES_FIELDS}}
+            for i, ts in enumerate(row_times.tolist())
+        ]
+        response = jsonify(rows)
+        response.headers['X-Series-Tier'] = tier
+        if last_event_id:
+            # Id of the newest point in range, for resuming /api/stream right after it
+            response.headers['X-Last-Event-Id'] = last_event_id
+            response.headers['Access-Control-Expose-Headers'] = 'X-Last-Event-Id, X-Series-Tier'
+        return response
+        
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def net_positions_summary(latest):
+    """Net positions summary rows for a data point"""
+    return [
+        {
+            'asset': asset,
+            'long_usd': latest[f'{key}_positions']['long_usd'],
+            'short_usd': latest[f'{key}_positions']['short_usd'],
+            'net_usd': latest[f'{key}_positions']['net_usd'],
+            'long_tokens': latest[f'{key}_positions']['long_tokens'],
+            'short_tokens': latest[f'{key}_positions']['short_tokens'],
+            'net_tokens': latest[f'{key}_positions']['net_tokens'],
+            'trader_count': latest[f'{key}_positions']['count']
+        }
+        for asset, key in (('BTC', 'btc'), ('ETH', 'eth'))
+    ]
+
 @app.route('/api/net-positions', methods=['GET'])
 def get_net_positions():
     """Get current net positions summary"""
@@ -68,83 +325,59 @@ def get_net_positions():
             return jsonify([])
         
         # Get the most recent data point
-        latest = data[-1]
-        
-        result = [
-            {
-                'asset': 'BTC',
-                'long_usd': latest['btc_positions']['long_usd'],
-                'short_usd': latest['btc_positions']['short_usd'],
-                'net_usd': latest['btc_positions']['net_usd'],
-                'long_tokens': latest['btc_positions']['long_tokens'],
-                'short_tokens': latest['btc_positions']['short_tokens'],
-                'net_tokens': latest['btc_positions']['net_tokens'],
-                'trader_count': latest['btc_positions']['count']
-            },
-            {
-                'asset': 'ETH',
-                'long_usd': latest['eth_positions']['long_usd'],
-                'short_usd': latest['eth_positions']['short_usd'],
-                'net_usd': latest['eth_positions']['net_usd'],
-                'long_tokens': latest['eth_positions']['long_tokens'],
-                'short_tokens': latest['eth_positions']['short_tokens'],
-                'net_tokens': latest['eth_positions']['net_tokens'],
-                'trader_count': latest['eth_positions']['count']
-            }
-        ]
-        
-        return jsonify(result)
+        return jsonify(net_positions_summary(data[-1]))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+position_history = PositionHistory()
+position_history_lock = threading.Lock()
+position_history_state = {'reloads': -1, 'records': 0, 'latest': None, 'index': {}}
+
+def latest_position_index(data):
+    """Address -> coin -> position at the latest data point, replaying only new deltas"""
+    global position_history
+    with position_history_lock:
+        state = position_history_state
+        if data_cache.reloads != state['reloads']:
+            # The stored history was rewritten: replay from scratch
+            position_history = PositionHistory()
+            state.update(reloads=data_cache.reloads, records=0, latest=None)
+        if len(data) > state['records']:
+            position_history.extend(data[state['records']:])
+            state['records'] = len(data)
+        if state['latest'] is not data[-1]:
+            state['index'] = position_history.index_at()
+            state['latest'] = data[-1]
+        return state['index']
+
 @app.route('/api/traders', methods=['GET'])
 def get_traders():
     """Get individual trader data with positions"""
     try:
-        # Get leaderboard data
-        leaderboard_response = requests.post(
-            "http://localhost:3000/leaderboard",
-            json={"limit": 100}
-        )
-        
-        if not leaderboard_response.ok:
-            return jsonify({'error': 'Failed to fetch leaderboard'}), 500
+        # Leaderboard snapshot is cached with a TTL; no upstream call per request
+        leaderboard_rows = leaderboard_cache.get()
         
-        leaderboard_data = leaderboard_response.json()
-        
-        # Get latest data point to extract trader positions
+        # Position index of the latest data point, keyed by address
         data = get_latest_data()
-        latest_positions = {}
-        if data and 'trader_positions' in data[-1]:
-            latest_positions = data[-1]['trader_positions']
+        position_index = latest_position_index(data) if data else {}
         
         traders = []
         
         # Filter for traders with positive all-time PNL only
-        for trader in leaderboard_data.get('leaderboardRows', []):
-            alltime_stats = next((w[1] for w in trader['windowPerformances'] if w[0] == 'allTime'), {})
-            pnl_alltime = float(alltime_stats.get('pnl', 0))
-            
-            # Only include traders with positive PNL
-            if pnl_alltime > 0:
-                eth_address = trader['ethAddress']
-                
-                # Get position data if available
-                position_data = latest_positions.get(eth_address, {})
-                btc_position = position_data.get('BTC@PERP', {})
-                eth_position = position_data.get('ETH@PERP', {})
+        for trader in leaderboard_rows:
+            if trader['pnl_alltime'] > 0:
+                positions = position_index.get(trader['ethAddress'], {})
+                btc_position = positions.get('BTC', {})
+                eth_position = positions.get('ETH', {})
                 
                 traders.append({
-                    'ethAddress': eth_address,
-                    'displayName': trader.get('displayName'),
-                    'pnl_alltime': pnl_alltime,
-                    'roi_alltime': float(alltime_stats.get('roi', 0)),
-                    'account_value': float(trader.get('accountValue', 0)),
-                    'btc_position': btc_position.get('szi', 0) if btc_position else 0,
-                    'eth_position': eth_position.get('szi', 0) if eth_position else 0,
-                    'btc_position_usd': btc_position.get('position_value_usd', 0) if btc_position else 0,
-                    'eth_position_usd': eth_position.get('position_value_usd', 0) if eth_position else 0,
+                    **trader,
+                    'btc_position': btc_position.get('size', 0),
+                    'eth_position': eth_position.get('size', 0),
+                    'btc_position_usd': btc_position.get('usd_value', 0),
+                    'eth_position_usd': eth_position.get('usd_value', 0),
+                    'positions': positions,
                 })
         
         return jsonify(traders)
@@ -152,6 +385,70 @@ def get_traders():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/prices', methods=['GET'])
+def get_prices():
+    """Get current mark prices, optionally limited to ?coins=BTC,ETH"""
+    try:
+        prices = price_feed.get_prices_sync()
+        coins = request.args.get('coins')
+        if coins:
+            wanted = [c.strip() for c in coins.split(',') if c.strip()]
+            prices = {coin: prices[coin] for coin in wanted if coin in prices}
+        return jsonify(prices)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Rolling mean/std/covariance/correlation and z-scores of net_usd changes (?asset=BTC&window=24h)"""
+    try:
+        engine = update_stats()
+        asset = request.args.get('asset')
+        window = request.args.get('window')
+        if window is not None and window not in engine.windows:
+            return jsonify({'error': f'Unknown window: {window}', 'windows': list(engine.windows)}), 400
+        if asset is not None and asset not in engine.assets:
+            return jsonify({'error': f'Unknown asset: {asset}', 'assets': engine.assets}), 400
+        return jsonify(engine.snapshot(asset, window))
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def stream_event(record, previous):
+    """Payload pushed to stream subscribers for each new data point"""
+    return {
+        'point': series_row(record),
+        'net_positions': net_positions_summary(record),
+        'deltas': aggregate_deltas(record, previous, ['BTC', 'ETH']),
+        'fetch_status': record.get('fetch_status'),
+    }
+
+@app.route('/api/stream', methods=['GET'])
+def stream():
+    """Server-Sent Events stream of new data points.
+    
+    Resume with the standard Last-Event-ID header (sent automatically by EventSource on
+    reconnect) or ?last_id=<id>; ids are data point timestamps in epoch milliseconds.
+    Without either, the stream starts after the newest stored point. Once API_MAX_STREAMS
+    streams are open in this process, new ones get a 503 with Retry-After.
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    if last_id is not None and not last_id.isdigit():
+        return jsonify({'error': 'last_id must be an event id'}), 400
+    if not broadcaster.acquire():
+        return jsonify({'error': f'Too many open streams (limit {broadcaster.max_subscribers}); retry later'}), \
+            503, {'Retry-After': '30'}
+    
+    response = Response(
+        stream_with_context(broadcaster.subscribe(stream_event, last_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, whether or not streaming ever started
+    response.call_on_close(broadcaster.release)
+    return response
+
 @app.route('/api/current-data', methods=['GET'])
 def get_current_data():
     """Get the most recent data point"""
@@ -160,11 +457,48 @@ def get_current_data():
         if not data:
             return jsonify({'error': 'No data available'}), 404
         
-        return jsonify(data[-1])
+        latest = data[-1]
+        if 'position_delta' in latest:
+            # Serve the reconstructed positions rather than the stored delta
+            latest = {k: v for k, v in latest.items() if k != 'position_delta'}
+            latest['position_index'] = latest_position_index(data)
+        return jsonify(latest)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def cache_metrics():
+    """Gauges for the API server's caches and in-memory dataset, read at scrape time"""
+    hits = api_metrics.gauge("api_cache_hits", "Requests served from cache", ("cache",))
+    misses = api_metrics.gauge("api_cache_misses", "Requests that had to (re)load", ("cache",))
+    ratio = api_metrics.gauge("api_cache_hit_ratio", "Hits / (hits + misses)", ("cache",))
+    caches = {
+        'data': (data_cache.hits, data_cache.misses),
+        'prices': (price_feed.cache_hits, price_feed.fetch_count),
+        'leaderboard': (leaderboard_cache.hits, leaderboard_cache.fetches + leaderboard_cache.errors),
+    }
+    for cache, (hit_count, miss_count) in caches.items():
+        hits.set(hit_count, cache=cache)
+        misses.set(miss_count, cache=cache)
+        total = hit_count + miss_count
+        ratio.set(hit_count / total if total else 0.0, cache=cache)
+    
+    api_metrics.gauge("api_data_points", "Data points held in memory by the API server").set(len(data_cache.get()))
+    api_metrics.gauge("api_stream_subscribers", "Open /api/stream connections").set(broadcaster.subscribers)
+    api_metrics.gauge("api_stream_rejected", "/api/stream connections refused at API_MAX_STREAMS").set(broadcaster.rejected)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: API server metrics plus the collector's latest snapshot"""
+    cache_metrics()
+    collector, written_at = load_snapshot(os.path.join(store.directory, COLLECTOR_METRICS_FILE))
+    if collector is not None:
+        age = api_metrics.gauge("collector_metrics_age_seconds", "Seconds since the collector last wrote metrics")
+        age.set(time.time() - written_at)
+    
+    body = api_metrics.render() + (collector.render() if collector is not None else '')
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -173,7 +507,11 @@ def health_check():
         return jsonify({
             'status': 'healthy',
             'data_points': len(data),
-            'last_update': data[-1]['timestamp'] if data else None
+            'last_update': data[-1]['timestamp'] if data else None,
+            'cache': data_cache.stats(),
+            'rollups': {name: len(cache.get()) for name, cache in tier_caches.items()},
+            'leaderboard_cache': leaderboard_cache.stats(),
+            'background_refresh': refresher.stats()
         })
     except Exception as e:
         return jsonify({
@@ -181,5 +519,38 @@ def health_check():
             'error': str(e)
         }), 500
 
+def warm_caches():
+    """Bring the dataset and every view derived from it up to date, so requests find them ready"""
+    data_cache.refresh()
+    for cache in tier_caches.values():
+        cache.refresh()
+    data = data_cache.get()
+    update_series()
+    update_stats()
+    if data:
+        latest_position_index(data)
+
+refresher = BackgroundRefresher(warm_caches, price_feed, leaderboard_cache, metrics=api_metrics)
+
+def start_background_refresh():
+    """Production mode: preload everything, then refresh it in the background.
+    
+    Request handlers stop checking the store and calling upstream themselves; they serve
+    the snapshots the refresher keeps current. Called once per worker process.
+    """
+    data_cache.check_interval = float('inf')
+    for cache in tier_caches.values():
+        cache.check_interval = float('inf')
+    refresher.start()
+    print(f"✅ Preloaded {len(data_cache.get())} data points in {refresher.preload_seconds:.2f}s")
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    # Development server; production runs under gunicorn (see deploy/gunicorn.conf.py)
+    parser = argparse.ArgumentParser(description='Hyperliquid tracker API server (development)')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--debug', action='store_true',
+                        help='Flask debugger and reloader; data and upstream calls are loaded on the request path')
+    args = parser.parse_args()
+    if not args.debug:
+        start_background_refresh()
+    app.run(host='0.0.0.0', port=args.port, debug=args.debug, threaded=True)
\ No newline at end of file
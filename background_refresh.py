@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from hl_client import HyperliquidClient
+from leaderboard_cache import LeaderboardCache
+from metrics import MetricsRegistry
+from price_feed import PriceFeed
+
+
+class BackgroundRefresher:
+    """Keeps the API server's dataset and upstream snapshots fresh, off the request path.
+
+    An asyncio loop in a daemon thread re-checks the data store every `data_interval`
+    seconds (the file reads and derived-state updates in `warm` run in a worker thread) and
+    refreshes prices and the leaderboard on their TTLs through one pooled HyperliquidClient.
+    Upstream calls share a semaphore of `max_concurrency` slots and each attempt is bounded
+    by `timeout`, so a slow upstream delays a refresh, never a request: handlers only read
+    the latest snapshots. `start` returns once the first round has completed (preloading).
+    """
+
+    def __init__(self, warm: Callable[[], None], price_feed: PriceFeed, leaderboard: LeaderboardCache,
+                 data_interval: float = 1.0, max_concurrency: int = 4, timeout: float = 5.0,
+                 retry_interval: float = 30.0, metrics: Optional[MetricsRegistry] = None):
+        self.warm = warm
+        self.price_feed = price_feed
+        self.leaderboard = leaderboard
+        self.data_interval = data_interval
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retry_interval = retry_interval  # after a failed refresh, retry sooner than the TTL
+        self.metrics = metrics
+        self.client: Optional[HyperliquidClient] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.runs: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.last_seconds: Dict[str, float] = {}
+        self.preload_seconds: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, wait: bool = True):
+        """Preload everything once, then keep refreshing in the background"""
+        if self.running:
+            return
+        # From here on the caches serve their snapshots and never fetch inline
+        self.price_feed.background_refresh = True
+        self.leaderboard.background_refresh = True
+        ready = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run(ready)),
+                                        name="background-refresh", daemon=True)
+        self._thread.start()
+        if wait:
+            ready.wait()
+
+    def stop(self, timeout: float = 5.0):
+        if self._loop is not None and self.running:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._thread.join(timeout)
+
+    async def _run(self, ready: threading.Event):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # Only the leaderboard service and metaAndAssetCtxs are called, so one retry is enough;
+        # the next scheduled refresh is the real retry. /metrics also exports the collector's
+        # upstream_* families, so these are api_upstream_*
+        self.client = HyperliquidClient(self.price_feed.api_url, self.leaderboard.url,
+                                        max_connections=self.max_concurrency, max_retries=1,
+                                        timeout=self.timeout, metrics=self.metrics, metrics_prefix="api_")
+        self.price_feed.client = self.client
+        jobs = {
+            "data": (self.data_interval, lambda: asyncio.to_thread(self.warm)),
+            "prices": (self.price_feed.ttl_seconds, lambda: self._upstream(self._refresh_prices())),
+            "leaderboard": (self.leaderboard.ttl_seconds,
+                            lambda: self._upstream(self.leaderboard.refresh_async(self.client))),
+        }
+        try:
+            start = time.perf_counter()
+            preloaded = await asyncio.gather(*(self._job(name, job) for name, (_, job) in jobs.items()))
+            self.preload_seconds = time.perf_counter() - start
+            ready.set()
+            await asyncio.gather(*(self._every(name, interval, job, ok)
+                                   for (name, (interval, job)), ok in zip(jobs.items(), preloaded)))
+        finally:
+            ready.set()
+            await self.client.close()
+
+    async def _upstream(self, call: Awaitable):
+        async with self._slots:
+            return await call
+
+    async def _refresh_prices(self) -> bool:
+        await self.price_feed.get_prices(force=True)
+        return self.price_feed.last_fetch_ok
+
+    async def _job(self, name: str, job: Callable[[], Awaitable]) -> bool:
+        """Run one refresh; False if it raised or reported failure (the caches log their own errors)"""
+        start = time.perf_counter()
+        ok = False
+        try:
+            ok = await job() is not False
+        except Exception as e:
+            print(f"⚠️  Background refresh of {name} failed: {e}")
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        self.runs[name] = self.runs.get(name, 0) + 1
+        self.last_seconds[name] = time.perf_counter() - start
+        return ok
+
+    async def _every(self, name: str, interval: float, job: Callable[[], Awaitable], ok: bool):
+        # Fixed delay between runs: a slow refresh pushes the next one back instead of piling up
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), interval if ok else min(interval, self.retry_interval))
+            except asyncio.TimeoutError:
+                ok = await self._job(name, job)
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "preload_seconds": self.preload_seconds,
+            "runs": dict(self.runs),
+            "errors": dict(self.errors),
+            "last_seconds": dict(self.last_seconds),
+            "upstream": self.client.stats() if self.client is not None else None,
+        }
@@ -1,22 +1,87 @@
-import requests
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime, timedelta
+import argparse
+import os
+from datetime import datetime
 import time
-import json
-from typing import Dict, List, Tuple
+from typing import Dict, List
 import asyncio
-import aiohttp
-from collections import defaultdict
+import glob
+from contextlib import contextmanager
+from aggregation import aggregate_all, build_position_index, empty_aggregate
+from alerts import AlertEngine, stored_data_points
+from hl_client import HYPERLIQUID_INFO_API, LEADERBOARD_API, HyperliquidClient
+from metrics import COLLECTOR_METRICS_FILE, MetricsRegistry
+from point_buffer import PointBuffer
+from position_history import PositionDeltaEncoder, PositionHistory
+from price_feed import PriceFeed
+from rollups import Compactor
+from scheduler import FixedRateScheduler
+from storage import LEGACY_PATTERN, SegmentStore, convert_legacy_json
+from trader_activity import TraderActivityCache
 
 class HyperliquidBacktest:
-    def __init__(self):
-        self.leaderboard_api = "http://localhost:3000/leaderboard"
-        self.hyperliquid_api = "https://api.hyperliquid.xyz/info"
+    def __init__(self, hyperliquid_api: str = HYPERLIQUID_INFO_API, leaderboard_api: str = LEADERBOARD_API,
+                 client: HyperliquidClient = None):
+        self.leaderboard_api = leaderboard_api
+        self.hyperliquid_api = hyperliquid_api
+        self.metrics = MetricsRegistry()
+        # One pooled, rate-limited client shared by screening, collection and the price feed
+        self.client = client or HyperliquidClient(self.hyperliquid_api, self.leaderboard_api, metrics=self.metrics)
+        self.price_feed = PriceFeed(self.hyperliquid_api, client=self.client)
+        self.store = SegmentStore()
+        # Stored points keep per-trader positions as keyframes plus deltas, not raw payloads
+        self.position_encoder = PositionDeltaEncoder()
+        self.buffer_capacity = 2016  # Data points kept in memory; older ones are read back from the store
         self.positions_data = []
         self.price_data = []
+        self.screening_concurrency = 20  # Max clearinghouseState lookups in flight while screening
+        self.screening_progress = True  # Print screening progress lines; errors are always printed
+        self.last_screening_stats: Dict = {}
+        self.traders: List[str] = []
+        self.traders_updated_at = None
+        self.trader_refresh_seconds = 3600  # Background refresh of the active trader list
+        # Activity verdicts from ticks and screening, so refreshes only look up addresses that changed
+        self.activity = TraderActivityCache()
+        # Hourly/daily rollups and raw point retention, built off the event loop between ticks
+        self.compactor = Compactor(self.store)
+        self.compaction_interval_seconds = 900
+        # Positioning-shift rules evaluated on each stored data point (alerts.json or the defaults)
+        self.alerts = AlertEngine.from_config(directory=self.store.directory)
+        
+        self.phase_seconds = self.metrics.histogram(
+            "collector_phase_seconds", "Time spent in each phase of a collection tick", ("phase",))
+        self.data_points_gauge = self.metrics.gauge(
+            "collector_data_points", "Data points held in memory by the collector")
+        self.data_points_bytes_gauge = self.metrics.gauge(
+            "collector_data_points_bytes", "Size of the in-memory data point columns")
+        self.incomplete_ticks = self.metrics.counter(
+            "collector_incomplete_ticks_total", "Ticks with failed trader or price fetches")
+        self.skipped_ticks = self.metrics.counter(
+            "collector_skipped_ticks_total", "Ticks skipped because the previous one overran")
+        self.screening_lookups = self.metrics.counter(
+            "collector_screening_lookups_total", "Trader activity verdicts used while screening",
+            ("source",))
+        self.rollup_rows = self.metrics.counter(
+            "collector_rollup_rows_total", "Rollup rows written by compaction", ("tier",))
+        self.expired_segments = self.metrics.counter(
+            "collector_expired_segments_total", "Raw segments deleted past the retention period")
+        self.alerts_fired = self.metrics.counter(
+            "collector_alerts_total", "Alerts sent, by rule", ("rule",))
+        self.last_checkpoint_seconds = None
+        self.last_trader_refresh_seconds = None
+        
+    @contextmanager
+    def phase(self, name: str, timings: Dict):
+        """Time a phase into the phase histogram and `timings[name]`"""
+        with self.phase_seconds.time(phase=name) as timing:
+            yield
+        timings[name] = timing["seconds"]
+    
+    def write_metrics(self):
+        """Snapshot collector metrics next to the data for the API server's /metrics endpoint"""
+        try:
+            self.metrics.write_snapshot(os.path.join(self.store.directory, COLLECTOR_METRICS_FILE))
+        except OSError as e:
+            print(f"Error writing metrics snapshot: {e}")
         
     async def get_top_traders_with_positions(self, target_count: int = 100) -> List[str]:
         """Get top traders by PNL who have at least one open position"""
@@ -34,8 +99,7 @@ class HyperliquidBacktest:
                 }
             }
             
-            response = requests.post(self.leaderboard_api, json=payload)
-            data = response.json()
+            data = await self.client.post_leaderboard(payload)
             
             if "error" in data:
                 print(f"Error fetching leaderboard: {data['error']}")
@@ -43,35 +107,11 @@ class HyperliquidBacktest:
             
             all_traders = [row["ethAddress"] for row in data["leaderboardRows"]]
             print(f"Fetched {len(all_traders)} traders from leaderboard, filtering for active positions...")
+            # Addresses that left the window are checked again if they ever come back
+            self.activity.forget(all_traders)
             
-            # Check each trader for active positions
-            active_traders = []
-            
-            async with aiohttp.ClientSession() as session:
-                for i, trader in enumerate(all_traders):
-                    if len(active_traders) >= target_count:
-                        break
-                        
-                    try:
-                        positions = await self.get_user_positions(session, trader)
-                        
-                        # Check if trader has any open positions
-                        has_positions = False
-                        for position in positions.get("positions", []):
-                            if float(position["position"]["szi"]) != 0.0:
-                                has_positions = True
-                                break
-                        
-                        if has_positions:
-                            active_traders.append(trader)
-                            
-                        # Progress indicator
-                        if (i + 1) % 50 == 0:
-                            print(f"   Checked {i + 1}/{len(all_traders)} traders, found {len(active_traders)} active")
-                            
-                    except Exception as e:
-                        print(f"   Error checking positions for {trader}: {e}")
-                        continue
+            # Screen traders concurrently, stopping once the top `target_count` are confirmed
+            active_traders = await self.screen_active_traders(all_traders, target_count)
             
             print(f"✅ Found {len(active_traders)} active traders with open positions")
             return active_traders[:target_count]
@@ -80,325 +120,378 @@ class HyperliquidBacktest:
             print(f"Error fetching active traders: {e}")
             return []
     
-    async def get_user_positions(self, session: aiohttp.ClientSession, address: str) -> Dict:
-        """Get current positions for a user"""
+    async def screen_active_traders(self, traders: List[str], target_count: int) -> List[str]:
+        """Check traders for open positions with bounded concurrency, preserving leaderboard rank order.
+        
+        Traders with a usable verdict in the activity cache (e.g. from the last collection tick) are
+        not looked up again, so a refresh only costs one lookup per leaderboard newcomer, stale active
+        verdict or inactive address whose backoff expired. The rest are handed out in rank order to
+        `screening_concurrency` workers. Screening stops as soon as the first `target_count` active
+        traders in rank order are confirmed, i.e. every trader ranked above the cut-off has been checked.
+        """
+        now = self.activity.clock()
+        # True/False once known, None while pending
+        results: List = [self.activity.verdict(trader, now) for trader in traders]
+        probed = [False] * len(traders)  # looked up during this screening
+        next_index = 0      # next trader to hand out to a worker
+        confirmed = 0       # length of the fully checked prefix of `traders`
+        confirmed_active = 0
+        failed = 0
+        done = asyncio.Event()
+        start_time = time.monotonic()
+        
+        def advance():
+            """Advance the confirmed prefix; it only counts traders whose betters are all checked"""
+            nonlocal confirmed, confirmed_active
+            while confirmed < len(traders) and results[confirmed] is not None:
+                if results[confirmed]:
+                    confirmed_active += 1
+                confirmed += 1
+                if confirmed % 50 == 0 and self.screening_progress:
+                    print(f"   Checked {confirmed}/{len(traders)} traders, found {confirmed_active} active")
+                if confirmed_active >= target_count:
+                    done.set()
+                    break
+        
+        async def worker():
+            nonlocal next_index, failed
+            while not done.is_set():
+                while next_index < len(traders) and results[next_index] is not None:
+                    next_index += 1  # verdict already cached
+                if next_index >= len(traders):
+                    break
+                i = next_index
+                next_index += 1
+                trader = traders[i]
+                
+                positions = await self.get_user_positions(trader)
+                if positions["ok"]:
+                    results[i] = self.has_open_positions(positions)
+                    self.activity.record(trader, results[i])
+                else:
+                    failed += 1
+                    results[i] = False  # A trader we could not check is not counted as active
+                probed[i] = True
+                advance()
+        
+        advance()
+        workers = asyncio.gather(*[worker() for _ in range(max(1, self.screening_concurrency))])
+        stop_waiter = asyncio.ensure_future(done.wait())
+        try:
+            await asyncio.wait([workers, stop_waiter], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Lookups still in flight once the cut-off is confirmed are no longer needed
+            workers.cancel()
+            stop_waiter.cancel()
+            await asyncio.gather(workers, stop_waiter, return_exceptions=True)
+        
+        active_traders = [trader for trader, active in zip(traders[:confirmed], results[:confirmed]) if active]
+        
+        elapsed = time.monotonic() - start_time
+        checked = sum(probed)
+        from_cache = sum(1 for i in range(confirmed) if not probed[i])
+        self.screening_lookups.inc(checked, source="probe")
+        self.screening_lookups.inc(from_cache, source="cache")
+        self.last_screening_stats = {
+            "checked": checked,
+            "cached": from_cache,
+            "confirmed": confirmed,
+            "active": len(active_traders),
+            "failed": failed,
+            "elapsed_seconds": elapsed,
+            "lookups_per_second": checked / elapsed if elapsed > 0 else 0.0,
+            "concurrency": self.screening_concurrency,
+        }
+        if self.screening_progress:
+            print(f"   Screened {checked} traders in {elapsed:.1f}s "
+                  f"({self.last_screening_stats['lookups_per_second']:.1f} lookups/s, concurrency {self.screening_concurrency}), "
+                  f"{from_cache} from the activity cache")
+        
+        return active_traders[:target_count]
+    
+    @staticmethod
+    def has_open_positions(positions: Dict) -> bool:
+        """Check whether a positions result contains at least one non-zero position"""
+        for position in positions.get("positions", []):
+            if float(position["position"]["szi"]) != 0.0:
+                return True
+        return False
+    
+    async def get_user_positions(self, address: str) -> Dict:
+        """Get current positions for a user; `ok` is False if the fetch failed after retries"""
         payload = {
             "type": "clearinghouseState",
             "user": address
         }
         
         try:
-            async with session.post(self.hyperliquid_api, json=payload) as response:
-                data = await response.json()
-                return {
-                    "address": address,
-                    "positions": data.get("assetPositions", []),
-                    "timestamp": datetime.now()
-                }
+            data = await self.client.post_info(payload)
+            return {
+                "address": address,
+                "positions": data.get("assetPositions", []),
+                "timestamp": datetime.now(),
+                "ok": True
+            }
         except Exception as e:
             print(f"Error fetching positions for {address}: {e}")
-            return {"address": address, "positions": [], "timestamp": datetime.now()}
+            return {"address": address, "positions": [], "timestamp": datetime.now(), "ok": False, "error": str(e)}
     
     async def get_all_positions(self, traders: List[str]) -> List[Dict]:
-        """Get positions for all traders concurrently"""
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.get_user_positions(session, trader) for trader in traders]
-            positions = await asyncio.gather(*tasks)
-            return positions
+        """Get positions for all traders concurrently (the shared client bounds concurrency and rate)"""
+        tasks = [self.get_user_positions(trader) for trader in traders]
+        return await asyncio.gather(*tasks)
     
     def aggregate_positions(self, positions: List[Dict], prices: Dict[str, float]) -> Dict[str, Dict]:
-        """Aggregate positions by asset (BTC, ETH) in both token and USD values"""
-        aggregated = defaultdict(lambda: {
-            "long_tokens": 0, "short_tokens": 0, "net_tokens": 0,
-            "long_usd": 0, "short_usd": 0, "net_usd": 0,
-            "count": 0
-        })
-        
-        for trader_data in positions:
-            for position in trader_data["positions"]:
-                asset = position["position"]["coin"]
-                if asset in ["BTC", "ETH"] and asset in prices:
-                    size = float(position["position"]["szi"])
-                    price = prices[asset]
-                    usd_value = abs(size) * price
-                    
-                    if size > 0:
-                        aggregated[asset]["long_tokens"] += size
-                        aggregated[asset]["long_usd"] += usd_value
-                    else:
-                        aggregated[asset]["short_tokens"] += abs(size)
-                        aggregated[asset]["short_usd"] += usd_value
-                    
-                    aggregated[asset]["net_tokens"] += size
-                    aggregated[asset]["net_usd"] = aggregated[asset]["long_usd"] - aggregated[asset]["short_usd"]
-                    aggregated[asset]["count"] += 1
-        
-        return dict(aggregated)
+        """Aggregate positions for every priced asset in both token and USD values"""
+        return aggregate_all(positions, prices)
     
     async def get_price_data(self, coin: str) -> float:
         """Get current price for a coin"""
-        payload = {
-            "type": "metaAndAssetCtxs"
-        }
-        
-        try:
-            response = requests.post(self.hyperliquid_api, json=payload)
-            data = response.json()
-            
-            # Find the coin in the universe array
-            for i, asset in enumerate(data[0]["universe"]):
-                if asset["name"] == coin:
-                    # Use the same index to get the price from contexts
-                    if i < len(data[1]):
-                        return float(data[1][i]["markPx"])
-            return 0.0
-        except Exception as e:
-            print(f"Error fetching price for {coin}: {e}")
-            return 0.0
+        return await self.price_feed.get_price(coin)
     
     async def collect_data_point(self, traders: List[str]) -> Dict:
-        """Collect one data point: positions and prices"""
-        # Get prices first
-        btc_price = await self.get_price_data("BTC")
-        eth_price = await self.get_price_data("ETH")
-        prices = {"BTC": btc_price, "ETH": eth_price}
+        """Collect one data point: positions and prices, with per-phase timings"""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        
+        # Get prices first (one metaAndAssetCtxs call covers every coin)
+        with self.phase("prices", timings):
+            prices = await self.price_feed.get_prices()
         
-        # Get all positions
-        positions = await self.get_all_positions(traders)
-        aggregated = self.aggregate_positions(positions, prices)
+        # Get all positions; failed fetches are excluded from aggregates and flagged, not zeroed
+        with self.phase("positions", timings):
+            positions = await self.get_all_positions(traders)
+        
+        return self.build_data_point(traders, positions, prices, self.price_feed.last_fetch_ok, timings, start)
+    
+    def build_data_point(self, traders: List[str], positions: List[Dict], prices: Dict[str, float],
+                         prices_ok: bool, timings: Dict[str, float], start: float) -> Dict:
+        """Aggregate a positions snapshot into a data point (shared by the polling and WebSocket collectors)"""
+        failed_traders = [p["address"] for p in positions if not p["ok"]]
+        with self.phase("aggregation", timings):
+            aggregated = self.aggregate_positions([p for p in positions if p["ok"]], prices)
+        with self.phase("position_index", timings):
+            position_index = build_position_index(positions, prices)
+        timings["collect"] = time.perf_counter() - start
         
-        data_point = {
+        data_point = self.assemble_data_point(traders, aggregated, position_index, failed_traders,
+                                              prices, prices_ok, timings)
+        data_point["trader_positions"] = positions  # Add individual trader positions
+        return data_point
+    
+    def assemble_data_point(self, traders: List[str], aggregated: Dict[str, Dict], position_index: Dict,
+                            failed_traders: List[str], prices: Dict[str, float], prices_ok: bool,
+                            timings: Dict[str, float]) -> Dict:
+        """The stored data point layout, from already aggregated positions (also used by the sharded collector)"""
+        return {
             "timestamp": datetime.now(),
-            "btc_price": btc_price,
-            "eth_price": eth_price,
-            "btc_positions": aggregated.get("BTC", {
-                "long_tokens": 0, "short_tokens": 0, "net_tokens": 0,
-                "long_usd": 0, "short_usd": 0, "net_usd": 0, "count": 0
-            }),
-            "eth_positions": aggregated.get("ETH", {
-                "long_tokens": 0, "short_tokens": 0, "net_tokens": 0,
-                "long_usd": 0, "short_usd": 0, "net_usd": 0, "count": 0
-            }),
-            "trader_positions": positions  # Add individual trader positions
+            "btc_price": prices.get("BTC", 0.0),
+            "eth_price": prices.get("ETH", 0.0),
+            "btc_positions": aggregated.get("BTC", empty_aggregate()),
+            "eth_positions": aggregated.get("ETH", empty_aggregate()),
+            "asset_positions": aggregated,  # Every coin held by at least one tracked trader
+            "asset_prices": {coin: prices[coin] for coin in aggregated},
+            "position_index": position_index,  # address -> coin -> position
+            "fetch_status": {
+                "complete": not failed_traders and prices_ok,
+                "prices_ok": prices_ok,
+                "traders_requested": len(traders),
+                "traders_failed": len(failed_traders),
+                "failed_traders": failed_traders
+            },
+            # Seconds per phase; checkpoint and trader refresh happen outside the tick's collection
+            "timings": {
+                **timings,
+                "previous_checkpoint": self.last_checkpoint_seconds,
+                "last_trader_refresh": self.last_trader_refresh_seconds,
+            }
         }
+    
+    async def refresh_traders(self):
+        """Re-screen the leaderboard and swap in the new active trader list"""
+        print("🔄 Refreshing top 100 active traders list...")
+        timings: Dict[str, float] = {}
+        with self.phase("trader_refresh", timings):
+            new_traders = await self.get_top_traders_with_positions(100)
+        self.last_trader_refresh_seconds = timings["trader_refresh"]
+        if not new_traders:
+            print("   ⚠️ Failed to refresh traders, using previous list")
+            return
         
-        return data_point
+        # Compare with previous list
+        new_addresses = set(new_traders)
+        old_addresses = set(self.traders)
+        added = new_addresses - old_addresses
+        removed = old_addresses - new_addresses
+        
+        if added or removed:
+            print(f"   📈 New traders in top 100: {len(added)}")
+            print(f"   📉 Traders dropped from top 100: {len(removed)}")
+            if added:
+                print(f"   ➕ Added: {list(added)[:3]}{'...' if len(added) > 3 else ''}")
+            if removed:
+                print(f"   ➖ Removed: {list(removed)[:3]}{'...' if len(removed) > 3 else ''}")
+        else:
+            print("   ✓ Top 100 list unchanged")
+        
+        # Replace the list in one assignment; collection ticks read whichever list is current
+        self.traders = new_traders
+        self.traders_updated_at = datetime.now()
+    
+    async def refresh_traders_periodically(self, interval_seconds: float):
+        """Background task: refresh the trader list without delaying collection ticks"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.refresh_traders()
+            except Exception as e:
+                print(f"Error refreshing traders: {e}")
+    
+    async def compact_periodically(self, interval_seconds: float):
+        """Background task: roll up new data points and expire old raw segments.
+
+        The first pass runs at startup and catches up on everything stored so far.
+        """
+        while True:
+            try:
+                stats = await asyncio.to_thread(self.compactor.run)
+                self.phase_seconds.observe(stats["seconds"], phase="compaction")
+                for tier, rows in stats["rows"].items():
+                    self.rollup_rows.inc(rows, tier=tier)
+                self.expired_segments.inc(stats["expired_segments"])
+                if any(stats["rows"].values()):
+                    rows = ", ".join(f"{count} {tier}" for tier, count in stats["rows"].items())
+                    print(f"🗜️ Rolled up {stats['points']} data point(s) into {rows} row(s) "
+                          f"in {stats['seconds']:.2f}s")
+            except Exception as e:
+                print(f"Error compacting data: {e}")
+            await asyncio.sleep(interval_seconds)
     
     async def run_backtest(self, duration_hours: int = 24, interval_minutes: int = 5):
         """Run the backtest for specified duration"""
         print(f"Starting backtest for {duration_hours} hours with {interval_minutes} minute intervals")
         print("📊 Tracking top 100 traders by PNL who have ACTIVE positions (filters out inactive accounts)")
-        print("🔄 Active trader list will be refreshed every hour")
+        print("🔄 Active trader list will be refreshed every hour in the background")
         
         # Get initial top traders with active positions
-        traders = await self.get_top_traders_with_positions(100)
-        if not traders:
+        self.traders = await self.get_top_traders_with_positions(100)
+        if not self.traders:
             print("Failed to get active traders. Make sure the leaderboard API is running.")
             return
-        
-        # Calculate number of iterations
-        iterations = (duration_hours * 60) // interval_minutes
+        self.traders_updated_at = datetime.now()
         
         # Load existing data if any
         data_points = self.load_existing_data()
         
-        for i in range(iterations):
-            print(f"\nCollecting data point {i+1}/{iterations}")
-            
-            # Refresh top 100 active traders every hour (every 12 iterations at 5-min intervals)
-            if i % 12 == 0 and i > 0:
-                print("🔄 Refreshing top 100 active traders list...")
-                new_traders = await self.get_top_traders_with_positions(100)
-                if new_traders:
-                    # Compare with previous list
-                    new_addresses = set(new_traders)
-                    old_addresses = set(traders)
-                    added = new_addresses - old_addresses
-                    removed = old_addresses - new_addresses
-                    
-                    if added or removed:
-                        print(f"   📈 New traders in top 100: {len(added)}")
-                        print(f"   📉 Traders dropped from top 100: {len(removed)}")
-                        if added:
-                            print(f"   ➕ Added: {list(added)[:3]}{'...' if len(added) > 3 else ''}")
-                        if removed:
-                            print(f"   ➖ Removed: {list(removed)[:3]}{'...' if len(removed) > 3 else ''}")
-                    else:
-                        print("   ✓ Top 100 list unchanged")
-                    
-                    traders = new_traders
-                else:
-                    print("   ⚠️ Failed to refresh traders, using previous list")
-            
-            try:
-                data_point = await self.collect_data_point(traders)
-                
-                # Add metadata about trader list
-                data_point['trader_list_updated_at'] = i // 12  # Which hour the list was last updated
-                data_point['iteration'] = i + 1
-                
-                data_points.append(data_point)
-                
-                # Print current status
-                print(f"Timestamp: {data_point['timestamp']}")
-                print(f"BTC Price: ${data_point['btc_price']:,.2f}")
-                print(f"BTC Net Position: ${data_point['btc_positions']['net_usd']:,.2f} ({data_point['btc_positions']['net_tokens']:.4f} BTC)")
-                print(f"ETH Price: ${data_point['eth_price']:,.2f}")
-                print(f"ETH Net Position: ${data_point['eth_positions']['net_usd']:,.2f} ({data_point['eth_positions']['net_tokens']:.4f} ETH)")
-                
-                # Save incrementally every 12 data points (1 hour at 5-min intervals)
-                if (i + 1) % 12 == 0:
-                    self.save_data(data_points)
-                    print("✓ Data checkpoint saved")
-                
-            except Exception as e:
-                print(f"Error collecting data point: {e}")
-            
-            # Wait for next interval (except on last iteration)
-            if i < iterations - 1:
-                await asyncio.sleep(interval_minutes * 60)
+        # Ticks fire on wall-clock boundaries (e.g. :00, :05, :10) so they never drift
+        scheduler = FixedRateScheduler(interval_minutes * 60)
+        end_time = time.time() + duration_hours * 3600
+        expected_ticks = (duration_hours * 60) // interval_minutes
+        refresh_task = asyncio.create_task(self.refresh_traders_periodically(self.trader_refresh_seconds))
+        compaction_task = asyncio.create_task(self.compact_periodically(self.compaction_interval_seconds))
         
-        # Final save and analyze data
-        self.save_data(data_points)
-        self.analyze_results(data_points)
-    
-    def load_existing_data(self) -> List[Dict]:
-        """Load most recent data file if exists"""
-        import glob
-        data_files = sorted(glob.glob("backtest_data_*.json"))
-        if data_files:
-            with open(data_files[-1], 'r') as f:
-                data = json.load(f)
-                print(f"Loaded {len(data)} existing data points from {data_files[-1]}")
-                return data
-        return []
-    
-    def save_data(self, data_points: List[Dict]):
-        """Save collected data to file"""
-        filename = "backtest_data_current.json"
-        with open(filename, 'w') as f:
-            json.dump(data_points, f, default=str, indent=2)
+        try:
+            async for tick in scheduler.ticks(end_time=end_time):
+                print(f"\nCollecting data point {tick['index'] + 1}/{expected_ticks}")
+                if tick["skipped_ticks"]:
+                    print(f"⚠️ Previous tick overran, skipped {tick['skipped_ticks']} tick(s)")
+                    self.skipped_ticks.inc(tick["skipped_ticks"])
+                
+                try:
+                    data_point = await self.collect_data_point(list(self.traders))
+                    self.record_tick(data_points, data_point, scheduler, tick)
+                    
+                except Exception as e:
+                    print(f"Error collecting data point: {e}")
+        finally:
+            refresh_task.cancel()
+            compaction_task.cancel()
+            await self.client.close()
         
-        # Also save timestamped backup
-        backup_filename = f"backtest_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(backup_filename, 'w') as f:
-            json.dump(data_points, f, default=str, indent=2)
+        print(f"\nCollection finished: {scheduler.ticks_fired} ticks, "
+              f"{scheduler.overruns} overrun(s), {scheduler.ticks_skipped} skipped")
         
-        print(f"\nData saved to {filename} and {backup_filename}")
+        # Analyze data (every point is already persisted as it is collected)
+        self.analyze_results(data_points)
     
-    def analyze_results(self, data_points: List[Dict]):
-        """Analyze and visualize the results"""
-        if len(data_points) < 2:
-            print("Not enough data points for analysis")
-            return
-        
-        # Convert to DataFrame for easier analysis
-        df_data = []
-        for dp in data_points:
-            df_data.append({
-                'timestamp': pd.to_datetime(dp['timestamp']),
-                'btc_price': dp['btc_price'],
-                'eth_price': dp['eth_price'],
-                'btc_net_position_usd': dp['btc_positions']['net_usd'],
-                'eth_net_position_usd': dp['eth_positions']['net_usd'],
-                'btc_net_position_tokens': dp['btc_positions']['net_tokens'],
-                'eth_net_position_tokens': dp['eth_positions']['net_tokens'],
-                'btc_long_usd': dp['btc_positions']['long_usd'],
-                'btc_short_usd': dp['btc_positions']['short_usd'],
-                'eth_long_usd': dp['eth_positions']['long_usd'],
-                'eth_short_usd': dp['eth_positions']['short_usd']
-            })
-        
-        df = pd.DataFrame(df_data)
-        df.set_index('timestamp', inplace=True)
-        
-        # Calculate price changes
-        df['btc_price_change'] = df['btc_price'].pct_change()
-        df['eth_price_change'] = df['eth_price'].pct_change()
-        
-        # Calculate position changes (using USD values)
-        df['btc_position_change_usd'] = df['btc_net_position_usd'].diff()
-        df['eth_position_change_usd'] = df['eth_net_position_usd'].diff()
-        
-        # Create visualizations
-        fig, axes = plt.subplots(2, 2, figsize=(15, 10))
+    def record_tick(self, data_points: PointBuffer, data_point: Dict, scheduler: FixedRateScheduler, tick: Dict):
+        """Stamp tick metadata on a data point, persist it, update metrics and print a status line"""
+        # Add metadata about trader list and tick timing
+        data_point['trader_list_updated_at'] = self.traders_updated_at
+        data_point['iteration'] = tick['index'] + 1
+        data_point['schedule'] = scheduler.tick_report(tick)
         
-        # BTC Analysis
-        ax1 = axes[0, 0]
-        ax1_twin = ax1.twinx()
-        ax1.plot(df.index, df['btc_price'], 'b-', label='BTC Price')
-        ax1_twin.plot(df.index, df['btc_net_position_usd'] / 1_000_000, 'r-', label='Net Position (USD)')
-        ax1.set_xlabel('Time')
-        ax1.set_ylabel('BTC Price ($)', color='b')
-        ax1_twin.set_ylabel('Net Position ($M)', color='r')
-        ax1.set_title('BTC Price vs Top 100 Traders Net Position (USD)')
-        ax1.tick_params(axis='y', labelcolor='b')
-        ax1_twin.tick_params(axis='y', labelcolor='r')
+        # This tick's fetches double as activity checks for the next trader refresh
+        self.activity.record_positions(data_point.get('trader_positions', []), self.has_open_positions)
+        timings: Dict[str, float] = {}
+        with self.phase("checkpoint", timings):
+            stored = self.save_data_point(data_point)
+        data_points.append(stored)
+        self.last_checkpoint_seconds = timings["checkpoint"]
+        with self.phase("alerts", timings):
+            alerts = self.alerts.evaluate(data_point)
+        for alert in alerts:
+            self.alerts_fired.inc(rule=alert["rule"])
         
-        # ETH Analysis
-        ax2 = axes[0, 1]
-        ax2_twin = ax2.twinx()
-        ax2.plot(df.index, df['eth_price'], 'b-', label='ETH Price')
-        ax2_twin.plot(df.index, df['eth_net_position_usd'] / 1_000_000, 'r-', label='Net Position (USD)')
-        ax2.set_xlabel('Time')
-        ax2.set_ylabel('ETH Price ($)', color='b')
-        ax2_twin.set_ylabel('Net Position ($M)', color='r')
-        ax2.set_title('ETH Price vs Top 100 Traders Net Position (USD)')
-        ax2.tick_params(axis='y', labelcolor='b')
-        ax2_twin.tick_params(axis='y', labelcolor='r')
+        self.data_points_gauge.set(len(data_points))
+        self.data_points_bytes_gauge.set(data_points.nbytes)
+        self.phase_seconds.observe(scheduler.clock() - tick['started_at'], phase="tick")
+        if not data_point['fetch_status']['complete']:
+            self.incomplete_ticks.inc()
+        self.write_metrics()
         
-        # Correlation Analysis
-        # Remove NaN values for correlation calculation
-        btc_corr_data = df[['btc_price_change', 'btc_position_change_usd']].dropna()
-        eth_corr_data = df[['eth_price_change', 'eth_position_change_usd']].dropna()
-        
-        if len(btc_corr_data) > 2:
-            btc_correlation = btc_corr_data.corr().iloc[0, 1]
-            eth_correlation = eth_corr_data.corr().iloc[0, 1]
-            
-            # Scatter plots
-            ax3 = axes[1, 0]
-            ax3.scatter(btc_corr_data['btc_position_change_usd'] / 1_000_000, btc_corr_data['btc_price_change'] * 100)
-            ax3.set_xlabel('Position Change ($M)')
-            ax3.set_ylabel('Price Change %')
-            ax3.set_title(f'BTC Position Change vs Price Change\nCorrelation: {btc_correlation:.3f}')
-            
-            ax4 = axes[1, 1]
-            ax4.scatter(eth_corr_data['eth_position_change_usd'] / 1_000_000, eth_corr_data['eth_price_change'] * 100)
-            ax4.set_xlabel('Position Change ($M)')
-            ax4.set_ylabel('Price Change %')
-            ax4.set_title(f'ETH Position Change vs Price Change\nCorrelation: {eth_correlation:.3f}')
-            
-            # Print summary statistics
-            print("\n=== BACKTEST RESULTS ===")
-            print(f"Data points collected: {len(df)}")
-            print(f"Duration: {df.index[-1] - df.index[0]}")
-            print(f"\nBTC Analysis:")
-            print(f"  Price change: {(df['btc_price'].iloc[-1] / df['btc_price'].iloc[0] - 1) * 100:.2f}%")
-            print(f"  Position correlation with price change: {btc_correlation:.3f}")
-            print(f"  Average net position (USD): ${df['btc_net_position_usd'].mean():,.2f}")
-            print(f"  Average net position (tokens): {df['btc_net_position_tokens'].mean():.4f} BTC")
-            print(f"\nETH Analysis:")
-            print(f"  Price change: {(df['eth_price'].iloc[-1] / df['eth_price'].iloc[0] - 1) * 100:.2f}%")
-            print(f"  Position correlation with price change: {eth_correlation:.3f}")
-            print(f"  Average net position (USD): ${df['eth_net_position_usd'].mean():,.2f}")
-            print(f"  Average net position (tokens): {df['eth_net_position_tokens'].mean():.4f} ETH")
-        
-        plt.tight_layout()
-        plt.savefig(f"backtest_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
-        plt.show()
+        # Print current status
+        print(f"Timestamp: {data_point['timestamp']} (lag {tick['start_lag_seconds']:.2f}s, "
+              f"took {data_point['schedule']['duration_seconds']:.1f}s)")
+        phases = data_point['timings']
+        print(f"Phases: prices {phases['prices']:.2f}s, positions {phases['positions']:.2f}s, "
+              f"aggregation {phases['aggregation'] * 1000:.1f}ms, "
+              f"checkpoint {self.last_checkpoint_seconds * 1000:.1f}ms, alerts {timings['alerts'] * 1000:.1f}ms")
+        print(f"BTC Price: ${data_point['btc_price']:,.2f}")
+        print(f"BTC Net Position: ${data_point['btc_positions']['net_usd']:,.2f} ({data_point['btc_positions']['net_tokens']:.4f} BTC)")
+        print(f"ETH Price: ${data_point['eth_price']:,.2f}")
+        print(f"ETH Net Position: ${data_point['eth_positions']['net_usd']:,.2f} ({data_point['eth_positions']['net_tokens']:.4f} ETH)")
+        if not data_point['fetch_status']['complete']:
+            print(f"⚠️ Incomplete data point: {data_point['fetch_status']['traders_failed']} trader fetch(es) failed"
+                  f"{'' if data_point['fetch_status']['prices_ok'] else ', prices unavailable'}")
+        for alert in alerts:
+            print(f"🚨 [{alert['rule']}] {alert['message']}")
+    
+    def load_existing_data(self) -> PointBuffer:
+        """Load the newest previously collected data points into a bounded columnar buffer"""
+        if self.store.is_empty() and glob.glob(LEGACY_PATTERN):
+            # First run after upgrading: carry over the history from the old JSON checkpoints
+            convert_legacy_json(self.store)
         
-        # Save processed data
-        df.to_csv(f"backtest_processed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        data = PointBuffer.load(self.store, self.buffer_capacity)
+        if len(data):
+            print(f"Loaded {len(data)} existing data points from {self.store.directory}/"
+                  f"{f' ({data.spilled} older ones stay on disk)' if data.spilled else ''}")
+            # Give the alert rules their recent history, so the first ticks are judged in context
+            self.alerts.prime(stored_data_points(self.store.read_tail(300), PositionHistory()))
+        return data
+    
+    def save_data_point(self, data_point: Dict) -> Dict:
+        """Delta-encode a data point's positions and append it to the store; returns the stored form"""
+        record = self.position_encoder.encode(data_point)
+        self.store.append(record)
+        return record
+    
+    def analyze_results(self, data_points: PointBuffer):
+        """Analyze the results; plots are saved to file and only shown when a display is available"""
+        # pandas is only needed once the run is over, not by the long-running collector
+        from analysis import analyze
+        show = bool(os.environ.get("DISPLAY"))
+        analyze(data_points, plots=True, show=show)
 
-async def main():
-    backtest = HyperliquidBacktest()
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Collect data points by polling the top active traders")
+    parser.add_argument("hours", type=int, nargs="?", default=24, help="how long to collect (default: %(default)s)")
+    parser.add_argument("--interval-minutes", type=int, default=5, help="tick interval (default: %(default)s)")
+    args = parser.parse_args(argv)
     
-    # Run backtest for 24 hours with 5-minute intervals
-    # You can adjust these parameters
-    import sys
-    hours = int(sys.argv[1]) if len(sys.argv) > 1 else 24
-    await backtest.run_backtest(duration_hours=hours, interval_minutes=5)
+    backtest = HyperliquidBacktest()
+    asyncio.run(backtest.run_backtest(duration_hours=args.hours, interval_minutes=args.interval_minutes))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""Benchmark the vectorized aggregation engine against the original per-position loop.
+
+Usage: python benchmarks/bench_aggregation.py [--traders 100 1000 10000] [--coins 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import aggregate_all, aggregate_arrays, snapshot_to_arrays  # noqa: E402
+
+
+def legacy_aggregate(positions: List[Dict], prices: Dict[str, float], assets=None) -> Dict[str, Dict]:
+    """The original nested loop from HyperliquidBacktest.aggregate_positions.
+
+    `assets=None` lifts the hard-coded BTC/ETH filter so both versions do the same work.
+    """
+    aggregated = defaultdict(lambda: {
+        "long_tokens": 0, "short_tokens": 0, "net_tokens": 0,
+        "long_usd": 0, "short_usd": 0, "net_usd": 0,
+        "count": 0
+    })
+
+    for trader_data in positions:
+        for position in trader_data["positions"]:
+            asset = position["position"]["coin"]
+            if (assets is None or asset in assets) and asset in prices:
+                size = float(position["position"]["szi"])
+                price = prices[asset]
+                usd_value = abs(size) * price
+
+                if size > 0:
+                    aggregated[asset]["long_tokens"] += size
+                    aggregated[asset]["long_usd"] += usd_value
+                else:
+                    aggregated[asset]["short_tokens"] += abs(size)
+                    aggregated[asset]["short_usd"] += usd_value
+
+                aggregated[asset]["net_tokens"] += size
+                aggregated[asset]["net_usd"] = aggregated[asset]["long_usd"] - aggregated[asset]["short_usd"]
+                aggregated[asset]["count"] += 1
+
+    return dict(aggregated)
+
+
+def make_snapshot(n_traders: int, n_coins: int, positions_per_trader: int, seed: int = 0):
+    """Synthetic clearinghouseState results shaped like get_all_positions output"""
+    rng = random.Random(seed)
+    coins = ["BTC", "ETH"] + [f"COIN{i}" for i in range(n_coins - 2)]
+    prices = {coin: rng.uniform(0.01, 100_000) for coin in coins}
+    positions = []
+    for t in range(n_traders):
+        held = rng.sample(coins, min(positions_per_trader, n_coins))
+        positions.append({
+            "address": f"0x{t:040x}",
+            "positions": [
+                {"position": {"coin": coin, "szi": f"{rng.uniform(-1000, 1000):.4f}"}, "type": "oneWay"}
+                for coin in held
+            ],
+        })
+    return positions, prices
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--traders", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--coins", type=int, default=200)
+    parser.add_argument("--positions-per-trader", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'traders':>8} {'legacy BTC/ETH':>15} {'legacy all':>12} {'vectorized all':>15} {'speedup':>8}")
+    for n in args.traders:
+        positions, prices = make_snapshot(n, args.coins, args.positions_per_trader)
+
+        # Sanity check: both implementations agree on every coin
+        expected = legacy_aggregate(positions, prices)
+        actual = aggregate_all(positions, prices)
+        assert expected.keys() == actual.keys()
+        for coin in expected:
+            for field, value in expected[coin].items():
+                assert abs(value - actual[coin][field]) <= 1e-6 * max(1.0, abs(value)), (coin, field)
+
+        # The dense trader x coin path agrees too
+        _, coins, sizes, price_vector = snapshot_to_arrays(positions, prices)
+        dense = aggregate_arrays(sizes, price_vector)
+        for j, coin in enumerate(coins):
+            assert abs(dense["net_usd"][j] - expected[coin]["net_usd"]) <= 1e-6 * max(1.0, abs(expected[coin]["net_usd"]))
+
+        legacy_two = best_of(lambda: legacy_aggregate(positions, prices, ["BTC", "ETH"]), args.repeat)
+        legacy_all = best_of(lambda: legacy_aggregate(positions, prices), args.repeat)
+        vectorized = best_of(lambda: aggregate_all(positions, prices), args.repeat)
+        print(f"{n:>8} {legacy_two * 1000:>13.2f}ms {legacy_all * 1000:>10.2f}ms "
+              f"{vectorized * 1000:>13.2f}ms {legacy_all / vectorized:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Cost of evaluating the alert rules on each data point.
+
+Builds synthetic data points (per-trader positions plus per-coin aggregates) for a range of
+tracked trader and coin counts, with a few injected positioning shifts, and times
+AlertEngine.evaluate per tick with the default rules. This is the latency the alert stage
+adds after a data point is stored. Sinks are left out; the webhook sink only enqueues.
+
+Usage: python benchmarks/bench_alerts.py [--traders 100 1000 10000] [--coins 2 30 200] [--ticks 500]
+                                         [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import DEFAULT_CONFIG, AlertEngine, build_rules  # noqa: E402
+
+
+def synthetic_ticks(n_traders: int, n_coins: int, ticks: int, seed: int = 0) -> List[Dict]:
+    """Data points with a random walk in positioning and a mass flip every 100 ticks"""
+    rng = random.Random(seed)
+    coins = ["BTC", "ETH"] + [f"COIN{i}" for i in range(n_coins - 2)]
+    prices = {coin: 100000.0 if coin == "BTC" else 3500.0 if coin == "ETH" else rng.uniform(0.1, 200)
+              for coin in coins}
+    # Each trader holds a few coins, weighted towards the majors
+    holdings = {
+        f"0x{i:040x}": {coin: rng.choice((-1, 1)) * rng.lognormvariate(0, 1) * 1e5 / prices[coin]
+                        for coin in set(rng.choices(coins, weights=[20, 10] + [1] * (n_coins - 2), k=3))}
+        for i in range(n_traders)
+    }
+
+    points = []
+    start = time.time() - ticks * 300
+    for t in range(ticks):
+        for coins_held in rng.sample(list(holdings.values()), max(1, n_traders // 50)):
+            for coin in coins_held:
+                coins_held[coin] *= rng.uniform(0.8, 1.2)
+        if t and t % 100 == 0:
+            # A positioning shift: a fifth of the BTC holders change side
+            for coins_held in holdings.values():
+                if "BTC" in coins_held and rng.random() < 0.2:
+                    coins_held["BTC"] = -coins_held["BTC"]
+
+        index, aggregates = {}, {}
+        for address, coins_held in holdings.items():
+            index[address] = {}
+            for coin, size in coins_held.items():
+                usd = abs(size) * prices[coin]
+                index[address][coin] = {"size": size, "usd_value": usd, "entry_px": prices[coin], "leverage": 5}
+                aggregate = aggregates.setdefault(coin, {"long_usd": 0.0, "short_usd": 0.0, "net_usd": 0.0})
+                aggregate["long_usd" if size > 0 else "short_usd"] += usd
+                aggregate["net_usd"] += usd if size > 0 else -usd
+        points.append({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start + t * 300)),
+            "asset_positions": aggregates,
+            "asset_prices": prices,
+            "position_index": index,
+        })
+    return points
+
+
+def bench(n_traders: int, n_coins: int, ticks: int) -> Dict:
+    points = synthetic_ticks(n_traders, n_coins, ticks)
+    engine = AlertEngine(build_rules(DEFAULT_CONFIG["rules"]), sinks=[])
+    times = []
+    for point in points:
+        engine.evaluate(point)
+        times.append(engine.last_eval_seconds)
+    times.sort()
+    total = sum(engine.rule_seconds.values())
+    return {
+        "traders": n_traders,
+        "coins": n_coins,
+        "ticks": ticks,
+        "eval_p50_ms": times[len(times) // 2] * 1000,
+        "eval_p99_ms": times[int(len(times) * 0.99)] * 1000,
+        "eval_max_ms": times[-1] * 1000,
+        "alerts": engine.fired,
+        "suppressed": engine.suppressed,
+        "rule_share": {name: seconds / total for name, seconds in engine.rule_seconds.items()} if total else {},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--traders", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--coins", type=int, nargs="+", default=[2, 30, 200])
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{len(DEFAULT_CONFIG['rules'])} default rules, {args.ticks} ticks each")
+    print(f"{'traders':>8s} {'coins':>6s} {'p50 ms':>8s} {'p99 ms':>8s} {'max ms':>8s} {'alerts':>7s}  top rule")
+    for n_traders in args.traders:
+        for n_coins in args.coins:
+            r = bench(n_traders, max(2, n_coins), args.ticks)
+            results.append(r)
+            top = max(r["rule_share"], key=r["rule_share"].get) if r["rule_share"] else "-"
+            print(f"{n_traders:8d} {r['coins']:6d} {r['eval_p50_ms']:8.3f} {r['eval_p99_ms']:8.3f} "
+                  f"{r['eval_max_ms']:8.3f} {r['alerts']:7d}  {top} ({r['rule_share'].get(top, 0) * 100:.0f}%)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
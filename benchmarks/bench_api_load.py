@@ -0,0 +1,267 @@
+"""Load test of the API server: requests/s and latency per endpoint under concurrent clients.
+
+Builds a data directory with a week of 5-minute data points (positions from the Hyperliquid
+stand-in, delta-encoded and rolled up as the collector stores them), starts the stand-in as
+the upstream for prices and the leaderboard, then starts each server mode in turn and drives
+every endpoint with `--concurrency` clients for `--duration` seconds, followed by a mixed run
+over all endpoints. While the load runs a writer appends a new data point every
+`--append-seconds`, as the collector would, so servers also have to take in fresh data.
+
+Server modes:
+  debug     python api_server.py --debug: the previous serving mode; data is checked and
+            loaded, and upstream calls made, on the request path
+  dev       python api_server.py: Flask's threaded server with background preloading
+  gunicorn  gunicorn -c deploy/gunicorn.conf.py api_server:app (production)
+
+Usage: python benchmarks/bench_api_load.py [--servers debug gunicorn] [--concurrency 16] [--duration 5]
+                                           [--traders 200] [--days 7] [--workers 2]
+                                           [--latency-ms 150] [--json out.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from typing import Dict, List
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aggregation import aggregate_all, build_position_index, empty_aggregate  # noqa: E402
+from fake_hyperliquid import FakeHyperliquid  # noqa: E402
+from position_history import PositionDeltaEncoder  # noqa: E402
+from rollups import Compactor  # noqa: E402
+from storage import SegmentStore  # noqa: E402
+
+ENDPOINTS = [
+    "/api/health",
+    "/api/current-data",
+    "/api/net-positions",
+    "/api/time-series",
+    "/api/time-series?max_points=200",
+    "/api/time-series?hours=168&resolution=1h",
+    "/api/traders",
+    "/api/prices?coins=BTC,ETH",
+    "/api/stats",
+    "/metrics",
+]
+
+SERVERS = {
+    "debug": lambda port: [sys.executable, os.path.join(ROOT, "api_server.py"), "--debug", "--port", str(port)],
+    "dev": lambda port: [sys.executable, os.path.join(ROOT, "api_server.py"), "--port", str(port)],
+    "gunicorn": lambda port: [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "deploy", "gunicorn.conf.py"),
+                              "--bind", f"127.0.0.1:{port}", "--pythonpath", ROOT, "api_server:app"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, seconds: float = 60.0):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=5)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {seconds:.0f}s")
+
+
+class History:
+    """Data points in the collector's stored form, from the stand-in's trader positions"""
+
+    def __init__(self, directory: str, traders: int):
+        self.fake = FakeHyperliquid(traders=traders, active_fraction=0.7, churn=0.02)
+        self.active = [address for address in self.fake.addresses if self.fake.positions[address]]
+        self.store = SegmentStore(directory)
+        self.encoder = PositionDeltaEncoder()
+
+    def append(self, timestamp: float):
+        self.fake.step()
+        prices = dict(self.fake.prices)
+        positions = [{"address": address, "positions": self.fake.clearinghouse_state(address)["assetPositions"],
+                      "ok": True} for address in self.active]
+        aggregated = aggregate_all(positions, prices)
+        self.store.append(self.encoder.encode({
+            "timestamp": str(datetime.fromtimestamp(timestamp)),
+            "btc_price": prices["BTC"],
+            "eth_price": prices["ETH"],
+            "btc_positions": aggregated.get("BTC", empty_aggregate()),
+            "eth_positions": aggregated.get("ETH", empty_aggregate()),
+            "asset_positions": aggregated,
+            "asset_prices": {coin: prices[coin] for coin in aggregated},
+            "position_index": build_position_index(positions, prices),
+            "fetch_status": {"complete": True, "prices_ok": True, "traders_requested": len(self.active),
+                             "traders_failed": 0, "failed_traders": []},
+        }))
+
+
+@contextlib.contextmanager
+def appending(history: History, every: float):
+    """Append a data point every `every` seconds, like a (much faster) collector"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(every):
+            history.append(time.time())
+
+    thread = threading.Thread(target=run, daemon=True)
+    if every > 0:
+        thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        if every > 0:
+            thread.join()
+
+
+@contextlib.contextmanager
+def stand_in(traders: int, latency_ms: float, jitter_ms: float):
+    """fake_hyperliquid.py in a subprocess; same seed as History, so leaderboard addresses match"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "fake_hyperliquid.py"), "--port", str(port), "--traders", str(traders),
+         "--active-fraction", "0.7", "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms),
+         "--tick-seconds", "3600"],
+        stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for(f"{url}/stats")
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextlib.contextmanager
+def server(mode: str, workdir: str, upstream: str, workers: int):
+    port = free_port()
+    env = dict(os.environ, HYPERLIQUID_INFO_API=f"{upstream}/info", LEADERBOARD_API=f"{upstream}/leaderboard",
+               API_WORKERS=str(workers), PYTHONUNBUFFERED="1")
+    # Own process group: the debug server's reloader runs the app in a child process
+    process = subprocess.Popen(SERVERS[mode](port), cwd=workdir, env=env, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        start = time.perf_counter()
+        wait_for(f"{url}/api/health")
+        yield url, time.perf_counter() - start
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000 if ordered else 0.0
+
+
+async def drive(url: str, paths: List[str], concurrency: int, duration: float) -> Dict:
+    """`concurrency` clients issuing back-to-back requests over `paths` for `duration` seconds"""
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(session: aiohttp.ClientSession, offset: int):
+        nonlocal errors
+        i = offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                async with session.get(url + path) as response:
+                    await response.read()
+                    errors += response.status >= 400
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session, i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {"requests": len(latencies), "rps": len(latencies) / elapsed, "errors": errors,
+            "p50_ms": percentile(latencies, 0.50), "p99_ms": percentile(latencies, 0.99),
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0}
+
+
+def bench_server(mode: str, workdir: str, upstream: str, history: History, args) -> Dict:
+    with server(mode, workdir, upstream, args.workers) as (url, startup):
+        print(f"\n=== {mode} (ready in {startup:.1f}s) ===")
+        print(f"{'endpoint':42s} {'req/s':>8s} {'p50 ms':>8s} {'p99 ms':>8s} {'max ms':>8s} {'errors':>7s}")
+        results = {}
+        with appending(history, args.append_seconds):
+            for name, paths in [(path, [path]) for path in ENDPOINTS] + [("mixed", ENDPOINTS)]:
+                r = asyncio.run(drive(url, paths, args.concurrency, args.duration))
+                results[name] = r
+                print(f"{name:42s} {r['rps']:8.1f} {r['p50_ms']:8.1f} {r['p99_ms']:8.1f} {r['max_ms']:8.1f} "
+                      f"{r['errors']:7d}")
+    return {"startup_seconds": startup, "endpoints": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", nargs="+", choices=list(SERVERS), default=["debug", "gunicorn"])
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per endpoint")
+    parser.add_argument("--traders", type=int, default=200)
+    parser.add_argument("--days", type=float, default=7.0, help="history stored before the test")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--append-seconds", type=float, default=2.0, help="0 disables the writer")
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        history = History(os.path.join(workdir, "data"), args.traders)
+        points = int(args.days * 288)
+        start = time.perf_counter()
+        now = time.time()
+        for i in range(points):
+            history.append(now - (points - i) * 300)
+        Compactor(history.store).run()
+        print(f"{points} data points for {len(history.active)} traders stored in {time.perf_counter() - start:.1f}s; "
+              f"upstream latency {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, {args.concurrency} clients, "
+              f"{args.duration:.0f}s per endpoint")
+
+        results = {}
+        with stand_in(args.traders, args.latency_ms, args.jitter_ms) as upstream:
+            for mode in args.servers:
+                results[mode] = bench_server(mode, workdir, upstream, history, args)
+
+    if len(results) > 1:
+        before, after = args.servers[0], args.servers[-1]
+        print(f"\n=== {before} -> {after} ===")
+        print(f"{'endpoint':42s} {'req/s':>19s} {'p99 ms':>19s}")
+        for name, b in results[before]["endpoints"].items():
+            a = results[after]["endpoints"][name]
+            print(f"{name:42s} {b['rps']:8.1f} -> {a['rps']:8.1f} {b['p99_ms']:8.1f} -> {a['p99_ms']:8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
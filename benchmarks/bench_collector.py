@@ -0,0 +1,214 @@
+"""End-to-end collector benchmark against the local Hyperliquid stand-in.
+
+For each trader count it measures screening time, per-tick collection latency, aggregation
+cost, storage write cost and API server response times, all offline.
+
+Usage: python benchmarks/bench_collector.py [--traders 100 1000 10000] [--ticks 5] [--latency-ms 20]
+                                            [--error-rate 0.01] [--rate-limit-rate 0.01] [--json out.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest import HyperliquidBacktest  # noqa: E402
+from fake_hyperliquid import FakeHyperliquid, serve_in_thread  # noqa: E402
+from hl_client import HyperliquidClient  # noqa: E402
+from position_history import PositionDeltaEncoder  # noqa: E402
+from storage import SegmentStore  # noqa: E402
+
+API_ENDPOINTS = [
+    "/api/time-series",
+    "/api/time-series?max_points=200",
+    "/api/net-positions",
+    "/api/traders",
+    "/api/current-data",
+    "/api/stats",
+    "/api/health",
+]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max in milliseconds"""
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": ordered[-1] * 1000}
+
+
+@contextlib.contextmanager
+def quiet():
+    # The collector reports progress on stdout; keep the benchmark table readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+async def bench_collection(fake: FakeHyperliquid, base_url: str, ticks: int, concurrency: int) -> Dict:
+    # The stand-in enforces its own limits (if any), so the client-side budget is lifted
+    client = HyperliquidClient(f"{base_url}/info", f"{base_url}/leaderboard",
+                               weight_per_minute=1e9, max_connections=100, backoff_max=1.0)
+    backtest = HyperliquidBacktest(client.info_url, client.leaderboard_url, client=client)
+    backtest.screening_concurrency = concurrency
+    try:
+        board = await client.post_leaderboard({"limit": len(fake.addresses), "offset": 0})
+        addresses = [row["ethAddress"] for row in board["leaderboardRows"]]
+
+        start = time.perf_counter()
+        with quiet():
+            active = await backtest.screen_active_traders(addresses, len(addresses))
+        screening = {"seconds": time.perf_counter() - start, **backtest.last_screening_stats}
+
+        tick_times, records = [], []
+        for _ in range(ticks):
+            fake.step()
+            start = time.perf_counter()
+            with quiet():
+                records.append(await backtest.collect_data_point(active))
+            tick_times.append(time.perf_counter() - start)
+
+        return {"screening": screening, "active": active, "tick_times": tick_times,
+                "records": records, "client": client.stats()}
+    finally:
+        await client.close()
+
+
+def bench_aggregation(backtest: HyperliquidBacktest, record: Dict, repeat: int = 20) -> Dict:
+    positions = [p for p in record["trader_positions"] if p["ok"]]
+    prices = record["asset_prices"]  # every coin the snapshot holds
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backtest.aggregate_positions(positions, prices)
+        timings.append(time.perf_counter() - start)
+    return percentiles(timings)
+
+
+def bench_storage(records: List[Dict], directory: str) -> Dict:
+    store = SegmentStore(directory)
+    encoder = PositionDeltaEncoder()
+    timings = []
+    for record in records:
+        start = time.perf_counter()
+        store.append(encoder.encode(record))  # as the collector's save_data_point does
+        timings.append(time.perf_counter() - start)
+    size = sum(os.path.getsize(store.segment_path(seq)) for seq in store.segments())
+    return {**percentiles(timings), "bytes_per_record": size / len(records)}
+
+
+def bench_api(directory: str, base_url: str, requests_per_endpoint: int) -> Dict:
+    import api_server
+    from data_cache import DataCache
+    from leaderboard_cache import LeaderboardCache
+    from price_feed import PriceFeed
+
+    # Re-point the server's shared state at this run's store and stand-in
+    api_server.store = SegmentStore(directory)
+    api_server.data_cache = DataCache(api_server.store)
+    api_server.leaderboard_cache = LeaderboardCache(f"{base_url}/leaderboard")
+    api_server.price_feed = PriceFeed(f"{base_url}/info")
+    api_server.stats_reload_count = -1
+    client = api_server.app.test_client()
+
+    results = {}
+    for endpoint in API_ENDPOINTS:
+        client.get(endpoint)  # first request loads caches
+        timings = []
+        for _ in range(requests_per_endpoint):
+            start = time.perf_counter()
+            response = client.get(endpoint)
+            timings.append(time.perf_counter() - start)
+        results[endpoint] = {**percentiles(timings), "status": response.status_code,
+                             "bytes": len(response.data)}
+    return results
+
+
+def run(n_traders: int, args) -> Dict:
+    fake = FakeHyperliquid(traders=n_traders, coins=args.coins, latency_ms=args.latency_ms,
+                           jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                           rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    base_url, stop = serve_in_thread(fake)
+    try:
+        collected = asyncio.run(bench_collection(fake, base_url, args.ticks, args.concurrency))
+        backtest = HyperliquidBacktest(f"{base_url}/info", f"{base_url}/leaderboard")
+        aggregation = bench_aggregation(backtest, collected["records"][-1])
+
+        with tempfile.TemporaryDirectory() as directory:
+            storage = bench_storage(collected["records"], directory)
+            api = bench_api(directory, base_url, args.requests)
+    finally:
+        stop()
+
+    return {
+        "traders": n_traders,
+        "active": len(collected["active"]),
+        "screening": collected["screening"],
+        "tick": percentiles(collected["tick_times"]),
+        "aggregation": aggregation,
+        "storage": storage,
+        "api": api,
+        "client": collected["client"],
+        "server": fake.stats(),
+    }
+
+
+def report(result: Dict):
+    screening, tick = result["screening"], result["tick"]
+    print(f"\n=== {result['traders']} traders ({result['active']} active) ===")
+    print(f"screening    {screening['seconds']:8.2f} s   {screening['lookups_per_second']:8.1f} lookups/s"
+          f"   failed {screening['failed']}")
+    print(f"tick         p50 {tick['p50_ms']:9.1f} ms   p95 {tick['p95_ms']:9.1f} ms   p99 {tick['p99_ms']:9.1f} ms")
+    agg = result["aggregation"]
+    print(f"aggregation  p50 {agg['p50_ms']:9.2f} ms   p99 {agg['p99_ms']:9.2f} ms")
+    st = result["storage"]
+    print(f"storage      p50 {st['p50_ms']:9.2f} ms   p99 {st['p99_ms']:9.2f} ms   "
+          f"{st['bytes_per_record'] / 1024:,.0f} KiB/record")
+    for endpoint, timing in result["api"].items():
+        print(f"{endpoint:34s} p50 {timing['p50_ms']:8.2f} ms   p99 {timing['p99_ms']:8.2f} ms   "
+              f"HTTP {timing['status']}  {timing['bytes'] / 1024:,.0f} KiB")
+    client = result["client"]
+    print(f"upstream     {client['requests_sent']} requests, {client['retries']} retries, "
+          f"{client['failures']} failures (server injected {result['server']['errors_injected']} errors, "
+          f"{result['server']['rate_limited']} 429s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--traders", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--ticks", type=int, default=5, help="collection ticks per trader count")
+    parser.add_argument("--coins", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=20, help="screening workers")
+    parser.add_argument("--requests", type=int, default=50, help="requests per API endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    print(f"Stand-in latency {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, error rate {args.error_rate}, "
+          f"429 rate {args.rate_limit_rate}, {args.ticks} ticks per size")
+    results = []
+    for n_traders in args.traders:
+        result = run(n_traders, args)
+        report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nRaw results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
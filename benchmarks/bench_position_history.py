@@ -0,0 +1,175 @@
+"""Storage, load-time and reconstruction cost of delta-encoded position history.
+
+Reads captured data points with full `trader_positions` from a store directory (the collector's
+`data/` before delta encoding, or a copy of it). Without one, it collects `--ticks` points from
+the local Hyperliquid stand-in instead. The points are written once as full records and once
+delta-encoded, then both stores are compared on size, load time and memory, and every
+reconstructed tick is checked against the full record.
+
+Usage: python benchmarks/bench_position_history.py [--dir data] [--keyframe-interval 12]
+                                                   [--ticks 288 --traders 100 --churn 0.02]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import build_position_index  # noqa: E402
+from backtest import HyperliquidBacktest  # noqa: E402
+from data_cache import parse_timestamp  # noqa: E402
+from fake_hyperliquid import FakeHyperliquid, serve_in_thread  # noqa: E402
+from hl_client import HyperliquidClient  # noqa: E402
+from position_history import (DEFAULT_KEYFRAME_INTERVAL, PositionDeltaEncoder,  # noqa: E402
+                              PositionHistory, record_state)
+from storage import SegmentStore  # noqa: E402
+
+
+def captured_records(directory: str) -> List[Dict]:
+    """Stored data points that still carry full per-trader positions"""
+    return [r for r in SegmentStore(directory).iter_records() if "trader_positions" in r]
+
+
+async def collect_records(ticks: int, n_traders: int, churn: float, seed: int) -> List[Dict]:
+    fake = FakeHyperliquid(traders=n_traders * 3, churn=churn, seed=seed)
+    base_url, stop = serve_in_thread(fake)
+    client = HyperliquidClient(f"{base_url}/info", f"{base_url}/leaderboard", weight_per_minute=1e9)
+    backtest = HyperliquidBacktest(client.info_url, client.leaderboard_url, client=client)
+    records = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            traders = await backtest.get_top_traders_with_positions(n_traders)
+            start = time.time()
+            for tick in range(ticks):
+                fake.step()
+                record = await backtest.collect_data_point(traders)
+                # Space the points 5 minutes apart, as the collector would
+                record["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(start + tick * 300))
+                records.append(json.loads(json.dumps(record, default=str)))
+    finally:
+        await client.close()
+        stop()
+    return records
+
+
+def load(directory: str) -> Dict:
+    """Time and peak memory of reading a whole store, as load_existing_data does"""
+    store = SegmentStore(directory)
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = store.read_all()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"records": len(records), "bytes": store.total_bytes(), "load_seconds": seconds,
+            "peak_bytes": peak}
+
+
+def check(records: List[Dict], encoded: List[Dict]) -> int:
+    """Ticks whose reconstructed positions differ from the full record's"""
+    history = PositionHistory(encoded)
+    mismatches = 0
+    for record in records:
+        expected = record_state({"position_index": build_position_index(record["trader_positions"],
+                                                                        record.get("asset_prices") or {})})
+        actual = history.state_at(parse_timestamp(record["timestamp"]))
+        failed = set(record["fetch_status"]["failed_traders"])
+        if {a: c for a, c in actual.items() if a not in failed} != expected:
+            mismatches += 1
+    return mismatches
+
+
+def reconstruct(encoded: List[Dict], samples: int, seed: int) -> Dict:
+    history = PositionHistory(encoded)
+    timestamps = [parse_timestamp(r["timestamp"]) for r in encoded]
+    rng = random.Random(seed)
+
+    random_times = []
+    for ts in rng.choices(timestamps, k=samples):
+        history._cached = (-1, {})  # cold: replay from the keyframe
+        start = time.perf_counter()
+        history.index_at(ts)
+        random_times.append(time.perf_counter() - start)
+
+    history = PositionHistory()
+    append_times = []
+    for record in encoded:
+        history.extend([record])
+        start = time.perf_counter()
+        history.index_at()  # what the API server does after each new point
+        append_times.append(time.perf_counter() - start)
+
+    return {
+        "random_at_p50_ms": sorted(random_times)[len(random_times) // 2] * 1000,
+        "random_at_max_ms": max(random_times) * 1000,
+        "latest_after_append_mean_ms": sum(append_times) / len(append_times) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", default="data", help="store with captured full data points")
+    parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL)
+    parser.add_argument("--ticks", type=int, default=288, help="points to collect without captured data")
+    parser.add_argument("--traders", type=int, default=100)
+    parser.add_argument("--churn", type=float, default=0.02, help="stand-in traders re-positioned per tick")
+    parser.add_argument("--samples", type=int, default=200, help="random reconstruct-at-time lookups")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    records = captured_records(args.dir) if os.path.isdir(args.dir) else []
+    if records:
+        source = f"{len(records)} captured data points from {args.dir}/"
+    else:
+        records = asyncio.run(collect_records(args.ticks, args.traders, args.churn, args.seed))
+        source = (f"{len(records)} data points from the stand-in "
+                  f"({args.traders} traders, churn {args.churn} per tick)")
+    print(f"Using {source}, keyframe every {args.keyframe_interval} ticks")
+
+    encoder = PositionDeltaEncoder(args.keyframe_interval)
+    encoded = [encoder.encode(record) for record in records]
+
+    with tempfile.TemporaryDirectory() as full_dir, tempfile.TemporaryDirectory() as delta_dir:
+        SegmentStore(full_dir).append_many(records)
+        SegmentStore(delta_dir).append_many(encoded)
+        full, delta = load(full_dir), load(delta_dir)
+
+    results = {
+        "source": source,
+        "keyframe_interval": args.keyframe_interval,
+        "full": full,
+        "delta": delta,
+        "reconstruction": reconstruct(encoded, args.samples, args.seed),
+        "mismatched_ticks": check(records, encoded),
+    }
+
+    print(f"{'':8s} {'KiB/point':>10s} {'load ms':>10s} {'peak MiB':>10s}")
+    for name in ("full", "delta"):
+        r = results[name]
+        print(f"{name:8s} {r['bytes'] / r['records'] / 1024:10.1f} {r['load_seconds'] * 1000:10.1f} "
+              f"{r['peak_bytes'] / 1024 / 1024:10.1f}")
+    print(f"storage {full['bytes'] / delta['bytes']:.1f}x smaller, load {full['load_seconds'] / delta['load_seconds']:.1f}x "
+          f"faster, peak memory {full['peak_bytes'] / delta['peak_bytes']:.1f}x lower")
+    rec = results["reconstruction"]
+    print(f"reconstruct-at-time p50 {rec['random_at_p50_ms']:.2f} ms, max {rec['random_at_max_ms']:.2f} ms; "
+          f"latest after append {rec['latest_after_append_mean_ms']:.3f} ms")
+    print(f"mismatched ticks: {results['mismatched_ticks']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Scaling of the sharded collector with the number of worker processes.
+
+Starts the Hyperliquid stand-in in its own process, then for each worker count screens the
+leaderboard and times collection ticks for the same number of tracked traders. Reports tick
+latency, throughput (traders per second), speedup over one worker and scaling efficiency
+(speedup / workers). Client-side rate budgets are lifted so the measurement reflects
+collection work, not the Info API limit.
+
+Usage: python benchmarks/bench_sharded.py [--traders 2000] [--workers 1 2 4 8] [--ticks 3]
+                                          [--latency-ms 20] [--json out.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backtest import HyperliquidBacktest  # noqa: E402
+from hl_client import HyperliquidClient  # noqa: E402
+from sharded_collector import ShardedCollector  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def stand_in(traders: int, latency_ms: float, jitter_ms: float):
+    """fake_hyperliquid.py in a subprocess, so serving requests does not compete with the coordinator"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "fake_hyperliquid.py"), "--port", str(port), "--traders", str(traders),
+         "--active-fraction", "0.7", "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms),
+         "--tick-seconds", "3600"],
+        stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f"{url}/stats", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def bench_workers(url: str, workers: int, traders: int, ticks: int) -> Dict:
+    client = HyperliquidClient(f"{url}/info", f"{url}/leaderboard", weight_per_minute=1e9)
+    backtest = HyperliquidBacktest(client.info_url, client.leaderboard_url, client=client)
+    collector = ShardedCollector(backtest, workers, weight_per_minute=1e9, shared_ip=False, max_connections=100,
+                                 coordinator_weight_per_minute=1e9)
+    collector.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            tracked = await collector.screen(traders)
+            screening = time.perf_counter() - start
+            await collector.assign(tracked)
+            tick_times, shard_times = [], []
+            for _ in range(ticks):
+                start = time.perf_counter()
+                data_point = await collector.collect_data_point(tracked)
+                tick_times.append(time.perf_counter() - start)
+                shard_times.append(max(s["fetch_seconds"] for s in collector.last_tick["shards"]))
+    finally:
+        collector.stop()
+        await client.close()
+
+    tick = sorted(tick_times)[len(tick_times) // 2]
+    return {
+        "workers": workers,
+        "traders": len(tracked),
+        "screening_seconds": screening,
+        "tick_seconds": tick,
+        "slowest_shard_seconds": sorted(shard_times)[len(shard_times) // 2],
+        "traders_per_second": len(tracked) / tick,
+        "coins": len(data_point["asset_positions"]),
+        "failed": data_point["fetch_status"]["traders_failed"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--traders", type=int, default=2000, help="active traders to track")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--ticks", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with stand_in(args.traders * 3, args.latency_ms, args.jitter_ms) as url:
+        for workers in args.workers:
+            results.append(asyncio.run(bench_workers(url, workers, args.traders, args.ticks)))
+
+    base = results[0]["traders_per_second"] / results[0]["workers"]
+    print(f"Top {args.traders} traders, stand-in latency {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8s} {'screen s':>9s} {'tick s':>8s} {'traders/s':>10s} {'speedup':>8s} {'efficiency':>11s}")
+    for r in results:
+        r["speedup"] = r["traders_per_second"] / results[0]["traders_per_second"] * results[0]["workers"]
+        r["efficiency"] = r["traders_per_second"] / (base * r["workers"])
+        print(f"{r['workers']:8d} {r['screening_seconds']:9.2f} {r['tick_seconds']:8.2f} "
+              f"{r['traders_per_second']:10.0f} {r['speedup']:8.2f} {r['efficiency'] * 100:10.0f}%")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Startup time and baseline memory of each CLI subcommand.
+
+Runs every subcommand in a fresh interpreter, from an empty scratch directory, and stops it
+where its real work would begin: the collectors and `screen` when they would start their
+event loop (after imports and setup), `analyze` after finding nothing to analyse. Reports
+the wall time from process spawn to that point, the peak RSS and which heavy modules got
+imported. "shard worker" is what each sharded-collector worker process imports.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("numpy", "pandas", "matplotlib", "seaborn", "aiohttp", "requests", "flask")
+
+COMMANDS = {
+    "python (bare)": None,
+    "collect": ["collect"],
+    "collect --mode ws": ["collect", "--mode", "ws"],
+    "collect --mode sharded": ["collect", "--mode", "sharded"],
+    "shard worker": "sharded_collector",
+    "screen": ["screen"],
+    "analyze": ["analyze", "--no-parquet"],
+}
+
+# Runs in the child: report at exit, and end the process instead of entering the event loop
+PROBE = """
+import atexit, asyncio, json, resource, sys
+def report():
+    heavy = [name for name in {heavy!r} if name in sys.modules]
+    print("PROBE " + json.dumps({{"rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                                  "modules": len(sys.modules), "heavy": heavy}}))
+atexit.register(report)
+def stop(coroutine, **kwargs):
+    coroutine.close()
+    sys.exit(0)
+asyncio.run = stop
+sys.path.insert(0, {root!r})
+{body}
+"""
+
+
+def probe_source(command) -> str:
+    if command is None:
+        body = "pass"
+    elif isinstance(command, str):
+        body = f"import {command}"
+    else:
+        body = f"import cli\ncli.main({command!r})"
+    return PROBE.format(heavy=HEAVY, root=ROOT, body=body)
+
+
+def run_once(command, workdir: str) -> Dict:
+    env = dict(os.environ, HYPERLIQUID_INFO_API="http://127.0.0.1:9/info",
+               LEADERBOARD_API="http://127.0.0.1:9/leaderboard")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", probe_source(command)], cwd=workdir, env=env,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    line = next((l for l in result.stdout.splitlines() if l.startswith("PROBE ")), None)
+    if line is None:
+        raise RuntimeError(f"{command} did not report:\n{result.stdout}{result.stderr}")
+    return {"seconds": elapsed, **json.loads(line[len("PROBE "):])}
+
+
+def bench(name: str, command, repeat: int) -> Dict:
+    runs: List[Dict] = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            runs.append(run_once(command, workdir))
+    return {
+        "command": name,
+        "startup_ms": statistics.median(r["seconds"] for r in runs) * 1000,
+        "rss_mb": statistics.median(r["rss_mb"] for r in runs),
+        "modules": runs[-1]["modules"],
+        "heavy": runs[-1]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per subcommand; the median is reported")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'subcommand':24s} {'startup ms':>11s} {'RSS MB':>8s} {'modules':>8s}  heavy imports")
+    for name, command in COMMANDS.items():
+        r = bench(name, command, args.repeat)
+        results.append(r)
+        print(f"{name:24s} {r['startup_ms']:11.0f} {r['rss_mb']:8.1f} {r['modules']:8d}  {', '.join(r['heavy']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
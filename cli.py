@@ -0,0 +1,85 @@
+"""Command-line entry point: collect, analyze or screen.
+
+    python cli.py collect 24                          # poll the top active traders for 24 hours
+    python cli.py collect 24 --mode sharded --workers 4 --traders 2000
+    python cli.py collect 24 --mode ws                # WebSocket fills collector
+    python cli.py analyze --plots                     # report (and chart) from the stored data
+    python cli.py screen --traders 50                 # top leaderboard traders with open positions
+
+Each subcommand imports only its own modules, when it runs. The collectors load pandas
+only for the report at the end of a run, so a long-running collector (and each of its
+shard workers) starts fast and stays small while collecting; `analyze` pays for pandas and
+matplotlib on demand. Arguments after the subcommand go to the underlying tool, so
+`python cli.py collect --mode sharded --help` lists its options.
+"""
+import argparse
+import asyncio
+import json
+from typing import List, Optional
+
+COLLECTORS = ("poll", "ws", "sharded")
+
+
+def collect(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="cli.py collect", add_help=False)
+    parser.add_argument("--mode", choices=COLLECTORS, default="poll")
+    args, rest = parser.parse_known_args(argv)
+    prog = f"cli.py collect --mode {args.mode}"
+    if args.mode == "ws":
+        from ws_collector import main
+    elif args.mode == "sharded":
+        from sharded_collector import main
+    else:
+        from backtest import main
+    main(rest, prog=prog)
+
+
+def analyze(argv: List[str]):
+    from analysis import main
+    main(argv, prog="cli.py analyze")
+
+
+def screen(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="cli.py screen",
+                                     description="Print the top leaderboard traders that hold open positions")
+    parser.add_argument("--traders", type=int, default=100, help="how many to find (default: %(default)s)")
+    parser.add_argument("--json", help="also write the addresses to this file")
+    args = parser.parse_args(argv)
+
+    from backtest import HyperliquidBacktest
+
+    async def run() -> List[str]:
+        backtest = HyperliquidBacktest()
+        try:
+            return await backtest.get_top_traders_with_positions(args.traders)
+        finally:
+            await backtest.client.close()
+
+    traders = asyncio.run(run())
+    for rank, address in enumerate(traders, 1):
+        print(f"{rank:4d}  {address}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(traders, f, indent=2)
+        print(f"Addresses written to {args.json}")
+
+
+COMMANDS = {
+    "collect": (collect, "collect data points (--mode poll|ws|sharded)"),
+    "analyze": (analyze, "write the report and optional chart from stored data"),
+    "screen": (screen, "list the top leaderboard traders with open positions"),
+}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Hyperliquid leaderboard tracker",
+                                     epilog="Run a subcommand with --help for its options.")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="command")
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+    COMMANDS[args.command][0](rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import type { NextApiRequest, NextApiResponse } from 'next';
+
+// Stream responses must not be buffered or time out like regular API routes
+export const config = {
+  api: {
+    responseLimit: false,
+  },
+};
+
+export default async function handler(
+  req: NextApiRequest,
+  res: NextApiResponse
+) {
+  if (req.method !== 'GET') {
+    return res.status(405).json({ message: 'Method not allowed' });
+  }
+
+  const apiServerUrl = process.env.API_SERVER_URL;
+
+  if (!apiServerUrl || apiServerUrl.includes('YOUR_DIGITAL_OCEAN_IP')) {
+    console.log('API_SERVER_URL not configured properly');
+    return res.status(503).end();
+  }
+
+  // Forward the resume position: EventSource sends Last-Event-ID on reconnect
+  const params = new URLSearchParams();
+  if (typeof req.query.last_id === 'string') params.set('last_id', req.query.last_id);
+  const headers: Record<string, string> = {};
+  const lastEventId = req.headers['last-event-id'];
+  if (typeof lastEventId === 'string') headers['Last-Event-ID'] = lastEventId;
+
+  const controller = new AbortController();
+  req.on('close', () => controller.abort());
+
+  try {
+    const upstream = await fetch(`${apiServerUrl}/api/stream?${params.toString()}`, {
+      headers,
+      signal: controller.signal,
+    });
+
+    if (!upstream.ok || !upstream.body) {
+      console.error('Backend returned error:', upstream.status, upstream.statusText);
+      // Pass the stream limit through so the client backs off instead of seeing a broken proxy
+      if (upstream.status === 503) {
+        const retryAfter = upstream.headers.get('retry-after');
+        if (retryAfter) res.setHeader('Retry-After', retryAfter);
+        return res.status(503).end();
+      }
+      return res.status(502).end();
+    }
+
+    res.writeHead(200, {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache, no-transform',
+      Connection: 'keep-alive',
+    });
+
+    const reader = upstream.body.getReader();
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      res.write(value);
+    }
+    res.end();
+  } catch (error) {
+    if (!controller.signal.aborted) {
+      console.error('Error proxying stream:', error);
+    }
+    res.end();
+  }
+}
@@ -11,7 +11,12 @@ export default async function handler(
   try {
     // Proxy to your backend API server
     const apiServerUrl = process.env.API_SERVER_URL;
-    const hours = req.query.hours || '24';
+    // Forward range and downsampling parameters (hours, start, end, max_points, resolution, method, field)
+    const params = new URLSearchParams();
+    for (const [key, value] of Object.entries(req.query)) {
+      if (typeof value === 'string') params.set(key, value);
+    }
+    if (!params.has('hours') && !params.has('start')) params.set('hours', '24');
     
     if (!apiServerUrl || apiServerUrl.includes('YOUR_DIGITAL_OCEAN_IP')) {
       console.log('API_SERVER_URL not configured properly');
@@ -19,7 +24,7 @@ export default async function handler(
       return res.status(200).json([]);
     }
     
-    const response = await fetch(`${apiServerUrl}/api/time-series?hours=${hours}`);
+    const response = await fetch(`${apiServerUrl}/api/time-series?${params.toString()}`);
     
     if (!response.ok) {
       console.error('Backend returned error:', response.status, response.statusText);
@@ -27,6 +32,10 @@ export default async function handler(
     }
 
     const data = await response.json();
+
+    // Lets the dashboard resume the data point stream right after this history
+    const lastEventId = response.headers.get('X-Last-Event-Id');
+    if (lastEventId) res.setHeader('X-Last-Event-Id', lastEventId);
     
     res.status(200).json(data);
   } catch (error) {
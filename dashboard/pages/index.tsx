@@ -23,6 +23,13 @@ interface Trader {
   eth_position_usd?: number;
 }
 
+interface StreamEvent {
+  point: DataPoint;
+  net_positions: NetPosition[];
+}
+
+const HISTORY_HOURS = 24;
+
 interface NetPosition {
   asset: string;
   long_usd: number;
@@ -42,15 +49,61 @@ export default function Dashboard() {
   const [lastUpdate, setLastUpdate] = useState<Date | null>(null);
 
   useEffect(() => {
-    fetchData();
-    const interval = setInterval(fetchData, 5 * 60 * 1000); // Update every 5 minutes
-    return () => clearInterval(interval);
+    let source: EventSource | null = null;
+    let fallback: ReturnType<typeof setInterval> | null = null;
+    let cancelled = false;
+
+    // Load history once, then apply data points pushed by the server as they are collected
+    fetchData().then((lastEventId) => {
+      if (cancelled) return;
+      const query = lastEventId ? `?last_id=${lastEventId}` : '';
+      source = new EventSource(`/api/stream${query}`);
+
+      source.addEventListener('data_point', (event) => {
+        const message: StreamEvent = JSON.parse((event as MessageEvent).data);
+        setTimeSeriesData((previous) => appendPoint(previous, message.point));
+        setNetPositions(message.net_positions);
+        setLastUpdate(new Date());
+        fetchTraders();
+      });
+
+      source.onerror = () => {
+        // EventSource reconnects by itself; only fall back to polling if it gave up
+        if (source?.readyState === EventSource.CLOSED && !fallback) {
+          fallback = setInterval(fetchData, 5 * 60 * 1000);
+        }
+      };
+    });
+
+    return () => {
+      cancelled = true;
+      source?.close();
+      if (fallback) clearInterval(fallback);
+    };
   }, []);
 
-  const fetchData = async () => {
+  const appendPoint = (previous: DataPoint[], point: DataPoint) => {
+    if (previous.some((p) => p.timestamp === point.timestamp)) return previous;
+    const newest = new Date(point.timestamp.replace(' ', 'T')).getTime();
+    const cutoff = newest - HISTORY_HOURS * 60 * 60 * 1000;
+    return [...previous, point].filter(
+      (p) => new Date(p.timestamp.replace(' ', 'T')).getTime() >= cutoff
+    );
+  };
+
+  const fetchTraders = async () => {
+    try {
+      const tradersRes = await fetch('/api/traders');
+      setTraders(await tradersRes.json());
+    } catch (error) {
+      console.error('Error fetching traders:', error);
+    }
+  };
+
+  const fetchData = async (): Promise<string | null> => {
     try {
       const [timeSeriesRes, netPositionsRes, tradersRes] = await Promise.all([
-        fetch('/api/time-series'),
+        fetch(`/api/time-series?hours=${HISTORY_HOURS}`),
         fetch('/api/net-positions'),
         fetch('/api/traders')
       ]);
@@ -64,9 +117,12 @@ export default function Dashboard() {
       setTraders(tradersData);
       setLastUpdate(new Date());
       setLoading(false);
+      // Id of the newest point in the history, so the stream resumes right after it
+      return timeSeriesRes.headers.get('X-Last-Event-Id');
     } catch (error) {
       console.error('Error fetching data:', error);
       setLoading(false);
+      return null;
     }
   };
 
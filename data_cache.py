@@ -0,0 +1,200 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from storage import LEGACY_PATTERN, SegmentStore, StorePosition
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """Epoch seconds for a stored timestamp string, or None if it cannot be parsed"""
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class DataCache:
+    """Process-wide in-memory copy of the stored data points.
+
+    The dataset is read once; afterwards each access only stats the store's segment files.
+    If nothing changed the cached list is returned as is (a hit). If the newest segment grew
+    or new segments appeared, only the appended records are read (an incremental load).
+    Anything else, e.g. segments rewritten or removed, triggers a full reload.
+
+    Timestamps are parsed once as records arrive and kept in a sorted index, so time-range
+    lookups are a binary search rather than a scan of the whole history.
+    """
+
+    def __init__(self, store: SegmentStore, check_interval: float = 1.0, legacy: bool = True):
+        self.store = store
+        self.check_interval = check_interval  # seconds between change checks
+        self.legacy = legacy  # fall back to legacy JSON checkpoints while the store is empty
+        self._lock = threading.Lock()
+        self._records: List[Dict] = []
+        # Sorted (timestamps, records) pair, swapped as one tuple so readers see a consistent view
+        self._index: Tuple[List[float], List[Dict]] = ([], [])
+        self._position: Optional[StorePosition] = None
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.appends = 0
+
+    def _store_signature(self) -> Tuple:
+        """(seq, size, mtime) per segment, or the newest legacy file if the store is empty"""
+        signature = []
+        for seq in self.store.segments():
+            try:
+                st = os.stat(self.store.segment_path(seq))
+            except FileNotFoundError:
+                continue
+            signature.append((seq, st.st_size, st.st_mtime_ns))
+        if any(size for _, size, _ in signature):
+            return ("store", tuple(signature))
+        if not self.legacy:
+            return ("empty", ())
+
+        # Fall back to a legacy JSON checkpoint until it has been converted
+        data_files = sorted(glob.glob(LEGACY_PATTERN))
+        if data_files:
+            st = os.stat(data_files[-1])
+            return ("legacy", ((data_files[-1], st.st_size, st.st_mtime_ns),))
+        return ("empty", ())
+
+    def _is_append(self, old: Tuple, new: Tuple) -> bool:
+        """True if `new` only differs from `old` by growth of the last segment or new segments"""
+        if old is None or old[0] != "store" or new[0] != "store":
+            return False
+        old_segments, new_segments = old[1], new[1]
+        if not old_segments or len(new_segments) < len(old_segments):
+            return False
+        # Every sealed segment must be untouched
+        if new_segments[:len(old_segments) - 1] != old_segments[:-1]:
+            return False
+        old_seq, old_size, _ = old_segments[-1]
+        new_seq, new_size, _ = new_segments[len(old_segments) - 1]
+        return new_seq == old_seq and new_size >= old_size
+
+    def _reload(self, signature: Tuple):
+        kind = signature[0]
+        if kind == "store":
+            self._records, self._position = self.store.read_since(None)
+        elif kind == "legacy":
+            path = signature[1][0][0]
+            with open(path, "r") as f:
+                self._records = json.load(f)
+            self._position = None
+        else:
+            self._records, self._position = [], None
+        self._index = self._build_index(self._records)
+        self.reloads += 1
+
+    def _append(self):
+        new_records, self._position = self.store.read_since(self._position)
+        # Build a new list so callers holding the previous one see a consistent snapshot
+        self._records = self._records + new_records
+
+        timestamps, indexed = self._index
+        new_index = self._build_index(new_records)
+        if timestamps and new_index[0] and new_index[0][0] < timestamps[-1]:
+            # Out-of-order arrival; rebuild rather than break the sort order
+            self._index = self._build_index(self._records)
+        else:
+            self._index = (timestamps + new_index[0], indexed + new_index[1])
+        self.appends += 1
+
+    @staticmethod
+    def _build_index(records: List[Dict]) -> Tuple[List[float], List[Dict]]:
+        pairs = []
+        for record in records:
+            ts = parse_timestamp(record.get('timestamp'))
+            if ts is not None:
+                pairs.append((ts, record))
+        if any(pairs[i][0] > pairs[i + 1][0] for i in range(len(pairs) - 1)):
+            pairs.sort(key=lambda pair: pair[0])
+        return [ts for ts, _ in pairs], [record for _, record in pairs]
+
+    def get(self) -> List[Dict]:
+        """Current list of data points, oldest first. Callers must not mutate it."""
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked_at < self.check_interval:
+            self.hits += 1
+            return self._records
+
+        with self._lock:
+            if self._check(now):
+                self.misses += 1
+            else:
+                self.hits += 1
+            return self._records
+
+    def refresh(self) -> bool:
+        """Check the store now, whatever the check interval; True if anything was (re)loaded.
+
+        Lets a background task keep the cache current while readers run with
+        `check_interval=float('inf')` and never touch the filesystem themselves.
+        """
+        with self._lock:
+            return self._check(time.monotonic())
+
+    def _check(self, now: float) -> bool:
+        self._checked_at = now
+        signature = self._store_signature()
+        if signature == self._signature:
+            return False
+
+        try:
+            if self._is_append(self._signature, signature):
+                self._append()
+            else:
+                self._reload(signature)
+            self._signature = signature
+        except Exception as e:
+            print(f"Error loading data: {e}")
+        return True
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[List[float], List[Dict]]:
+        """Timestamps (epoch seconds) and records with start <= timestamp <= end, oldest first"""
+        self.get()
+        timestamps, records = self._index
+        lo = bisect_left(timestamps, start) if start is not None else 0
+        hi = bisect_right(timestamps, end) if end is not None else len(timestamps)
+        return timestamps[lo:hi], records[lo:hi]
+
+    def point_at_or_before(self, timestamp: float) -> Optional[Dict]:
+        """Newest record with a timestamp <= `timestamp`"""
+        self.get()
+        timestamps, records = self._index
+        i = bisect_right(timestamps, timestamp)
+        return records[i - 1] if i else None
+
+    def first_timestamp(self) -> Optional[float]:
+        """Epoch seconds of the oldest indexed record"""
+        self.get()
+        timestamps = self._index[0]
+        return timestamps[0] if timestamps else None
+
+    def last_timestamp(self) -> Optional[float]:
+        """Epoch seconds of the newest indexed record"""
+        self.get()
+        timestamps = self._index[0]
+        return timestamps[-1] if timestamps else None
+
+    def stats(self) -> Dict:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "records": len(self._records),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "appends": self.appends,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
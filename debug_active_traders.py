@@ -1,30 +1,27 @@
 import asyncio
-import aiohttp
-import requests
 import json
+from hl_client import HyperliquidClient
 
 async def check_active_vs_inactive_traders():
     """Compare active vs inactive top PNL traders"""
     
+    client = HyperliquidClient()
+    
     # Get top 50 traders by PNL
-    leaderboard_response = requests.post(
-        "http://localhost:3000/leaderboard",
-        json={"limit": 50}
-    )
-    traders = [t["ethAddress"] for t in leaderboard_response.json()["leaderboardRows"]]
+    leaderboard = await client.post_leaderboard({"limit": 50})
+    traders = [t["ethAddress"] for t in leaderboard["leaderboardRows"]]
     
     print(f"🔍 Checking activity status of top 50 PNL traders:\n")
     
     active_traders = []
     inactive_traders = []
     
-    async with aiohttp.ClientSession() as session:
+    async with client:
         for i, trader in enumerate(traders):
             try:
                 # Get trader's positions
                 payload = {"type": "clearinghouseState", "user": trader}
-                async with session.post("https://api.hyperliquid.xyz/info", json=payload) as response:
-                    data = await response.json()
+                data = await client.post_info(payload)
                 
                 # Check if trader has any open positions
                 has_positions = False
@@ -1,23 +1,50 @@
 #!/bin/bash
 # Backup script to run via cron
+#
+# Raw data points older than RAW_RETENTION_DAYS are expired by the collector's compaction stage
+# once they are rolled up into data/rollups/, so the backups below stay bounded too:
+# - sealed raw segments never change and are archived once, then removed with their source
+# - each run archives the rollups, the active segment and the latest report
+# - legacy backtest_data_*.json checkpoints are imported into the store, archived once and removed
 
 BACKUP_DIR="/opt/hyperliquid-backtest/backups"
 DATA_DIR="/opt/hyperliquid-backtest"
+BACKUP_RETENTION_DAYS=${BACKUP_RETENTION_DAYS:-7}
 TIMESTAMP=$(date +%Y%m%d_%H%M%S)
 
-# Create backup directory
-mkdir -p $BACKUP_DIR
+# Create backup directories
+mkdir -p "$BACKUP_DIR/segments"
+cd "$DATA_DIR" || exit 1
 
-# Backup current data files
+# Legacy checkpoints each hold the full history up to their save time; import what is missing
+LEGACY=$(ls backtest_data_*.json 2>/dev/null)
+if [ -n "$LEGACY" ]; then
+    venv/bin/python storage.py convert \
+        && tar -czf "$BACKUP_DIR/legacy_$TIMESTAMP.tar.gz" $LEGACY \
+        && rm -f $LEGACY
+fi
+
+# Archive sealed segments once; drop archives whose segment has expired
+ACTIVE=$(ls data/segment_*.jsonl 2>/dev/null | tail -n 1)
+for SEGMENT in data/segment_*.jsonl; do
+    [ -e "$SEGMENT" ] && [ "$SEGMENT" != "$ACTIVE" ] || continue
+    ARCHIVE="$BACKUP_DIR/segments/$(basename "$SEGMENT").gz"
+    [ -e "$ARCHIVE" ] || gzip -c "$SEGMENT" > "$ARCHIVE"
+done
+for ARCHIVE in "$BACKUP_DIR"/segments/segment_*.jsonl.gz; do
+    [ -e "$ARCHIVE" ] || continue
+    [ -e "data/$(basename "$ARCHIVE" .gz)" ] || rm -f "$ARCHIVE"
+done
+
+# Backup the current state
 tar -czf "$BACKUP_DIR/backup_$TIMESTAMP.tar.gz" \
-    -C "$DATA_DIR" \
-    "backtest_data_current.json" \
-    "backtest_data_*.json" \
-    "backtest_processed_*.csv" \
+    "data/rollups" \
+    ${ACTIVE:+"$ACTIVE"} \
+    "backtest_report.json" \
     2>/dev/null
 
-# Keep only last 7 days of backups
-find $BACKUP_DIR -name "backup_*.tar.gz" -mtime +7 -delete
+# Keep only the last BACKUP_RETENTION_DAYS days of backups
+find "$BACKUP_DIR" -maxdepth 1 -name "backup_*.tar.gz" -mtime +"$BACKUP_RETENTION_DAYS" -delete
 
 # Optional: sync to object storage (Digital Ocean Spaces)
-# s3cmd put "$BACKUP_DIR/backup_$TIMESTAMP.tar.gz" s3://your-bucket/backups/
\ No newline at end of file
+# s3cmd sync "$BACKUP_DIR/" s3://your-bucket/backups/
@@ -0,0 +1,37 @@
+# Gunicorn settings for the API server in production:
+#
+#   venv/bin/gunicorn -c deploy/gunicorn.conf.py api_server:app
+#
+# Each worker process preloads the dataset, prices and leaderboard before it accepts
+# requests, then keeps them fresh from a background thread (api_server.start_background_refresh),
+# so handlers never parse files or wait on an upstream call. Workers hold their own copy of
+# the data, so size API_WORKERS to memory as well as CPUs. gthread workers serve requests
+# from a thread pool; every open /api/stream connection holds one of its threads, and after
+# the client goes away the thread is only freed once a 15 s keep-alive write fails (up to ~30 s).
+#
+# API_MAX_STREAMS caps the open streams per worker (default: half of API_THREADS), so the
+# other threads stay free for regular requests. Beyond the cap /api/stream answers 503 with
+# Retry-After and the dashboard falls back to polling. The server as a whole holds up to
+# API_WORKERS x API_MAX_STREAMS streams (16 with the defaults); raise API_THREADS along with
+# it to serve more.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get("API_WORKERS", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("API_THREADS", 16))
+# Read by api_server in each worker
+os.environ.setdefault("API_MAX_STREAMS", str(max(1, threads // 2)))
+timeout = 30
+graceful_timeout = 10
+keepalive = 5
+
+
+def post_worker_init(worker):
+    import api_server
+    api_server.start_background_refresh()
+
+
+def worker_exit(server, worker):
+    import api_server
+    api_server.refresher.stop()
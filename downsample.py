@@ -0,0 +1,67 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets: pick `threshold` indices that preserve the series shape.
+
+    The first and last points are always kept. Each bucket in between contributes the point
+    forming the largest triangle with the previously selected point and the average of the
+    next bucket, so peaks and troughs survive the reduction.
+    """
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1]
+
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0  # index of the previously selected point
+
+    for i in range(threshold - 2):
+        # Average of the next bucket (or the last point for the final bucket)
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = xs[n - 1], ys[n - 1]
+        else:
+            count = next_end - next_start
+            avg_x = sum(xs[next_start:next_end]) / count
+            avg_y = sum(ys[next_start:next_end]) / count
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
+
+
+def bucket_mean(xs: np.ndarray, columns: Dict[str, np.ndarray], bucket_seconds: float,
+                weights: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Mean of each column over fixed-width time buckets: (bucket start times, {field: means}).
+
+    One entry per non-empty bucket. `xs` must be sorted; buckets are aligned to multiples of
+    `bucket_seconds`. With `weights` (e.g. the point count behind each rollup row) the means
+    are weighted.
+    """
+    buckets = np.floor_divide(xs, bucket_seconds)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]]) if len(xs) else np.array([], dtype=int)
+    if weights is None:
+        counts = np.diff(np.r_[starts, len(xs)])
+        means = {field: np.add.reduceat(values, starts) / counts if len(xs) else values[:0]
+                 for field, values in columns.items()}
+    else:
+        totals = np.add.reduceat(weights, starts) if len(xs) else weights[:0]
+        means = {field: np.add.reduceat(values * weights, starts) / totals if len(xs) else values[:0]
+                 for field, values in columns.items()}
+    return buckets[starts] * bucket_seconds, means
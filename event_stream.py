@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from data_cache import DataCache
+
+
+def event_id(timestamp: float) -> str:
+    """Stream event id for a data point: its timestamp in epoch milliseconds.
+
+    Ids derived from the data itself stay valid across API server restarts, so a client can
+    resume from the last id it saw.
+    """
+    return str(int(round(timestamp * 1000)))
+
+
+class DataPointBroadcaster:
+    """Wakes stream subscribers as soon as the collector appends a data point.
+
+    One background thread polls the shared DataCache (a few stat calls) and notifies every
+    waiting subscriber when the newest timestamp moves. Subscribers then read the new records
+    from the cache's timestamp index, so nothing is re-parsed per client.
+
+    Each open stream holds a server thread, so at most `max_subscribers` are admitted at once
+    (None for no limit): take a slot with acquire() before streaming and release() it after.
+    """
+
+    def __init__(self, data_cache: DataCache, poll_interval: float = 0.5, max_subscribers: Optional[int] = None):
+        self.data_cache = data_cache
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._condition = threading.Condition()
+        self._latest: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._slots_lock = threading.Lock()
+        self.subscribers = 0
+        self.rejected = 0  # streams refused at the limit
+
+    def acquire(self) -> bool:
+        """Take a subscriber slot; False (and counted as rejected) when all are in use"""
+        with self._slots_lock:
+            if self.max_subscribers is not None and self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                return False
+            self.subscribers += 1
+            return True
+
+    def release(self):
+        with self._slots_lock:
+            self.subscribers -= 1
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._latest = self.data_cache.last_timestamp()
+                self._thread = threading.Thread(target=self._watch, name="data-point-broadcaster", daemon=True)
+                self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                latest = self.data_cache.last_timestamp()
+            except Exception as e:
+                print(f"Error polling data for stream: {e}")
+                continue
+            if latest != self._latest:
+                with self._condition:
+                    self._latest = latest
+                    self._condition.notify_all()
+
+    def wait(self, after: Optional[float], timeout: float) -> bool:
+        """Block until a data point newer than `after` exists or `timeout` passes"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._latest is not None and (after is None or self._latest > after), timeout
+            )
+
+    def subscribe(self, build_event, last_id: Optional[str] = None, heartbeat: float = 15.0) -> Iterator[str]:
+        """Server-Sent Events for every data point after `last_id` (or after the newest one).
+
+        `build_event(record, previous)` turns a data point and its predecessor into the
+        event payload. The caller holds a slot from acquire() while the stream is open.
+        """
+        self.start()
+        if last_id:
+            cursor = int(last_id) / 1000
+        else:
+            cursor = self.data_cache.last_timestamp()
+        previous = self.data_cache.point_at_or_before(cursor) if cursor is not None else None
+
+        yield "retry: 5000\n\n"
+        while True:
+            timestamps, records = self.data_cache.range(start=cursor + 0.0005 if cursor is not None else None)
+            for ts, record in zip(timestamps, records):
+                payload = json.dumps(build_event(record, previous), default=str)
+                yield f"id: {event_id(ts)}\nevent: data_point\ndata: {payload}\n\n"
+                previous, cursor = record, ts
+            if not records and not self.wait(cursor, heartbeat):
+                yield ": keep-alive\n\n"
+
+
+def aggregate_deltas(record: Dict, previous: Optional[Dict], assets: List[str]) -> Dict:
+    """Change of net_usd, net_tokens and price per asset since the previous data point"""
+    if previous is None:
+        return {}
+    deltas = {}
+    for asset in assets:
+        key = asset.lower()
+        now, before = record.get(f"{key}_positions") or {}, previous.get(f"{key}_positions") or {}
+        deltas[asset] = {
+            "net_usd": now.get("net_usd", 0) - before.get("net_usd", 0),
+            "net_tokens": now.get("net_tokens", 0) - before.get("net_tokens", 0),
+            "price": (record.get(f"{key}_price") or 0) - (previous.get(f"{key}_price") or 0),
+        }
+    return deltas
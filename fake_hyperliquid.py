@@ -0,0 +1,454 @@
+"""Local stand-in for the Hyperliquid Info API and the leaderboard service.
+
+Serves `metaAndAssetCtxs`, `allMids` and `clearinghouseState` on POST /info, the
+leaderboard query API on POST /leaderboard and `allMids` / `userFills` subscriptions on the
+/ws WebSocket, with synthetic traders whose positions and prices drift every tick. Latency,
+500s and 429s can be injected to exercise the collector's retry and rate-limit paths without
+touching production.
+
+Example:
+    python fake_hyperliquid.py --traders 1000 --latency-ms 50 --error-rate 0.01 --rate-limit-rate 0.02
+    HYPERLIQUID_INFO_API=http://127.0.0.1:8099/info LEADERBOARD_API=http://127.0.0.1:8099/leaderboard \\
+        python backtest.py 1
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiohttp import WSMsgType, web
+
+from hl_client import DEFAULT_INFO_WEIGHT, INFO_REQUEST_WEIGHTS
+
+BASE_COINS = {"BTC": 100_000.0, "ETH": 3_500.0, "SOL": 180.0, "HYPE": 40.0, "DOGE": 0.2}
+LEVERAGES = [1, 2, 3, 5, 10, 20, 40]
+PERIODS = ("day", "week", "month", "allTime")
+
+
+class FakeHyperliquid:
+    """Synthetic exchange state plus the aiohttp handlers that serve it.
+
+    `traders` leaderboard rows are generated in all-time PnL order (the tail has negative
+    PnL, like the real board). `active_fraction` of them hold 1-4 positions. step() moves
+    prices and re-positions a `churn` fraction of traders; with `tick_seconds` set, the
+    server calls it on that cadence.
+    """
+
+    def __init__(self, traders: int = 1000, coins: int = 30, active_fraction: float = 0.6,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, weight_per_minute: float = 0.0,
+                 tick_seconds: float = 0.0, churn: float = 0.05, seed: int = 0, max_ws_users: int = 0):
+        self.rng = random.Random(seed)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.weight_per_minute = weight_per_minute
+        self.tick_seconds = tick_seconds
+        self.churn = churn
+
+        self.prices: Dict[str, float] = dict(BASE_COINS)
+        for i in range(max(0, coins - len(BASE_COINS))):
+            self.prices[f"ALT{i}"] = 10 ** self.rng.uniform(-3, 2)
+        self.coin_list = list(self.prices)
+
+        self.addresses = [f"0x{self.rng.getrandbits(160):040x}" for _ in range(traders)]
+        self.positions: Dict[str, Dict[str, Dict]] = {}
+        for address in self.addresses:
+            self.positions[address] = self._open_positions() if self.rng.random() < active_fraction else {}
+        self.rows = [self._leaderboard_row(rank, address) for rank, address in enumerate(self.addresses)]
+
+        self._budget = weight_per_minute
+        self._budget_updated = time.monotonic()
+        self.ticks = 0
+        self.requests: Dict[str, int] = {}
+        self.errors_injected = 0
+        self.rate_limited = 0
+
+        # WebSocket fan-out: step() may run on another thread, so events are handed to the
+        # server loop, which puts them on every connection's queue
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ws_queues: Set[asyncio.Queue] = set()
+        self._next_tid = 1
+        self.fills_generated = 0
+        self.ws_connections = 0
+        self.ws_messages = 0
+        # Distinct userFills users across connections (the real API caps them per IP; 0 = no cap)
+        self.max_ws_users = max_ws_users
+        self._ws_user_refs: Dict[str, int] = {}
+
+    # ---- synthetic state ------------------------------------------------------------------
+
+    def _new_position(self, coin: str) -> Dict:
+        price = self.prices[coin]
+        notional = self.rng.lognormvariate(9, 1.5)  # ~$8k median, long tail of whales
+        return {
+            "size": self.rng.choice((-1, 1)) * notional / price,
+            "entry_px": price * self.rng.uniform(0.9, 1.1),
+            "leverage": self.rng.choice(LEVERAGES),
+        }
+
+    def _open_positions(self) -> Dict[str, Dict]:
+        held = self.rng.sample(self.coin_list[:10] if self.rng.random() < 0.8 else self.coin_list,
+                               self.rng.randint(1, 4))
+        return {coin: self._new_position(coin) for coin in held}
+
+    def _leaderboard_row(self, rank: int, address: str) -> Dict:
+        pnl = 5e7 / (rank + 1) ** 0.8 - 2e4
+        account_value = abs(pnl) * self.rng.uniform(0.5, 5) + 1e4
+        performances = []
+        for period, scale in zip(PERIODS, (0.01, 0.05, 0.2, 1.0)):
+            period_pnl = pnl * scale * self.rng.uniform(-0.5, 1.5)
+            performances.append([period, {
+                "pnl": f"{period_pnl:.6f}",
+                "roi": f"{period_pnl / account_value:.6f}",
+                "vlm": f"{abs(period_pnl) * self.rng.uniform(10, 200):.2f}",
+            }])
+        return {
+            "ethAddress": address,
+            "accountValue": f"{account_value:.6f}",
+            "windowPerformances": performances,
+            "prize": 0,
+            "displayName": f"trader{rank}" if rank % 7 == 0 else None,
+        }
+
+    def _set_position(self, address: str, coin: str, position: Optional[Dict]):
+        """Replace (or close, with None) a position and publish the fill that got it there"""
+        held = self.positions[address]
+        start = held[coin]["size"] if coin in held else 0.0
+        end = position["size"] if position else 0.0
+        if position:
+            held[coin] = position
+        else:
+            held.pop(coin, None)
+        if end != start:
+            self._publish(("fill", address, self._fill(coin, start, end)))
+
+    def _fill(self, coin: str, start: float, end: float) -> Dict:
+        """A userFills entry moving a position from `start` to `end` at the current price"""
+        delta = end - start
+        if start == 0 or (start > 0) != (end > 0) and end != 0:
+            direction = "Open Long" if end > 0 else "Open Short"
+        elif end == 0 or abs(end) < abs(start):
+            direction = "Close Long" if start > 0 else "Close Short"
+        else:
+            direction = "Open Long" if end > 0 else "Open Short"
+        tid = self._next_tid
+        self._next_tid += 1
+        self.fills_generated += 1
+        return {
+            "coin": coin, "px": f"{self.prices[coin]:.6g}", "sz": f"{abs(delta):.5f}",
+            "side": "B" if delta > 0 else "A", "time": int(time.time() * 1000),
+            "startPosition": f"{start:.5f}", "dir": direction, "closedPnl": "0.0",
+            "hash": f"0x{tid:064x}", "oid": tid, "crossed": True, "fee": "0.0", "tid": tid,
+            "feeToken": "USDC",
+        }
+
+    def step(self, churn: Optional[float] = None):
+        """Advance one tick: random-walk prices and re-position a fraction of traders"""
+        churn = self.churn if churn is None else churn
+        for coin, price in self.prices.items():
+            self.prices[coin] = price * (1 + self.rng.gauss(0, 0.002))
+        for address in self.rng.sample(self.addresses, int(len(self.addresses) * churn)):
+            held = self.positions[address]
+            action = self.rng.random()
+            if held and action < 0.3:
+                self._set_position(address, self.rng.choice(list(held)), None)
+            elif action < 0.6:
+                coin = self.rng.choice(self.coin_list[:10])
+                self._set_position(address, coin, self._new_position(coin))
+            elif held:
+                coin = self.rng.choice(list(held))
+                resized = dict(held[coin], size=held[coin]["size"] * self.rng.uniform(0.5, 1.5))
+                self._set_position(address, coin, resized)
+        self.ticks += 1
+        self._publish(("mids", None, self.all_mids()))
+
+    # ---- responses ------------------------------------------------------------------------
+
+    def meta_and_asset_ctxs(self) -> List:
+        universe = [{"name": coin, "szDecimals": 5 if price > 1000 else 2, "maxLeverage": 40}
+                    for coin, price in self.prices.items()]
+        contexts = [{"markPx": f"{price:.6g}", "midPx": f"{price:.6g}", "oraclePx": f"{price:.6g}",
+                     "funding": "0.0000125", "openInterest": "1000.0", "dayNtlVlm": "1000000.0"}
+                    for price in self.prices.values()]
+        return [{"universe": universe}, contexts]
+
+    def all_mids(self) -> Dict[str, str]:
+        return {coin: f"{price:.6g}" for coin, price in self.prices.items()}
+
+    def clearinghouse_state(self, address: str) -> Dict:
+        asset_positions = []
+        total = 0.0
+        for coin, position in self.positions.get(address, {}).items():
+            price = self.prices[coin]
+            value = abs(position["size"]) * price
+            total += value
+            asset_positions.append({
+                "type": "oneWay",
+                "position": {
+                    "coin": coin,
+                    "szi": f"{position['size']:.5f}",
+                    "entryPx": f"{position['entry_px']:.6g}",
+                    "positionValue": f"{value:.2f}",
+                    "unrealizedPnl": f"{(price - position['entry_px']) * position['size']:.2f}",
+                    "leverage": {"type": "cross", "value": position["leverage"]},
+                },
+            })
+        summary = {"accountValue": f"{total / 5 + 1e4:.2f}", "totalNtlPos": f"{total:.2f}",
+                   "totalRawUsd": f"{total / 5:.2f}", "totalMarginUsed": f"{total / 10:.2f}"}
+        return {"assetPositions": asset_positions, "marginSummary": summary, "crossMarginSummary": summary,
+                "withdrawable": summary["accountValue"], "time": int(time.time() * 1000)}
+
+    def leaderboard(self, query: Dict) -> Dict:
+        """Same query semantics as the leaderboard service: optional sort, then offset/limit"""
+        rows = self.rows
+        sort = query.get("sort")
+        if sort and not (sort.get("type") == "pnl" and sort.get("timePeriod") == "allTime"
+                         and sort.get("direction") == "desc"):
+            if sort.get("type") == "accountValue":
+                key = lambda row: float(row["accountValue"])  # noqa: E731
+            else:
+                period = PERIODS.index(sort.get("timePeriod", "allTime"))
+                key = lambda row: float(row["windowPerformances"][period][1][sort.get("type", "pnl")])  # noqa: E731
+            rows = sorted(rows, key=key, reverse=sort.get("direction") != "asc")
+        limit, offset = int(query.get("limit", 10)), int(query.get("offset", 0))
+        page = rows[offset:offset + limit]
+        return {"leaderboardRows": page,
+                "pagination": {"batchId": 1, "totalCount": len(rows), "size": len(page),
+                               "hasMore": len(rows) > offset + limit}}
+
+    # ---- HTTP -----------------------------------------------------------------------------
+
+    def _within_budget(self, weight: float) -> bool:
+        if not self.weight_per_minute:
+            return True
+        now = time.monotonic()
+        self._budget = min(self.weight_per_minute,
+                           self._budget + (now - self._budget_updated) * self.weight_per_minute / 60)
+        self._budget_updated = now
+        if self._budget < weight:
+            return False
+        self._budget -= weight
+        return True
+
+    async def _delay(self):
+        delay = self.latency_ms + self.rng.uniform(0, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    async def handle_info(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        kind = payload.get("type")
+        self.requests[kind] = self.requests.get(kind, 0) + 1
+        await self._delay()
+
+        if not self._within_budget(INFO_REQUEST_WEIGHTS.get(kind, DEFAULT_INFO_WEIGHT)) \
+                or self.rng.random() < self.rate_limit_rate:
+            self.rate_limited += 1
+            return web.json_response({"error": "rate limited"}, status=429)
+        if self.rng.random() < self.error_rate:
+            self.errors_injected += 1
+            return web.json_response({"error": "injected failure"}, status=500)
+
+        if kind == "metaAndAssetCtxs":
+            return web.json_response(self.meta_and_asset_ctxs())
+        if kind == "allMids":
+            return web.json_response(self.all_mids())
+        if kind == "clearinghouseState":
+            return web.json_response(self.clearinghouse_state(payload.get("user", "").lower()))
+        return web.json_response({"error": f"unsupported request type: {kind}"}, status=422)
+
+    async def handle_leaderboard(self, request: web.Request) -> web.Response:
+        self.requests["leaderboard"] = self.requests.get("leaderboard", 0) + 1
+        await self._delay()
+        return web.json_response(self.leaderboard(await request.json()))
+
+    def _publish(self, event: Tuple):
+        if self._loop is not None and self._ws_queues:
+            self._loop.call_soon_threadsafe(self._fan_out, event)
+
+    def _fan_out(self, event: Tuple):
+        for queue in self._ws_queues:
+            queue.put_nowait(event)
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        """Hyperliquid-style WebSocket: subscribe/unsubscribe to allMids and userFills, ping/pong"""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.ws_connections += 1
+        queue: asyncio.Queue = asyncio.Queue()
+        self._ws_queues.add(queue)
+        users: Set[str] = set()
+        subscribed = {"mids": False}
+
+        async def send(message: Dict):
+            self.ws_messages += 1
+            await ws.send_str(json.dumps(message))
+
+        async def pump():
+            while True:
+                kind, user, data = await queue.get()
+                if kind == "mids" and subscribed["mids"]:
+                    await send({"channel": "allMids", "data": {"mids": data}})
+                elif kind == "fill" and user in users:
+                    await send({"channel": "userFills", "data": {"user": user, "fills": [data]}})
+
+        pump_task = asyncio.create_task(pump())
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                message = json.loads(msg.data)
+                method = message.get("method")
+                subscription = message.get("subscription", {})
+                if method == "ping":
+                    await send({"channel": "pong"})
+                elif method in ("subscribe", "unsubscribe"):
+                    active = method == "subscribe"
+                    if subscription.get("type") == "allMids":
+                        subscribed["mids"] = active
+                    elif subscription.get("type") == "userFills":
+                        user = subscription.get("user", "").lower()
+                        if active and user not in users:
+                            if self.max_ws_users and user not in self._ws_user_refs \
+                                    and len(self._ws_user_refs) >= self.max_ws_users:
+                                await send({"channel": "error",
+                                            "data": f"Cannot track more than {self.max_ws_users} total users."})
+                                continue
+                            self._ws_user_refs[user] = self._ws_user_refs.get(user, 0) + 1
+                        elif not active and user in users:
+                            self._release_ws_user(user)
+                        (users.add if active else users.discard)(user)
+                    else:
+                        await send({"channel": "error", "data": f"unsupported subscription: {subscription}"})
+                        continue
+                    await send({"channel": "subscriptionResponse", "data": message})
+                    if active and subscription["type"] == "allMids":
+                        await send({"channel": "allMids", "data": {"mids": self.all_mids()}})
+                    elif active:
+                        # The real API replays recent fills first; clients must not re-apply them
+                        await send({"channel": "userFills",
+                                    "data": {"isSnapshot": True, "user": subscription["user"], "fills": []}})
+        finally:
+            pump_task.cancel()
+            for user in users:
+                self._release_ws_user(user)
+            self._ws_queues.discard(queue)
+            self.ws_connections -= 1
+        return ws
+
+    def _release_ws_user(self, user: str):
+        self._ws_user_refs[user] -= 1
+        if not self._ws_user_refs[user]:
+            del self._ws_user_refs[user]
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def stats(self) -> Dict:
+        return {
+            "traders": len(self.addresses),
+            "active_traders": sum(1 for held in self.positions.values() if held),
+            "ticks": self.ticks,
+            "requests": dict(self.requests),
+            "errors_injected": self.errors_injected,
+            "rate_limited": self.rate_limited,
+            "fills_generated": self.fills_generated,
+            "ws_connections": self.ws_connections,
+            "ws_messages": self.ws_messages,
+        }
+
+    async def _tick_loop(self, app: web.Application):
+        self._loop = asyncio.get_running_loop()
+
+        async def loop():
+            while True:
+                await asyncio.sleep(self.tick_seconds)
+                self.step()
+
+        task = asyncio.create_task(loop()) if self.tick_seconds > 0 else None
+        yield
+        if task is not None:
+            task.cancel()
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 2)
+        app.router.add_post("/info", self.handle_info)
+        app.router.add_post("/leaderboard", self.handle_leaderboard)
+        app.router.add_get("/ws", self.handle_ws)
+        app.router.add_get("/stats", self.handle_stats)
+        app.cleanup_ctx.append(self._tick_loop)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+        """Serve in the running event loop; returns the runner and the base URL"""
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        bound_host, bound_port = runner.addresses[0][:2]
+        return runner, f"http://{bound_host}:{bound_port}"
+
+
+def serve_in_thread(fake: FakeHyperliquid, host: str = "127.0.0.1", port: int = 0):
+    """Run the stand-in on its own event loop thread, for synchronous callers and benchmarks.
+
+    Returns (base_url, stop); `stop()` shuts the server down and joins the thread.
+    """
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {}
+
+    def run():
+        asyncio.set_event_loop(loop)
+        state["runner"], state["url"] = loop.run_until_complete(fake.start(host, port))
+        started.set()
+        loop.run_forever()
+        loop.run_until_complete(state["runner"].cleanup())
+        loop.close()
+
+    thread = threading.Thread(target=run, name="fake-hyperliquid", daemon=True)
+    thread.start()
+    started.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    return state["url"], stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Hyperliquid Info API and leaderboard stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--traders", type=int, default=1000)
+    parser.add_argument("--coins", type=int, default=30)
+    parser.add_argument("--active-fraction", type=float, default=0.6, help="traders holding positions")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of info requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of info requests answered with 429")
+    parser.add_argument("--weight-per-minute", type=float, default=0.0,
+                        help="enforce the Info API weight budget like the real API (0 = unlimited)")
+    parser.add_argument("--tick-seconds", type=float, default=60.0, help="move prices and positions this often")
+    parser.add_argument("--churn", type=float, default=0.05, help="fraction of traders re-positioned per tick")
+    parser.add_argument("--max-ws-users", type=int, default=0,
+                        help="reject userFills subscriptions past this many distinct users (0 = no cap)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeHyperliquid(args.traders, args.coins, args.active_fraction, args.latency_ms, args.jitter_ms,
+                           args.error_rate, args.rate_limit_rate, args.weight_per_minute,
+                           args.tick_seconds, args.churn, args.seed, args.max_ws_users)
+    print(f"🧪 Fake Hyperliquid with {args.traders} traders on http://{args.host}:{args.port} "
+          f"(/info, /leaderboard, /ws, /stats)")
+    web.run_app(fake.app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
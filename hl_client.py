@@ -0,0 +1,190 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional
+
+import aiohttp
+
+from metrics import MetricsRegistry
+
+# Overridable so the collector and API server can run against fake_hyperliquid.py
+HYPERLIQUID_INFO_API = os.environ.get("HYPERLIQUID_INFO_API", "https://api.hyperliquid.xyz/info")
+LEADERBOARD_API = os.environ.get("LEADERBOARD_API", "http://localhost:3000/leaderboard")
+HYPERLIQUID_WS_API = os.environ.get("HYPERLIQUID_WS_API", "wss://api.hyperliquid.xyz/ws")
+
+# Info API weights (per IP, 1200 per minute). Everything not listed weighs 20.
+INFO_REQUEST_WEIGHTS = {
+    "clearinghouseState": 2,
+    "allMids": 2,
+    "l2Book": 2,
+    "orderStatus": 2,
+    "spotClearinghouseState": 2,
+    "exchangeStatus": 2,
+}
+DEFAULT_INFO_WEIGHT = 20
+INFO_WEIGHT_PER_MINUTE = 1200
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HyperliquidAPIError(Exception):
+    """A request that still failed after all retries"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available and take them (FIFO across waiters)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def drain(self, seconds: float):
+        """Back off all callers, e.g. after a 429, by emptying the bucket for `seconds`"""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class HyperliquidClient:
+    """Shared client for the Hyperliquid Info API and the local leaderboard service.
+
+    One pooled keep-alive aiohttp session serves every caller. Info requests pass through a
+    token bucket sized to the API's per-minute weight budget, and 429/5xx responses, timeouts
+    and connection errors are retried with jittered exponential backoff. Requests that still
+    fail raise HyperliquidAPIError so callers can tell a failure from an empty result.
+    """
+
+    def __init__(self, info_url: str = HYPERLIQUID_INFO_API, leaderboard_url: str = LEADERBOARD_API,
+                 weight_per_minute: float = INFO_WEIGHT_PER_MINUTE, max_connections: int = 50,
+                 max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 10.0,
+                 timeout: float = 10.0, metrics: Optional[MetricsRegistry] = None,
+                 metrics_prefix: str = ""):
+        self.info_url = info_url
+        self.leaderboard_url = leaderboard_url
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.set_weight_per_minute(weight_per_minute)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        self.requests_sent = 0
+        self.retries = 0
+        self.failures = 0
+
+        # A prefix keeps these apart from another process's clients when both are exported together
+        metrics = metrics or MetricsRegistry()
+        self.request_seconds = metrics.histogram(
+            f"{metrics_prefix}upstream_request_seconds", "Latency of upstream HTTP attempts", ("endpoint", "type"))
+        self.request_count = metrics.counter(
+            f"{metrics_prefix}upstream_requests_total", "Upstream HTTP attempts by outcome (status code or error)",
+            ("endpoint", "type", "status"))
+
+    def set_weight_per_minute(self, weight_per_minute: float):
+        """Size the rate budget, e.g. to this client's share of a budget shared with other processes"""
+        self.weight_per_minute = weight_per_minute
+        # Leave headroom below the hard limit; allow a burst of a quarter of the budget
+        self.rate_limiter = TokenBucket(weight_per_minute * 0.9 / 60, weight_per_minute / 4)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _post(self, url: str, payload: Dict, weight: float = 0, endpoint: str = "info"):
+        last_error = None
+        labels = {"endpoint": endpoint, "type": payload.get("type", "") if endpoint == "info" else ""}
+        for attempt in range(self.max_retries + 1):
+            if weight:
+                await self.rate_limiter.acquire(weight)
+            self.requests_sent += 1
+            started = time.perf_counter()
+            status = "error"
+            try:
+                async with self.session.post(url, json=payload) as response:
+                    status = response.status
+                    if response.status in RETRY_STATUSES:
+                        last_error = HyperliquidAPIError(f"HTTP {response.status} from {url}", response.status)
+                        delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                        if response.status == 429 and weight:
+                            self.rate_limiter.drain(delay)
+                    elif response.status >= 400:
+                        raise HyperliquidAPIError(f"HTTP {response.status} from {url}", response.status)
+                    else:
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = "timeout" if isinstance(e, asyncio.TimeoutError) else "connection_error"
+                last_error = HyperliquidAPIError(f"{type(e).__name__}: {e}")
+                delay = self._backoff(attempt)
+            finally:
+                self.request_seconds.observe(time.perf_counter() - started, **labels)
+                self.request_count.inc(status=status, **labels)
+
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+        self.failures += 1
+        raise last_error
+
+    async def post_info(self, payload: Dict):
+        """POST to the Info API, paying the request's weight against the rate budget"""
+        weight = INFO_REQUEST_WEIGHTS.get(payload.get("type"), DEFAULT_INFO_WEIGHT)
+        return await self._post(self.info_url, payload, weight)
+
+    async def post_leaderboard(self, payload: Dict):
+        """POST a query to the local leaderboard service (not rate limited)"""
+        return await self._post(self.leaderboard_url, payload, endpoint="leaderboard")
+
+    def stats(self) -> Dict:
+        return {
+            "requests_sent": self.requests_sent,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
@@ -0,0 +1,188 @@
+import {
+  Leaderboard,
+  LeaderboardFilter,
+  LeaderboardSort,
+} from './interface/leaderboard.interface';
+
+type TimePeriod = LeaderboardSort['timePeriod'];
+type Direction = LeaderboardSort['direction'];
+
+const TIME_PERIODS: TimePeriod[] = ['day', 'week', 'month', 'allTime'];
+const METRICS = ['pnl', 'roi', 'vlm'] as const;
+const DIRECTIONS: Direction[] = ['asc', 'desc'];
+
+type RangeCheck = { values: Float64Array; min?: number; max?: number };
+
+const columnKey = (timePeriod: string, metric: string) =>
+  `${timePeriod}:${metric}`;
+
+const orderingKey = (sort: LeaderboardSort) =>
+  sort.type === 'accountValue'
+    ? `accountValue:${sort.direction}`
+    : `${columnKey(sort.timePeriod, sort.type)}:${sort.direction}`;
+
+/**
+ * Row indexes sorted by `values`. Ties keep their original order and rows
+ * without a numeric value go last in either direction.
+ */
+function sortedOrder(
+  values: Float64Array,
+  direction: Direction,
+): Uint32Array {
+  const order = new Uint32Array(values.length);
+  for (let i = 0; i < order.length; i++) order[i] = i;
+  const sign = direction === 'asc' ? 1 : -1;
+  return order.sort((a, b) => {
+    const av = values[a];
+    const bv = values[b];
+    if (Number.isNaN(av) || Number.isNaN(bv)) {
+      if (Number.isNaN(av) && Number.isNaN(bv)) return a - b;
+      return Number.isNaN(av) ? 1 : -1;
+    }
+    return sign * (av - bv) || a - b;
+  });
+}
+
+/**
+ * One fetched leaderboard, parsed once into numeric columns with every sort
+ * ordering prebuilt, so queries never parse strings or sort.
+ */
+export class LeaderboardBatch {
+  readonly size: number;
+  private readonly addresses: string[];
+  private readonly names: (string | null)[];
+  private readonly accountValue: Float64Array;
+  private readonly columns = new Map<string, Float64Array>();
+  private readonly orderings = new Map<string, Uint32Array>();
+
+  constructor(readonly rows: Leaderboard[]) {
+    this.size = rows.length;
+    this.addresses = rows.map((row) => row.ethAddress.toLowerCase());
+    this.names = rows.map((row) => row.displayName?.toLowerCase() ?? null);
+    this.accountValue = Float64Array.from(rows, (row) => +row.accountValue);
+
+    for (const timePeriod of TIME_PERIODS) {
+      for (const metric of METRICS) {
+        this.columns.set(
+          columnKey(timePeriod, metric),
+          Float64Array.from(rows, (row) => {
+            const performance = row.windowPerformances.find(
+              (w) => w[0] === timePeriod,
+            );
+            return performance ? +performance[1][metric] : NaN;
+          }),
+        );
+      }
+    }
+
+    for (const direction of DIRECTIONS) {
+      this.orderings.set(
+        `accountValue:${direction}`,
+        sortedOrder(this.accountValue, direction),
+      );
+      for (const [key, values] of this.columns) {
+        this.orderings.set(
+          `${key}:${direction}`,
+          sortedOrder(values, direction),
+        );
+      }
+    }
+  }
+
+  /** Resolve a filter into (column, min, max) checks once per query */
+  private compileFilter(filter?: LeaderboardFilter): RangeCheck[] {
+    if (!filter) return [];
+    const { accountValue, ...rest } = filter;
+    const checks: RangeCheck[] = [];
+
+    // for accountValue, we just need the largest "min" and smallest "max"
+    // across all time periods
+    if (accountValue) {
+      checks.push({
+        values: this.accountValue,
+        min: Math.max(...Object.values(accountValue).map((v) => v.min ?? 0)),
+        max: Math.min(
+          ...Object.values(accountValue).map(
+            (v) => v.max ?? 1_000_000_000_000_000_000,
+          ),
+        ),
+      });
+    }
+
+    for (const [key, value] of Object.entries(rest)) {
+      if (!value) continue;
+      for (const [timePeriod, minMax] of Object.entries(value)) {
+        if (!minMax) continue;
+        const values = this.columns.get(columnKey(timePeriod, key));
+        if (!values) continue;
+        // a min or max of 0 means "no bound", as before
+        checks.push({
+          values,
+          min: minMax.min || undefined,
+          max: minMax.max || undefined,
+        });
+      }
+    }
+    return checks;
+  }
+
+  private matches(
+    i: number,
+    queryLower: string | undefined,
+    checks: RangeCheck[],
+  ): boolean {
+    if (queryLower) {
+      const name = this.names[i];
+      if (
+        !this.addresses[i].includes(queryLower) &&
+        !(name && name.includes(queryLower))
+      )
+        return false;
+    }
+    for (const { values, min, max } of checks) {
+      if (min !== undefined && values[i] < min) return false;
+      if (max !== undefined && values[i] > max) return false;
+    }
+    return true;
+  }
+
+  /** Rows in `sort` order (or original order), filtered, then paginated */
+  query(
+    options: {
+      filter?: LeaderboardFilter;
+      query?: string;
+      sort?: LeaderboardSort;
+    },
+    offset: number,
+    limit: number,
+  ): { rows: Leaderboard[]; totalCount: number } {
+    const order = options.sort
+      ? this.orderings.get(orderingKey(options.sort))
+      : undefined;
+    const at = (position: number) => (order ? order[position] : position);
+
+    // Unfiltered queries (the collector's top-N by allTime PnL) are a slice
+    if (!options.query && !options.filter) {
+      const rows: Leaderboard[] = [];
+      const end = Math.min(this.size, offset + limit);
+      for (let p = Math.max(0, offset); p < end; p++) {
+        rows.push(this.rows[at(p)]);
+      }
+      return { rows, totalCount: this.size };
+    }
+
+    const queryLower = options.query?.toLowerCase();
+    const checks = this.compileFilter(options.filter);
+    const rows: Leaderboard[] = [];
+    let totalCount = 0;
+    for (let p = 0; p < this.size; p++) {
+      const i = at(p);
+      if (!this.matches(i, queryLower, checks)) continue;
+      if (totalCount >= offset && rows.length < limit) {
+        rows.push(this.rows[i]);
+      }
+      totalCount++;
+    }
+    return { rows, totalCount };
+  }
+}
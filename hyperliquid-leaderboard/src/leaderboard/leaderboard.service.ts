@@ -4,6 +4,7 @@ import {
   LeaderboardQueryBody,
 } from './interface/leaderboard.interface';
 import axios from 'axios';
+import { LeaderboardBatch } from './leaderboard-batch';
 
 @Injectable()
 export class LeaderboardService implements OnModuleInit {
@@ -11,7 +12,11 @@ export class LeaderboardService implements OnModuleInit {
   private readonly LEADERBOARD_URL =
     'https://stats-data.hyperliquid.xyz/Mainnet/leaderboard';
   private readonly REFRESH_INTERVAL = 5 * 60 * 1000; // 5 minutes in milliseconds
-  private cachedLeaderboard: Record<number, Leaderboard[]> = {};
+  // keep recent batches for clients paginating with a batchId, but bound
+  // memory: each batch holds every row plus its columns and sort orders
+  private readonly MAX_BATCH_AGE = 60 * 60 * 1000;
+  private readonly MAX_BATCHES = 3;
+  private cachedLeaderboard = new Map<number, LeaderboardBatch>();
 
   async onModuleInit() {
     await this.syncLeaderboard();
@@ -42,19 +47,22 @@ export class LeaderboardService implements OnModuleInit {
       )
         throw new Error('No leaderboard data found');
       const id = Date.now();
+      // parse numbers and build every sort order once, not on each query
+      const batch = new LeaderboardBatch(response.data.leaderboardRows);
       console.log(
-        `[${id}] Leaderboard updated with ${response.data.leaderboardRows.length} rows`,
+        `[${id}] Leaderboard updated with ${batch.size} rows ` +
+          `(indexed in ${Date.now() - id}ms)`,
       );
-      this.cachedLeaderboard[id] = response.data.leaderboardRows;
+      this.cachedLeaderboard.set(id, batch);
       this.latestId = id;
 
-      // clear outdated leaderboard (older than 1 hour)
-      const outdatedIds = Object.keys(this.cachedLeaderboard).filter(
-        (id) => +id < Date.now() - 1000 * 60 * 60,
-      );
-      for (const id of outdatedIds) {
-        delete this.cachedLeaderboard[id];
-      }
+      // evict batches past MAX_BATCH_AGE and all but the newest MAX_BATCHES
+      const ids = [...this.cachedLeaderboard.keys()].sort((a, b) => b - a);
+      ids.forEach((batchId, index) => {
+        if (index >= this.MAX_BATCHES || batchId < id - this.MAX_BATCH_AGE) {
+          this.cachedLeaderboard.delete(batchId);
+        }
+      });
 
       return this.latestId;
     } catch (error) {
@@ -85,7 +93,7 @@ export class LeaderboardService implements OnModuleInit {
           error: 'Data not available.',
         };
 
-      const leaderboard = this.cachedLeaderboard[batchId];
+      const leaderboard = this.cachedLeaderboard.get(+batchId);
       if (!leaderboard) {
         return {
           leaderboardRows: [],
@@ -95,81 +103,12 @@ export class LeaderboardService implements OnModuleInit {
 
       const { limit = 10, offset = 0 } = query;
 
-      let filteredLeaderboard = leaderboard.filter((entry) => {
-        const { accountValue, ...rest } = query.filter ?? {};
-
-        if (query.query) {
-          const queryLower = query.query.toLowerCase();
-
-          // check if address matches query
-          const addressMatch = entry.ethAddress
-            .toLowerCase()
-            .includes(queryLower);
-
-          // check if name matches query
-          const nameMatch =
-            entry.displayName &&
-            entry.displayName.toLowerCase().includes(queryLower);
-          if (!addressMatch && !nameMatch) return false;
-        }
-
-        // for accountValue, we just need the largest "min" and smallet "max" across all time periods
-        if (accountValue) {
-          const min = Math.max(
-            ...Object.values(accountValue).map((v) => v.min ?? 0),
-          );
-          const max = Math.min(
-            ...Object.values(accountValue).map(
-              (v) => v.max ?? 1_000_000_000_000_000_000,
-            ),
-          );
-          if (+entry.accountValue < min || +entry.accountValue > max)
-            return false;
-        }
-
-        for (const [key, value] of Object.entries(rest)) {
-          if (!value) continue;
-          for (const [timePeriod, minMax] of Object.entries(value)) {
-            if (!minMax) continue;
-            const performance = entry.windowPerformances.find(
-              (w) => w[0] === timePeriod,
-            );
-            if (!performance) continue;
-            if (minMax.min && +performance[1][key] < minMax.min) return false;
-            if (minMax.max && +performance[1][key] > minMax.max) return false;
-          }
-        }
-        return true;
-      });
-
-      const totalCount = filteredLeaderboard.length;
-      // start sorting now that our dataset is smaller after filtering
-      const { sort } = query;
-      if (sort) {
-        filteredLeaderboard = filteredLeaderboard.sort((a, b) => {
-          // if sorting by accountValue, ignore time period
-          if (sort.type === 'accountValue') {
-            if (sort.direction === 'asc') {
-              return +a.accountValue - +b.accountValue;
-            } else {
-              return +b.accountValue - +a.accountValue;
-            }
-          }
-          const aValue = a.windowPerformances.find(
-            (w) => w[0] === sort.timePeriod,
-          )?.[1][sort.type];
-          const bValue = b.windowPerformances.find(
-            (w) => w[0] === sort.timePeriod,
-          )?.[1][sort.type];
-          if (!aValue || !bValue) return 0;
-          return sort.direction === 'asc'
-            ? +aValue - +bValue
-            : +bValue - +aValue;
-        });
-      }
-
-      // apply pagination
-      filteredLeaderboard = filteredLeaderboard.slice(offset, offset + limit);
+      // filtering walks the prebuilt sort order, so no per-query sort is needed
+      const { rows: filteredLeaderboard, totalCount } = leaderboard.query(
+        query,
+        offset,
+        limit,
+      );
 
       return {
         leaderboardRows: filteredLeaderboard,
@@ -0,0 +1,97 @@
+import threading
+import time
+from typing import Dict, List
+
+import requests
+
+from hl_client import LEADERBOARD_API, HyperliquidClient
+
+
+class LeaderboardCache:
+    """TTL-cached snapshot of the top leaderboard rows for the API server.
+
+    Rows are fetched at most once per `ttl_seconds` and parsed once per fetch (all-time PnL
+    and ROI as floats), so request handlers only iterate a ready-made list. If a refresh
+    fails the previous snapshot keeps being served.
+
+    With `background_refresh` set, a background task owns the refreshes (see `refresh_async`)
+    and `get` only ever returns the current snapshot, so no request waits on the upstream.
+    """
+
+    def __init__(self, url: str = LEADERBOARD_API, limit: int = 100, ttl_seconds: float = 300.0,
+                 timeout: float = 5.0):
+        self.url = url
+        self.limit = limit
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self._rows: List[Dict] = []
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.errors = 0
+        self.hits = 0
+        self.background_refresh = False
+
+    def _is_fresh(self) -> bool:
+        return bool(self._rows) and time.monotonic() - self._fetched_at < self.ttl_seconds
+
+    @staticmethod
+    def _parse_row(row: Dict) -> Dict:
+        alltime_stats = next((w[1] for w in row.get('windowPerformances', []) if w[0] == 'allTime'), {})
+        return {
+            'ethAddress': row['ethAddress'],
+            'displayName': row.get('displayName'),
+            'pnl_alltime': float(alltime_stats.get('pnl', 0)),
+            'roi_alltime': float(alltime_stats.get('roi', 0)),
+            'account_value': float(row.get('accountValue', 0)),
+        }
+
+    def _load(self, data: Dict):
+        if "error" in data:
+            raise RuntimeError(data["error"])
+        self._rows = [self._parse_row(row) for row in data.get('leaderboardRows', [])]
+        self._fetched_at = time.monotonic()
+        self.fetches += 1
+
+    def refresh(self):
+        response = requests.post(self.url, json={"limit": self.limit}, timeout=self.timeout)
+        response.raise_for_status()
+        self._load(response.json())
+
+    async def refresh_async(self, client: HyperliquidClient) -> bool:
+        """Refresh through the shared async client; on failure the previous snapshot stays"""
+        try:
+            self._load(await client.post_leaderboard({"limit": self.limit}))
+            return True
+        except Exception as e:
+            self.errors += 1
+            print(f"Error refreshing leaderboard: {e}")
+            return False
+
+    def get(self) -> List[Dict]:
+        """Parsed leaderboard rows, refreshed if older than the TTL"""
+        if self.background_refresh:
+            if not self._rows:
+                raise RuntimeError("Leaderboard not loaded yet")
+            self.hits += 1
+            return self._rows
+        if self._is_fresh():
+            self.hits += 1
+            return self._rows
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+            else:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error refreshing leaderboard: {e}")
+                    if not self._rows:
+                        raise
+                    # Keep serving the stale snapshot; retry after a short pause, not every request
+                    self._fetched_at = time.monotonic() - self.ttl_seconds + min(30.0, self.ttl_seconds)
+        return self._rows
+
+    def stats(self) -> Dict:
+        return {"rows": len(self._rows), "hits": self.hits, "fetches": self.fetches, "errors": self.errors}
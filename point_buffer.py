@@ -0,0 +1,255 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from aggregation import AGGREGATE_FIELDS
+from data_cache import parse_timestamp
+from storage import SegmentStore
+
+FIELDS = ("price",) + AGGREGATE_FIELDS
+
+# (timestamps, coins, {field: timestamps x coins matrix}), oldest first
+Columns = Tuple[np.ndarray, List[str], Dict[str, np.ndarray]]
+
+
+def record_values(record: Dict) -> Tuple[Dict[str, float], Dict[str, Dict]]:
+    """(prices, aggregates) of a data point, with the btc_/eth_ fields as a fallback"""
+    prices = dict(record.get("asset_prices") or {})
+    aggregates = dict(record.get("asset_positions") or {})
+    for coin, key in (("BTC", "btc"), ("ETH", "eth")):
+        if record.get(f"{key}_price") is not None:
+            prices.setdefault(coin, record[f"{key}_price"])
+        if record.get(f"{key}_positions"):
+            aggregates.setdefault(coin, record[f"{key}_positions"])
+    return prices, aggregates
+
+
+class PointBuffer:
+    """Data point prices and per-asset aggregates as NumPy columns in a fixed-capacity ring.
+
+    Each field is a (points x coins) float64 matrix, NaN where a coin has no value; rows are
+    allocated as needed up to `capacity` and a new coin adds a column. Once `capacity` points
+    are held, each append overwrites the oldest.
+    The collector appends every point to the store first, so evicted points are not lost:
+    reads reaching further back than the ring stream them from `store` instead. With
+    `capacity=None` the buffer grows without evicting, for one-off loads of a whole store.
+
+    Points must be appended in time order, as the collector writes them.
+    """
+
+    def __init__(self, capacity: Optional[int] = 2016, store: Optional[SegmentStore] = None):
+        self.capacity = capacity  # 2016 = one week at 5-minute ticks
+        self.store = store
+        self._rows = min(capacity or 256, 256)  # allocated rows, doubled up to `capacity`
+        self._coins: Dict[str, int] = {}
+        self._timestamps = np.full(self._rows, np.nan)
+        self._columns = {field: np.full((self._rows, 8), np.nan) for field in FIELDS}
+        self._next = 0   # row the next append writes
+        self._size = 0
+        self.spilled = 0  # points evicted from the ring (still in the store)
+        self.spilled_until: Optional[float] = None  # newest evicted timestamp
+        # Last spilled range read back from the store: (start, spilled_until, points)
+        self._spill_cache: Optional[Tuple[Optional[float], float, "PointBuffer"]] = None
+        self._segment_starts: Dict[int, float] = {}  # segment -> first timestamp (segments are append-only)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "PointBuffer":
+        buffer = cls(capacity=None)
+        buffer.extend(records)
+        return buffer
+
+    @classmethod
+    def load(cls, store: SegmentStore, capacity: Optional[int] = 2016) -> "PointBuffer":
+        """Ring over `store`'s newest points; older ones count as spilled. Reads one segment at a time"""
+        buffer = cls(capacity, store)
+        buffer.extend(store.iter_records())
+        return buffer
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self._timestamps.nbytes + sum(column.nbytes for column in self._columns.values())
+
+    @property
+    def coins(self) -> List[str]:
+        return list(self._coins)
+
+    # ---- writing ------------------------------------------------------------------------
+
+    def _coin_column(self, coin: str) -> int:
+        j = self._coins.get(coin)
+        if j is None:
+            j = self._coins[coin] = len(self._coins)
+            width = next(iter(self._columns.values())).shape[1]
+            if j >= width:
+                # Double the coin dimension; listings are rare, so this almost never runs
+                for field, column in self._columns.items():
+                    wider = np.full((column.shape[0], width * 2), np.nan)
+                    wider[:, :width] = column
+                    self._columns[field] = wider
+        return j
+
+    def _grow_rows(self):
+        rows = self._rows * 2 if self.capacity is None else min(self._rows * 2, self.capacity)
+        timestamps = np.full(rows, np.nan)
+        timestamps[:self._rows] = self._timestamps
+        self._timestamps = timestamps
+        for field, column in self._columns.items():
+            taller = np.full((rows, column.shape[1]), np.nan)
+            taller[:self._rows] = column
+            self._columns[field] = taller
+        self._rows = rows
+        self._next = self._size  # nothing has wrapped before the buffer is full
+
+    def append(self, record: Dict) -> bool:
+        """Add one data point; returns False if it has no parseable timestamp"""
+        ts = parse_timestamp(record.get("timestamp"))
+        if ts is None:
+            return False
+        if self._size == self._rows and (self.capacity is None or self._rows < self.capacity):
+            self._grow_rows()
+        elif self._size == self._rows:
+            self.spilled += 1
+            self.spilled_until = self._timestamps[self._next]
+
+        i = self._next
+        self._timestamps[i] = ts
+        for column in self._columns.values():
+            column[i] = np.nan
+        prices, aggregates = record_values(record)
+        for coin, price in prices.items():
+            if price is not None:
+                j = self._coin_column(coin)  # may widen the columns, so look them up after
+                self._columns["price"][i, j] = price
+        for coin, aggregate in aggregates.items():
+            j = self._coin_column(coin)
+            for field in AGGREGATE_FIELDS:
+                value = aggregate.get(field)
+                if value is not None:
+                    self._columns[field][i, j] = value
+
+        self._next = (i + 1) % self._rows
+        self._size = min(self._size + 1, self._rows)
+        return True
+
+    def extend(self, records: Iterable[Dict]):
+        for record in records:
+            self.append(record)
+
+    # ---- reading ------------------------------------------------------------------------
+
+    def _ordered(self, array: np.ndarray) -> np.ndarray:
+        """Rows oldest first (a view unless the ring has wrapped)"""
+        if self._size < self._rows:
+            return array[:self._size]
+        return np.concatenate((array[self._next:], array[:self._next]))
+
+    def _slice(self, array: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        """Rows lo:hi in oldest-first order, copying only those rows"""
+        if self._size < self._rows:
+            return array[lo:hi]
+        lo, hi = lo + self._next, hi + self._next
+        if hi <= self._rows:
+            return array[lo:hi]
+        if lo >= self._rows:
+            return array[lo - self._rows:hi - self._rows]
+        return np.concatenate((array[lo:], array[:hi - self._rows]))
+
+    def timestamps(self) -> np.ndarray:
+        return self._ordered(self._timestamps)
+
+    def column(self, field: str, coin: str) -> np.ndarray:
+        """One field of one coin, oldest first (all NaN for an unknown coin)"""
+        j = self._coins.get(coin)
+        if j is None:
+            return np.full(self._size, np.nan)
+        return self._ordered(self._columns[field][:, j])
+
+    def oldest_timestamp(self) -> Optional[float]:
+        return float(self._timestamps[self._next if self._size == self._rows else 0]) if self._size else None
+
+    def latest_timestamp(self) -> Optional[float]:
+        return float(self._timestamps[(self._next - 1) % self._rows]) if self._size else None
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None,
+              fields: Iterable[str] = FIELDS) -> Columns:
+        """Points with start <= timestamp <= end, read from the store where the ring has spilled"""
+        fields = list(fields)
+        timestamps = self.timestamps()
+        lo = np.searchsorted(timestamps, start, side="left") if start is not None else 0
+        hi = np.searchsorted(timestamps, end, side="right") if end is not None else len(timestamps)
+        n = len(self._coins)
+        result = (timestamps[lo:hi], self.coins,
+                  {field: self._slice(self._columns[field][:, :n], lo, hi) for field in fields})
+
+        if self.spilled and self.store is not None and (start is None or start < self.oldest_timestamp()):
+            older = self.read_spilled(start)
+            end = min(end, self.spilled_until) if end is not None else None
+            result = concat_columns(older.range(start, end, fields=fields), result)
+        return result
+
+    def read_spilled(self, start: Optional[float]) -> "PointBuffer":
+        """Evicted points from `start` on, streamed from the store one segment at a time.
+
+        The result is kept until more points are evicted, so repeated queries over the same
+        older range read the store once; ranges larger than the ring itself are not kept.
+        """
+        if self._spill_cache is not None:
+            cached_start, cached_until, cached = self._spill_cache
+            covers = cached_start is None or (start is not None and start >= cached_start)
+            if covers and cached_until == self.spilled_until:
+                return cached
+
+        end = self.spilled_until
+        older = PointBuffer(capacity=None)
+        for record in self.store.iter_records(self._segments_from(start)):
+            ts = parse_timestamp(record.get("timestamp"))
+            if ts is None or (start is not None and ts < start):
+                continue
+            if end is not None and ts > end:
+                break
+            older.append(record)
+        if self.capacity is None or len(older) <= self.capacity:
+            self._spill_cache = (start, end, older)
+        return older
+
+    def _segment_start(self, seq: int) -> Optional[float]:
+        if seq not in self._segment_starts:
+            first = self.store.first_record(seq)
+            ts = parse_timestamp(first.get("timestamp")) if first else None
+            if ts is None:
+                return None
+            self._segment_starts[seq] = ts
+        return self._segment_starts[seq]
+
+    def _segments_from(self, start: Optional[float]) -> List[int]:
+        """Segments from the one that holds `start` on: the last that begins at or before it"""
+        seqs = self.store.segments()
+        if start is None:
+            return seqs
+        # Binary search on each segment's first timestamp; an unknown one (empty or unreadable
+        # first line) counts as after `start`, which can only start the read earlier
+        lo, hi = 0, len(seqs)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            first = self._segment_start(seqs[mid])
+            if first is not None and first <= start:
+                lo = mid + 1
+            else:
+                hi = mid
+        return seqs[max(lo - 1, 0):]
+
+
+def concat_columns(first: Columns, second: Columns) -> Columns:
+    """Join two column sets in time order, aligning their coins"""
+    coins = list(dict.fromkeys(first[1] + second[1]))
+    columns = {}
+    for field in second[2]:
+        merged = np.full((len(first[0]) + len(second[0]), len(coins)), np.nan)
+        for offset, (_, part_coins, part) in ((0, first), (len(first[0]), second)):
+            index = [coins.index(coin) for coin in part_coins]
+            merged[offset:offset + len(part[field]), index] = part[field]
+        columns[field] = merged
+    return np.concatenate((first[0], second[0])), coins, columns
@@ -0,0 +1,260 @@
+"""Delta-encoded per-trader position history.
+
+Stored data points used to carry every tracked trader's raw clearinghouseState result
+(`trader_positions`) plus a normalized `position_index`, although most positions do not change
+from one tick to the next. The collector now stores a `position_delta` instead:
+
+- a keyframe every `keyframe_interval` ticks (and as the first record a collector writes),
+  holding every tracked trader's positions;
+- in between, only the coins whose size, entry price or leverage changed, the coins that were
+  closed and the traders that left the tracked list.
+
+A position is kept as `[size, entry_px, leverage]`; the USD value is derived from the data
+point's `asset_prices` on reconstruction, as `build_position_index` does. Traders whose fetch
+failed keep their last known positions in the encoder state and are left out of that tick's
+index, as before.
+
+PositionHistory replays the deltas: `index_at(timestamp)` returns the same
+{address: {coin: position}} shape as `build_position_index` for the record at or before
+`timestamp`, applying at most `keyframe_interval - 1` deltas. Records written before this
+format are treated as keyframes.
+"""
+import argparse
+import os
+import time
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aggregation import build_position_index
+from data_cache import parse_timestamp
+from storage import SegmentStore
+
+DEFAULT_KEYFRAME_INTERVAL = 12  # one keyframe an hour at 5-minute ticks
+
+# address -> coin -> [size, entry_px, leverage]
+PositionState = Dict[str, Dict[str, List]]
+
+
+def _failed(record: Dict) -> List[str]:
+    return (record.get("fetch_status") or {}).get("failed_traders") or []
+
+
+def _prices(record: Dict) -> Dict[str, float]:
+    return record.get("asset_prices") or {"BTC": record.get("btc_price"), "ETH": record.get("eth_price")}
+
+
+def compact_index(position_index: Dict[str, Dict[str, Dict]]) -> PositionState:
+    """{address: {coin: position}} as produced by build_position_index -> compact state"""
+    return {
+        address: {coin: [p["size"], p["entry_px"], p["leverage"]] for coin, p in coins.items()}
+        for address, coins in position_index.items()
+    }
+
+
+def expand_state(state: PositionState, prices: Dict[str, float], skip: Iterable[str] = ()) -> Dict[str, Dict[str, Dict]]:
+    """Compact state -> the position index shape served by the API"""
+    skip = set(skip)
+    index = {}
+    for address, coins in state.items():
+        if address in skip:
+            continue
+        index[address] = {
+            coin: {
+                "size": size,
+                "usd_value": abs(size) * (prices.get(coin) or 0.0),
+                "entry_px": entry_px,
+                "leverage": leverage,
+            }
+            for coin, (size, entry_px, leverage) in coins.items()
+        }
+    return index
+
+
+def record_state(record: Dict) -> Optional[PositionState]:
+    """Positions of a full (not delta-encoded) data point, or None if it has none"""
+    if "position_index" in record:
+        return compact_index(record["position_index"])
+    if isinstance(record.get("trader_positions"), list):
+        return compact_index(build_position_index(record["trader_positions"], _prices(record)))
+    return None
+
+
+class PositionDeltaEncoder:
+    """Turns consecutive full data points into keyframe/delta records for storage"""
+
+    def __init__(self, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._state: PositionState = {}
+        self._since_keyframe: Optional[int] = None  # None until the first keyframe is written
+
+    def reset(self):
+        """Make the next record a keyframe"""
+        self._state = {}
+        self._since_keyframe = None
+
+    def encode(self, data_point: Dict) -> Dict:
+        """Copy of `data_point` with `trader_positions`/`position_index` replaced by `position_delta`"""
+        record = {k: v for k, v in data_point.items() if k not in ("trader_positions", "position_index")}
+        current = record_state(data_point)
+        if current is None:
+            return record
+
+        failed = set(_failed(data_point))
+        tracked = {p["address"] for p in data_point.get("trader_positions") or []} or set(current) | failed
+        # A failed fetch says nothing new: carry the trader's last known positions forward
+        new_state = {address: current[address] if address in current else self._state.get(address, {})
+                     for address in tracked}
+
+        if self._since_keyframe is None or self._since_keyframe + 1 >= self.keyframe_interval:
+            record["position_delta"] = {"keyframe": True, "set": new_state}
+            self._since_keyframe = 0
+        else:
+            changed, closed = {}, {}
+            for address, coins in new_state.items():
+                old = self._state.get(address)
+                if old is None:
+                    changed[address] = coins
+                    continue
+                diff = {coin: p for coin, p in coins.items() if old.get(coin) != p}
+                gone = [coin for coin in old if coin not in coins]
+                if diff:
+                    changed[address] = diff
+                if gone:
+                    closed[address] = gone
+            delta = {"keyframe": False, "set": changed}
+            if closed:
+                delta["unset"] = closed
+            dropped = [address for address in self._state if address not in new_state]
+            if dropped:
+                delta["drop"] = dropped
+            record["position_delta"] = delta
+            self._since_keyframe += 1
+
+        self._state = new_state
+        return record
+
+
+def apply_delta(state: PositionState, delta: Dict) -> PositionState:
+    """State after `delta`; the input state is not modified"""
+    if delta.get("keyframe"):
+        return {address: dict(coins) for address, coins in delta["set"].items()}
+    state = dict(state)
+    for address in delta.get("drop", ()):
+        state.pop(address, None)
+    for address, coins in delta.get("unset", {}).items():
+        state[address] = {coin: p for coin, p in state.get(address, {}).items() if coin not in coins}
+    for address, coins in delta.get("set", {}).items():
+        state[address] = {**state.get(address, {}), **coins}
+    return state
+
+
+class PositionHistory:
+    """Reconstructs per-trader positions at any stored tick from keyframes and deltas.
+
+    Records must be added in storage order, which is the order they were encoded in. The most
+    recently reconstructed state is kept, so stepping forward (e.g. serving the latest tick
+    after each append) applies only the new deltas.
+    """
+
+    def __init__(self, records: Iterable[Dict] = ()):
+        self._timestamps: List[float] = []
+        self._records: List[Dict] = []
+        self._keyframes: List[int] = []  # position of the governing keyframe for each record
+        self._cached: Tuple[int, PositionState] = (-1, {})
+        self.extend(records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def extend(self, records: Iterable[Dict]):
+        for record in records:
+            if "position_delta" in record:
+                is_keyframe = record["position_delta"].get("keyframe", False)
+            elif record_state(record) is not None:
+                is_keyframe = True  # written before delta encoding
+            else:
+                continue
+            if not is_keyframe and not self._keyframes:
+                continue  # a delta without its keyframe cannot be reconstructed
+            ts = parse_timestamp(record.get("timestamp"))
+            if ts is None:
+                continue
+            self._keyframes.append(len(self._records) if is_keyframe else self._keyframes[-1])
+            self._timestamps.append(ts)
+            self._records.append(record)
+
+    def _position(self, timestamp: Optional[float]) -> int:
+        if timestamp is None:
+            return len(self._records) - 1
+        return bisect_right(self._timestamps, timestamp) - 1
+
+    def _state(self, i: int) -> PositionState:
+        cached_i, state = self._cached
+        start = self._keyframes[i]
+        if not (start <= cached_i <= i):
+            cached_i, state = start - 1, {}
+        for j in range(cached_i + 1, i + 1):
+            record = self._records[j]
+            delta = record.get("position_delta")
+            state = apply_delta(state, delta) if delta else record_state(record)
+        self._cached = (i, state)
+        return state
+
+    def state_at(self, timestamp: Optional[float] = None) -> PositionState:
+        """Compact state at or before `timestamp` (epoch seconds; latest if None)"""
+        i = self._position(timestamp)
+        return self._state(i) if i >= 0 else {}
+
+    def index_at(self, timestamp: Optional[float] = None) -> Dict[str, Dict[str, Dict]]:
+        """{address: {coin: position}} at or before `timestamp`, like build_position_index"""
+        i = self._position(timestamp)
+        if i < 0:
+            return {}
+        record = self._records[i]
+        return expand_state(self._state(i), _prices(record), skip=_failed(record))
+
+    def trader_at(self, address: str, timestamp: Optional[float] = None) -> Dict[str, Dict]:
+        """{coin: position} of one trader at or before `timestamp`"""
+        return self.index_at(timestamp).get(address, {})
+
+
+def convert_store(source: SegmentStore, target: SegmentStore,
+                  keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> int:
+    """Copy every record of `source` into `target`, delta-encoding positions; returns the count"""
+    encoder = PositionDeltaEncoder(keyframe_interval)
+    count = 0
+    batch = []
+    for record in source.iter_records():
+        batch.append(encoder.encode(record))
+        if len(batch) >= 500:
+            target.append_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        target.append_many(batch)
+        count += len(batch)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta-encode trader positions in a data point store")
+    parser.add_argument("source", help="store directory with full trader_positions (e.g. data)")
+    parser.add_argument("target", help="new store directory to write")
+    parser.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL)
+    args = parser.parse_args()
+
+    target = SegmentStore(args.target)
+    if not target.is_empty():
+        parser.error(f"{args.target} already contains data")
+    start = time.perf_counter()
+    count = convert_store(SegmentStore(args.source), target, args.keyframe_interval)
+    before = SegmentStore(args.source).total_bytes()
+    after = target.total_bytes()
+    print(f"✅ Converted {count} data points in {time.perf_counter() - start:.1f}s: "
+          f"{before / 1024 / 1024:.1f} MiB -> {after / 1024 / 1024:.1f} MiB "
+          f"({(1 - after / before) * 100 if before else 0:.0f}% smaller)")
+    print(f"Point the collector and API server at {os.path.abspath(args.target)} (or swap the directories)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from hl_client import HYPERLIQUID_INFO_API, HyperliquidClient
+
+
+class PriceFeed:
+    """Mark prices for every perp from a single metaAndAssetCtxs call per tick.
+
+    The coin -> index mapping is derived from `universe` once and only rebuilt when the
+    universe changes (new listings, delistings). Prices are kept in a TTL cache so the
+    screener, the collector and the API server can share one fetch instead of each
+    downloading the full universe.
+
+    With `background_refresh` set, a background task calls `get_prices(force=True)` on a
+    schedule and `get_prices_sync` just returns the latest prices without fetching.
+    """
+
+    def __init__(self, api_url: str = HYPERLIQUID_INFO_API, ttl_seconds: float = 10.0,
+                 client: Optional[HyperliquidClient] = None):
+        self.api_url = api_url
+        self.client = client  # Shared rate-limited client for async fetches, if provided
+        self.ttl_seconds = ttl_seconds
+        self._universe: Tuple[str, ...] = ()
+        self._coin_index: Dict[str, int] = {}
+        self._prices: Dict[str, float] = {}
+        self._fetched_at = 0.0
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._sync_lock = threading.Lock()
+        self.fetch_count = 0
+        self.cache_hits = 0
+        self.last_fetch_ok = False  # False while serving stale (or no) prices after a failed fetch
+        self.background_refresh = False
+
+    def _is_fresh(self) -> bool:
+        return bool(self._prices) and time.monotonic() - self._fetched_at < self.ttl_seconds
+
+    def _update_universe(self, universe: List[Dict]):
+        """Rebuild the coin -> index mapping only if the universe listing changed"""
+        names = tuple(asset["name"] for asset in universe)
+        if names != self._universe:
+            self._universe = names
+            self._coin_index = {name: i for i, name in enumerate(names)}
+
+    def _parse(self, data) -> Dict[str, float]:
+        """Turn a metaAndAssetCtxs response into {coin: mark price}"""
+        meta, contexts = data[0], data[1]
+        self._update_universe(meta["universe"])
+
+        prices = {}
+        for coin, i in self._coin_index.items():
+            if i < len(contexts) and contexts[i].get("markPx") is not None:
+                prices[coin] = float(contexts[i]["markPx"])
+        return prices
+
+    def _store(self, prices: Dict[str, float]):
+        self._prices = prices
+        self._fetched_at = time.monotonic()
+        self.fetch_count += 1
+        self.last_fetch_ok = True
+
+    async def get_prices(self, force: bool = False) -> Dict[str, float]:
+        """Get mark prices for all coins, fetching at most once per TTL"""
+        if not force and self._is_fresh():
+            self.cache_hits += 1
+            return self._prices
+
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+
+        async with self._async_lock:
+            # Another caller may have refreshed while we waited for the lock
+            if not force and self._is_fresh():
+                self.cache_hits += 1
+                return self._prices
+
+            try:
+                self._store(self._parse(await self._fetch()))
+            except Exception as e:
+                print(f"Error fetching prices: {e}")
+                # Serve the last known prices rather than nothing, but flag them as stale
+                self.last_fetch_ok = False
+
+        return self._prices
+
+    async def _fetch(self):
+        payload = {"type": "metaAndAssetCtxs"}
+        if self.client is not None:
+            return await self.client.post_info(payload)
+        async with aiohttp.ClientSession() as session:
+            async with session.post(self.api_url, json=payload) as response:
+                return await response.json()
+
+    async def get_price(self, coin: str) -> float:
+        """Get the current mark price for a single coin (0.0 if unknown)"""
+        prices = await self.get_prices()
+        return prices.get(coin, 0.0)
+
+    def get_prices_sync(self, force: bool = False, timeout: float = 10.0) -> Dict[str, float]:
+        """Blocking variant for synchronous callers such as the Flask API server"""
+        if self.background_refresh and not force:
+            self.cache_hits += 1
+            return self._prices
+        if not force and self._is_fresh():
+            self.cache_hits += 1
+            return self._prices
+
+        with self._sync_lock:
+            if not force and self._is_fresh():
+                self.cache_hits += 1
+                return self._prices
+
+            try:
+                import requests  # the collector only uses the async path
+                response = requests.post(self.api_url, json={"type": "metaAndAssetCtxs"}, timeout=timeout)
+                self._store(self._parse(response.json()))
+            except Exception as e:
+                print(f"Error fetching prices: {e}")
+                self.last_fetch_ok = False
+
+        return self._prices
+
+    @property
+    def coins(self) -> Tuple[str, ...]:
+        """Coins in the most recently seen universe, in index order"""
+        return self._universe
@@ -3,6 +3,7 @@ import aiohttp
 import requests
 import json
 from datetime import datetime
+from hl_client import HYPERLIQUID_INFO_API, LEADERBOARD_API
 
 async def quick_test():
     """Quick test to verify the setup and collect a single data point"""
@@ -10,7 +11,7 @@ async def quick_test():
     # Test 1: Check if leaderboard API is running
     print("Testing leaderboard API...")
     try:
-        response = requests.post("http://localhost:3000/leaderboard", json={"limit": 5})
+        response = requests.post(LEADERBOARD_API, json={"limit": 5})
         leaderboard_data = response.json()
         if "error" not in leaderboard_data:
             print(f"✓ Leaderboard API is working. Found {len(leaderboard_data['leaderboardRows'])} traders")
@@ -27,7 +28,7 @@ async def quick_test():
     print("\nTesting Hyperliquid API...")
     try:
         # Get price data
-        response = requests.post("https://api.hyperliquid.xyz/info", 
+        response = requests.post(HYPERLIQUID_INFO_API, 
                                json={"type": "metaAndAssetCtxs"})
         data = response.json()
         
@@ -56,7 +57,7 @@ async def quick_test():
     top_trader = leaderboard_data['leaderboardRows'][0]['ethAddress']
     
     try:
-        response = requests.post("https://api.hyperliquid.xyz/info",
+        response = requests.post(HYPERLIQUID_INFO_API,
                                json={"type": "clearinghouseState", "user": top_trader})
         position_data = response.json()
         
@@ -80,7 +81,7 @@ async def quick_test():
     except Exception as e:
         print(f"✗ Error fetching position data: {e}")
     
-    print("\n✓ All tests passed! You can now run the backtest with: python backtest.py")
+    print("\n✓ All tests passed! You can now run the backtest with: python cli.py collect")
     print("\nNote: The backtest will collect data over time. For a quick demo, you can modify")
     print("the duration_hours and interval_minutes parameters in backtest.py")
 
@@ -0,0 +1,198 @@
+"""Offline replay of signal-driven strategies over stored data points.
+
+Example:
+    python replay.py --asset BTC --strategy net_flow \\
+        --grid threshold_usd=1e6,5e6,2e7 lookback=1,3,12 direction=follow,fade \\
+        --fee-bps 4.5 --slippage-bps 1 --workers 4
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis import load_frame
+from storage import DATA_DIR, SegmentStore
+
+PERIODS_PER_YEAR_SECONDS = 365 * 24 * 3600
+
+
+def load_asset_frame(records: List[Dict], asset: str) -> pd.DataFrame:
+    """Price and aggregate positioning for one asset, indexed by timestamp.
+
+    Ticks where the asset has no price are dropped.
+    """
+    frame = load_frame(records)
+    if asset not in frame.columns.get_level_values(0):
+        return pd.DataFrame(columns=["price", "net_usd", "long_usd", "short_usd"])
+    frame = frame[asset].reindex(columns=["price", "net_usd", "long_usd", "short_usd"])
+    frame[["net_usd", "long_usd", "short_usd"]] = frame[["net_usd", "long_usd", "short_usd"]].fillna(0.0)
+    return frame[frame["price"] > 0]
+
+
+# ---- strategies ---------------------------------------------------------------------------
+# Each strategy maps a frame to a target position series in {-1, 0, +1}, decided at the close
+# of each tick. Positions are held until the next signal.
+
+def net_flow_signal(frame: pd.DataFrame, threshold_usd: float, lookback: int = 1,
+                    direction: str = "follow", long_only: bool = False) -> pd.Series:
+    """Go with (or against) the top traders when net_usd moves by more than threshold over `lookback` ticks"""
+    change = frame["net_usd"].diff(int(lookback))
+    signal = pd.Series(np.where(change > threshold_usd, 1.0, np.where(change < -threshold_usd, -1.0, np.nan)),
+                       index=frame.index)
+    if direction == "fade":
+        signal = -signal
+    if long_only in (True, "true", "True", 1):
+        signal = signal.clip(lower=0)
+    return signal.ffill().fillna(0.0)
+
+
+def long_short_ratio_signal(frame: pd.DataFrame, upper: float, lower: float,
+                            direction: str = "follow") -> pd.Series:
+    """Long when long/short USD ratio is above `upper`, short when below `lower`, else hold"""
+    ratio = frame["long_usd"] / frame["short_usd"].replace(0, np.nan)
+    signal = pd.Series(np.where(ratio > upper, 1.0, np.where(ratio < lower, -1.0, np.nan)), index=frame.index)
+    if direction == "fade":
+        signal = -signal
+    return signal.ffill().fillna(0.0)
+
+
+STRATEGIES: Dict[str, Callable[..., pd.Series]] = {
+    "net_flow": net_flow_signal,
+    "ls_ratio": long_short_ratio_signal,
+}
+
+
+# ---- simulation ---------------------------------------------------------------------------
+
+def simulate(frame: pd.DataFrame, position: pd.Series, fee_bps: float = 4.5, slippage_bps: float = 1.0) -> Dict:
+    """Vectorized PnL of holding `position` (decided at each tick's close) with per-trade costs"""
+    if len(frame) < 2:
+        return {"total_return": 0.0, "sharpe": 0.0, "max_drawdown": 0.0, "trades": 0,
+                "exposure": 0.0, "buy_and_hold_return": 0.0, "ticks": len(frame)}
+
+    price = frame["price"].to_numpy()
+    pos = position.to_numpy()
+    asset_returns = np.diff(price) / price[:-1]
+    held = pos[:-1]  # position taken at tick t earns the move from t to t+1
+
+    turnover = np.abs(np.diff(np.concatenate(([0.0], pos))))[:-1]
+    costs = turnover * (fee_bps + slippage_bps) / 10_000
+    strategy_returns = held * asset_returns - costs
+
+    equity = np.cumprod(1.0 + strategy_returns)
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0
+
+    seconds = np.diff(frame.index.asi8) / 1e9
+    tick_seconds = float(np.median(seconds)) if len(seconds) else 0.0
+    std = strategy_returns.std()
+    sharpe = (strategy_returns.mean() / std * np.sqrt(PERIODS_PER_YEAR_SECONDS / tick_seconds)
+              if std > 0 and tick_seconds > 0 else 0.0)
+
+    return {
+        "total_return": float(equity[-1] - 1.0),
+        "sharpe": float(sharpe),
+        "max_drawdown": float(drawdown.min()),
+        "trades": int(np.count_nonzero(turnover)),
+        "exposure": float(np.mean(held != 0)),
+        "buy_and_hold_return": float(price[-1] / price[0] - 1.0),
+        "ticks": len(frame),
+    }
+
+
+def run_strategy(frame: pd.DataFrame, strategy: str, params: Dict,
+                 fee_bps: float = 4.5, slippage_bps: float = 1.0) -> Dict:
+    position = STRATEGIES[strategy](frame, **params)
+    return {**params, **simulate(frame, position, fee_bps, slippage_bps)}
+
+
+# ---- parameter sweeps ---------------------------------------------------------------------
+
+_worker_frame: Optional[pd.DataFrame] = None
+
+
+def _init_worker(frame: pd.DataFrame):
+    # Each worker process receives the frame once instead of once per parameter set
+    global _worker_frame
+    _worker_frame = frame
+
+
+def _run_batch(args) -> List[Dict]:
+    strategy, batch, fee_bps, slippage_bps = args
+    return [run_strategy(_worker_frame, strategy, params, fee_bps, slippage_bps) for params in batch]
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def run_sweep(frame: pd.DataFrame, strategy: str, grid: Dict[str, List], fee_bps: float = 4.5,
+              slippage_bps: float = 1.0, workers: Optional[int] = None, rank_by: str = "sharpe") -> pd.DataFrame:
+    """Evaluate every parameter combination across a process pool; best first"""
+    combos = expand_grid(grid)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or len(combos) < 2:
+        _init_worker(frame)
+        results = _run_batch((strategy, combos, fee_bps, slippage_bps))
+    else:
+        # A few batches per worker balances load without paying per-task overhead
+        batch_size = max(1, len(combos) // (workers * 4))
+        batches = [combos[i:i + batch_size] for i in range(0, len(combos), batch_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(frame,)) as pool:
+            results = [row for batch in pool.map(_run_batch, [(strategy, b, fee_bps, slippage_bps) for b in batches])
+                       for row in batch]
+
+    table = pd.DataFrame(results).sort_values(rank_by, ascending=False).reset_index(drop=True)
+    table.index.name = "rank"
+    table.index += 1
+    return table
+
+
+def parse_grid(items: List[str]) -> Dict[str, List]:
+    """Parse ['threshold_usd=1e6,5e6', 'direction=follow,fade'] into a grid dict"""
+    grid = {}
+    for item in items:
+        key, values = item.split("=", 1)
+        parsed = []
+        for value in values.split(","):
+            try:
+                parsed.append(float(value) if any(c in value for c in ".eE") else int(value))
+            except ValueError:
+                parsed.append(value)
+        grid[key] = parsed
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay strategies over stored data points")
+    parser.add_argument("--dir", default=DATA_DIR, help="data store directory (default: %(default)s)")
+    parser.add_argument("--asset", default="BTC")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="net_flow")
+    parser.add_argument("--grid", nargs="+", required=True, help="parameter lists, e.g. threshold_usd=1e6,5e6 lookback=1,3")
+    parser.add_argument("--fee-bps", type=float, default=4.5, help="fee per unit of turnover (default: %(default)s)")
+    parser.add_argument("--slippage-bps", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--rank-by", default="sharpe")
+    parser.add_argument("--out", default="replay_results.csv")
+    args = parser.parse_args()
+
+    frame = load_asset_frame(SegmentStore(args.dir).read_all(), args.asset)
+    if len(frame) < 2:
+        print("Not enough data points for replay")
+        return
+    print(f"Replaying {args.strategy} on {args.asset}: {len(frame)} ticks from {frame.index[0]} to {frame.index[-1]}")
+
+    table = run_sweep(frame, args.strategy, parse_grid(args.grid), args.fee_bps, args.slippage_bps,
+                      args.workers, args.rank_by)
+    table.to_csv(args.out)
+    print(table.head(10).to_string())
+    print(f"\n{len(table)} parameter sets ranked by {args.rank_by}, saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import math
+from collections import deque
+from typing import Dict, List, Optional
+
+from data_cache import parse_timestamp
+
+DEFAULT_WINDOWS = {"1h": 3600, "24h": 86400, "7d": 7 * 86400}
+
+
+class RollingWindow:
+    """Time-based sliding window over (x, y) pairs with O(1) amortized updates.
+
+    Running sums give mean, variance, covariance and correlation without rescanning the
+    window. Subtracting evicted values accumulates float error, so the sums are recomputed
+    exactly once as many evictions as the window holds have happened (amortized O(1)).
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.items = deque()
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+        self._evictions = 0
+
+    def add(self, t: float, x: float, y: float):
+        self.items.append((t, x, y))
+        self.n += 1
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.syy += y * y
+        self.sxy += x * y
+
+        while self.items and t - self.items[0][0] > self.seconds:
+            _, ox, oy = self.items.popleft()
+            self.n -= 1
+            self.sx -= ox
+            self.sy -= oy
+            self.sxx -= ox * ox
+            self.syy -= oy * oy
+            self.sxy -= ox * oy
+            self._evictions += 1
+
+        if self._evictions > max(self.n, 64):
+            self._resum()
+
+    def _resum(self):
+        self.sx = sum(x for _, x, _ in self.items)
+        self.sy = sum(y for _, _, y in self.items)
+        self.sxx = sum(x * x for _, x, _ in self.items)
+        self.syy = sum(y * y for _, _, y in self.items)
+        self.sxy = sum(x * y for _, x, y in self.items)
+        self._evictions = 0
+
+    def _var(self, s: float, ss: float) -> Optional[float]:
+        if self.n < 2:
+            return None
+        return max(0.0, (ss - s * s / self.n) / (self.n - 1))
+
+    def stats(self) -> Dict:
+        """Sample statistics for x (net_usd change) and y (price change)"""
+        var_x = self._var(self.sx, self.sxx)
+        var_y = self._var(self.sy, self.syy)
+        cov = (self.sxy - self.sx * self.sy / self.n) / (self.n - 1) if self.n >= 2 else None
+        std_x = math.sqrt(var_x) if var_x is not None else None
+        std_y = math.sqrt(var_y) if var_y is not None else None
+        corr = cov / (std_x * std_y) if cov is not None and std_x and std_y else None
+        last_x = self.items[-1][1] if self.items else None
+        mean_x = self.sx / self.n if self.n else None
+        return {
+            "n": self.n,
+            "net_usd_change_mean": mean_x,
+            "net_usd_change_std": std_x,
+            "net_usd_change_last": last_x,
+            "net_usd_change_zscore": (last_x - mean_x) / std_x if std_x else None,
+            "price_change_mean": self.sy / self.n if self.n else None,
+            "price_change_std": std_y,
+            "covariance": cov,
+            "correlation": max(-1.0, min(1.0, corr)) if corr is not None else None,
+        }
+
+
+class RollingStatsEngine:
+    """Incremental position/price statistics per asset over several time windows.
+
+    Call update() with each new data point in time order. For every asset the engine keeps
+    the change in net_usd since the previous point (x) and the price change (y) in each
+    window. Incomplete data points break the chain rather than producing a spurious jump.
+    """
+
+    def __init__(self, windows: Optional[Dict[str, float]] = None):
+        self.windows = windows or DEFAULT_WINDOWS
+        self.max_window = max(self.windows.values())
+        self._assets: Dict[str, Dict[str, RollingWindow]] = {}
+        self._previous: Dict[str, tuple] = {}  # asset -> (net_usd, price) at the previous point
+        self.last_timestamp: Optional[float] = None
+        self.updates = 0
+
+    @staticmethod
+    def _asset_values(record: Dict) -> Dict[str, tuple]:
+        """{asset: (net_usd, price)} for every asset in a data point"""
+        positions = record.get("asset_positions")
+        prices = record.get("asset_prices")
+        if positions is None or prices is None:
+            positions = {"BTC": record.get("btc_positions") or {}, "ETH": record.get("eth_positions") or {}}
+            prices = {"BTC": record.get("btc_price"), "ETH": record.get("eth_price")}
+        values = {}
+        for asset, aggregate in positions.items():
+            price = prices.get(asset)
+            if price:
+                values[asset] = (aggregate.get("net_usd", 0.0), float(price))
+        return values
+
+    def update(self, record: Dict):
+        t = parse_timestamp(record.get("timestamp"))
+        if t is None or (self.last_timestamp is not None and t <= self.last_timestamp):
+            return
+        self.last_timestamp = t
+        self.updates += 1
+
+        if not record.get("fetch_status", {}).get("complete", True):
+            self._previous = {}
+            return
+
+        values = self._asset_values(record)
+        for asset, (net_usd, price) in values.items():
+            previous = self._previous.get(asset)
+            if previous is not None:
+                prev_net, prev_price = previous
+                windows = self._assets.get(asset)
+                if windows is None:
+                    windows = self._assets[asset] = {name: RollingWindow(s) for name, s in self.windows.items()}
+                for window in windows.values():
+                    window.add(t, net_usd - prev_net, price / prev_price - 1.0)
+        # Assets missing from this point start a fresh chain next time they appear
+        self._previous = values
+
+    @property
+    def assets(self) -> List[str]:
+        """Assets with statistics so far"""
+        return sorted(self._assets)
+
+    def snapshot(self, asset: Optional[str] = None, window: Optional[str] = None) -> Dict:
+        """Current statistics, optionally limited to one asset and/or window"""
+        assets = {}
+        for name, windows in self._assets.items():
+            if asset is not None and name != asset:
+                continue
+            assets[name] = {
+                w: rolling.stats() for w, rolling in windows.items()
+                if window is None or w == window
+            }
+        return {
+            "updated_at": self.last_timestamp,
+            "updates": self.updates,
+            "windows": {name: seconds for name, seconds in self.windows.items()},
+            "assets": assets,
+        }
@@ -0,0 +1,313 @@
+"""Hourly and daily rollups of the data point store, and retention of raw points.
+
+Compaction folds raw data points into fixed buckets aligned to UTC multiples of the tier width:
+`1h` buckets from the raw points, `1d` buckets from the `1h` rows. Each tier is a SegmentStore
+under `<store>/rollups/<tier>/` holding one row per closed bucket:
+
+    {"timestamp": "...", "bucket_start": 1767225600.0, "bucket_seconds": 3600, "points": 12,
+     "assets": {"BTC": {"open": ..., "high": ..., "low": ..., "close": ..., "price_mean": ...,
+                        "net_usd_mean": ..., "net_usd_last": ..., "net_usd_min": ..., "net_usd_max": ...,
+                        "net_tokens_mean": ..., ..., "points": 12, "price_points": 12}, ...}}
+
+A bucket is closed once a point from a later bucket has been stored; the points of the open
+bucket are carried in the compactor's state file between runs. Means are weighted by `points`,
+so a coarser bucket (or a re-bucketed query) computed from finer rows equals one computed from
+the raw points.
+
+Raw segments are deleted once every point in them is older than the retention period and has
+been rolled up. Whole segments are removed, so up to one segment (a week at 5-minute ticks) more
+than the retention period is kept; the newest segment is never removed.
+
+Usage: python rollups.py [--dir data] [--retention-days 30]   # one compaction pass, e.g. from cron
+       python rollups.py --info
+"""
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data_cache import parse_timestamp
+from point_buffer import PointBuffer, record_values
+from storage import DATA_DIR, SegmentStore
+
+ROLLUP_DIR = "rollups"
+STATE_FILE = "state.json"
+TIERS = (("1h", 3600), ("1d", 86400))
+RAW_RETENTION_DAYS = float(os.environ.get("RAW_RETENTION_DAYS", "30"))
+
+ROLLUP_FIELDS = ("net_usd", "net_tokens")
+# Per-coin statistics of a rollup row, and how each combines across the rows of a coarser bucket
+STATS = {
+    "open": "first", "high": "max", "low": "min", "close": "last", "price_mean": "mean:price_points",
+    **{f"{field}_{stat}": combine for field in ROLLUP_FIELDS
+       for stat, combine in (("mean", "mean:points"), ("last", "last"), ("min", "min"), ("max", "max"))},
+    "points": "sum", "price_points": "sum",
+}
+
+# (bucket starts, coins, {stat: buckets x coins matrix}), oldest first
+Rollup = Tuple[np.ndarray, List[str], Dict[str, np.ndarray]]
+
+
+def point_columns(points: PointBuffer) -> Rollup:
+    """Raw points as one-point rollup rows, so every tier is built by the same reduction"""
+    timestamps, coins, columns = points.range(fields=("price",) + ROLLUP_FIELDS)
+    price = columns["price"]
+    stats = {stat: price for stat in ("open", "high", "low", "close", "price_mean")}
+    for field in ROLLUP_FIELDS:
+        for stat in ("mean", "last", "min", "max"):
+            stats[f"{field}_{stat}"] = columns[field]
+    stats["points"] = np.isfinite(columns[ROLLUP_FIELDS[0]]).astype(float)
+    stats["price_points"] = np.isfinite(price).astype(float)
+    return timestamps, coins, stats
+
+
+def reduce_buckets(timestamps: np.ndarray, columns: Dict[str, np.ndarray], bucket_seconds: float,
+                   points: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """(bucket starts, raw points per bucket, {stat: bucket x coin matrix}) for sorted rows.
+
+    `points` is the raw point count of each row (1 for raw points). NaN marks a coin without a
+    value in a row and is skipped by every statistic.
+    """
+    if not len(timestamps):
+        return timestamps[:0], np.array([], dtype=int), {stat: values[:0] for stat, values in columns.items()}
+    buckets = np.floor_divide(timestamps, bucket_seconds)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    rows = np.arange(len(timestamps))[:, None]
+
+    reduced = {}
+    for stat, combine in STATS.items():
+        values = columns[stat]
+        finite = np.isfinite(values)
+        if combine == "sum":
+            reduced[stat] = np.add.reduceat(np.where(finite, values, 0.0), starts)
+        elif combine == "max":
+            reduced[stat] = np.fmax.reduceat(values, starts)  # fmax/fmin ignore NaN
+        elif combine == "min":
+            reduced[stat] = np.fmin.reduceat(values, starts)
+        elif combine in ("first", "last"):
+            if combine == "first":
+                index = np.minimum.reduceat(np.where(finite, rows, len(timestamps)), starts)
+            else:
+                index = np.maximum.reduceat(np.where(finite, rows, -1), starts)
+            found = (index >= 0) & (index < len(timestamps))
+            picked = np.take_along_axis(values, np.clip(index, 0, len(timestamps) - 1), axis=0)
+            reduced[stat] = np.where(found, picked, np.nan)
+        else:
+            weights = columns[combine.split(":")[1]]
+            weights = np.where(finite & np.isfinite(weights), weights, 0.0)
+            total = np.add.reduceat(weights, starts)
+            weighted = np.add.reduceat(np.where(weights > 0, values, 0.0) * weights, starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                reduced[stat] = np.where(total > 0, weighted / total, np.nan)
+    counts = np.add.reduceat(points if points is not None else np.ones(len(timestamps)), starts)
+    return buckets[starts] * bucket_seconds, counts, reduced
+
+
+def rows_to_columns(rows: List[Dict]) -> Rollup:
+    """Stored rollup rows -> columns; missing coins and statistics are NaN. The row's own point
+    count is returned under "row_points"
+    """
+    coins = list(dict.fromkeys(coin for row in rows for coin in row["assets"]))
+    position = {coin: j for j, coin in enumerate(coins)}
+    columns = {stat: np.full((len(rows), len(coins)), np.nan) for stat in STATS}
+    for i, row in enumerate(rows):
+        for coin, values in row["assets"].items():
+            j = position[coin]
+            for stat, value in values.items():
+                if stat in columns and value is not None:
+                    columns[stat][i, j] = value
+    columns["row_points"] = np.array([row["points"] for row in rows], dtype=float)
+    return np.array([row["bucket_start"] for row in rows], dtype=float), coins, columns
+
+
+def columns_to_rows(starts: np.ndarray, counts: np.ndarray, coins: List[str],
+                    columns: Dict[str, np.ndarray], bucket_seconds: int) -> List[Dict]:
+    """Reduced buckets -> rows for storage, leaving out coins with no values in a bucket"""
+    lists = {stat: values.tolist() for stat, values in columns.items()}
+    rows = []
+    for i, start in enumerate(starts.tolist()):
+        assets = {}
+        for j, coin in enumerate(coins):
+            if not (lists["points"][i][j] or lists["price_points"][i][j]):
+                continue
+            assets[coin] = {stat: values[i][j] for stat, values in lists.items() if not math.isnan(values[i][j])}
+        rows.append({
+            "timestamp": datetime.fromtimestamp(start).isoformat(sep=" "),
+            "bucket_start": start,
+            "bucket_seconds": bucket_seconds,
+            "points": int(counts[i]),
+            "assets": assets,
+        })
+    return rows
+
+
+def slim_record(record: Dict) -> Dict:
+    """The parts of a data point the rollups use, kept for the open bucket between runs"""
+    prices, aggregates = record_values(record)
+    return {
+        "timestamp": record.get("timestamp"),
+        "asset_prices": prices,
+        "asset_positions": {coin: {field: aggregate.get(field) for field in ROLLUP_FIELDS}
+                            for coin, aggregate in aggregates.items()},
+    }
+
+
+class Compactor:
+    """Incrementally builds the rollup tiers from new raw points and expires old raw segments"""
+
+    def __init__(self, store: SegmentStore, raw_retention_days: Optional[float] = RAW_RETENTION_DAYS,
+                 tiers: Tuple[Tuple[str, int], ...] = TIERS):
+        self.store = store
+        self.raw_retention_seconds = raw_retention_days * 86400 if raw_retention_days else None
+        self.directory = os.path.join(store.directory, ROLLUP_DIR)
+        self.tiers = [(name, seconds, SegmentStore(os.path.join(self.directory, name))) for name, seconds in tiers]
+        self.state_path = os.path.join(self.directory, STATE_FILE)
+
+    def tier_store(self, name: str) -> SegmentStore:
+        return next(store for tier, _, store in self.tiers if tier == name)
+
+    # ---- state --------------------------------------------------------------------------
+
+    def load_state(self) -> Dict:
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            state["position"] = tuple(state["position"]) if state.get("position") else None
+            return state
+        except FileNotFoundError:
+            return {"position": None, "pending": []}
+
+    def save_state(self, state: Dict):
+        """Write the state file atomically, so a crash leaves the previous one intact"""
+        os.makedirs(self.directory, exist_ok=True)
+        temp = f"{self.state_path}.tmp"
+        with open(temp, "w") as f:
+            json.dump(state, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.state_path)
+
+    # ---- compaction ---------------------------------------------------------------------
+
+    def _append_closed(self, store: SegmentStore, rows: List[Dict]) -> int:
+        """Append rows newer than the tier's last row (a retried run may produce them again)"""
+        last = store.last_record()
+        if last is not None:
+            rows = [row for row in rows if row["bucket_start"] > last["bucket_start"]]
+        if rows:
+            store.append_many(rows)
+        return len(rows)
+
+    def run(self, now: Optional[float] = None) -> Dict:
+        """One compaction pass; returns counts of points read, rows written and segments expired"""
+        started = time.perf_counter()
+        state = self.load_state()
+        records, position = self.store.read_since(state["position"])
+        slims = state["pending"] + [slim_record(r) for r in records]
+        points = PointBuffer.from_records(slims)
+        written = {name: 0 for name, _, _ in self.tiers}
+
+        # Raw points -> the finest tier; each coarser tier is built from the rows of the one before
+        timestamps, coins, columns = point_columns(points)
+        row_points = None
+        pending_from = None
+        for level, (name, seconds, tier) in enumerate(self.tiers):
+            if level > 0:
+                previous_seconds = self.tiers[level - 1][1]
+                last = tier.last_record()
+                since = last["bucket_start"] + seconds if last else None
+                # Rows of the open bucket plus everything just closed in the finer tier
+                source = [row for row in self.tiers[level - 1][2].read_tail(written[self.tiers[level - 1][0]]
+                                                                            + seconds // previous_seconds)
+                          if since is None or row["bucket_start"] >= since]
+                timestamps, coins, columns = rows_to_columns(source)
+                row_points = columns.pop("row_points")
+            starts, counts, reduced = reduce_buckets(timestamps, columns, seconds, row_points)
+            if len(starts) < 2:
+                if level == 0:
+                    pending_from = starts[0] if len(starts) else None
+                continue
+            # The newest bucket can still receive points
+            closed = columns_to_rows(starts[:-1], counts[:-1], coins,
+                                     {stat: values[:-1] for stat, values in reduced.items()}, seconds)
+            written[name] = self._append_closed(tier, closed)
+            if level == 0:
+                pending_from = starts[-1]
+
+        keep = [] if pending_from is None else [
+            slim for slim in slims if (parse_timestamp(slim["timestamp"]) or 0) >= pending_from]
+        self.save_state({"position": list(position), "pending": keep})
+
+        # Raw points before the open bucket are safely rolled up
+        expired = self.expire(now, pending_from)
+        return {"points": len(records), "rows": written, "expired_segments": expired,
+                "seconds": time.perf_counter() - started}
+
+    # ---- retention ----------------------------------------------------------------------
+
+    def _first_timestamp(self, seq: int) -> Optional[float]:
+        try:
+            with open(self.store.segment_path(seq), "rb") as f:
+                line = f.readline()
+        except FileNotFoundError:
+            return None
+        try:
+            return parse_timestamp(json.loads(line).get("timestamp"))
+        except ValueError:
+            return None
+
+    def expire(self, now: Optional[float], rolled_up_until: Optional[float]) -> int:
+        """Delete the oldest raw segments whose points are all past retention and rolled up"""
+        if self.raw_retention_seconds is None or rolled_up_until is None:
+            return 0
+        cutoff = min((now or time.time()) - self.raw_retention_seconds, rolled_up_until)
+        segments = self.store.segments()
+        removed = 0
+        # A segment ends before the next one starts, so look at the next segment's first point
+        for seq, following in zip(segments, segments[1:]):
+            first = self._first_timestamp(following)
+            if first is None or first > cutoff:
+                break
+            os.remove(self.store.segment_path(seq))
+            removed += 1
+        if removed:
+            print(f"🗑️ Expired {removed} raw segment(s) older than "
+                  f"{datetime.fromtimestamp(cutoff).isoformat(sep=' ', timespec='minutes')}")
+        return removed
+
+    def info(self) -> Dict:
+        tiers = {}
+        for name, seconds, store in self.tiers:
+            last = store.last_record()
+            first = next(store.iter_records(), None)
+            tiers[name] = {"bytes": store.total_bytes(), "first": first and first["timestamp"],
+                           "last": last and last["timestamp"]}
+        return {"raw_bytes": self.store.total_bytes(), "raw_segments": len(self.store.segments()), "tiers": tiers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build hourly/daily rollups and expire old raw data points")
+    parser.add_argument("--dir", default=DATA_DIR, help="store directory (default: %(default)s)")
+    parser.add_argument("--retention-days", type=float, default=RAW_RETENTION_DAYS,
+                        help="raw point retention, 0 to keep everything (default: %(default)s, "
+                             "or RAW_RETENTION_DAYS)")
+    parser.add_argument("--info", action="store_true", help="show tier sizes and ranges instead")
+    args = parser.parse_args()
+
+    compactor = Compactor(SegmentStore(args.dir), args.retention_days or None)
+    if args.info:
+        print(json.dumps(compactor.info(), indent=2))
+        return
+    stats = compactor.run()
+    rows = ", ".join(f"{count} {name}" for name, count in stats["rows"].items())
+    print(f"✅ Compacted {stats['points']} new data point(s) into {rows} row(s) in {stats['seconds']:.2f}s, "
+          f"expired {stats['expired_segments']} raw segment(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import asyncio
+import math
+import time
+from typing import AsyncIterator, Callable, Dict, Optional
+
+
+class FixedRateScheduler:
+    """Fires on wall-clock boundaries that are multiples of `interval_seconds`.
+
+    Each tick is scheduled from the clock, not from the end of the previous tick, so time
+    spent collecting never accumulates as drift: with a 5-minute interval ticks land on
+    :00, :05, :10, ... If a tick overruns past one or more boundaries, the missed ticks are
+    skipped (not fired late in a burst) and counted on the next tick.
+    """
+
+    def __init__(self, interval_seconds: float, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], "asyncio.Future"] = asyncio.sleep):
+        self.interval_seconds = interval_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.ticks_fired = 0
+        self.ticks_skipped = 0
+        self.overruns = 0
+
+    def next_boundary(self, now: float) -> float:
+        """First aligned boundary strictly after `now`"""
+        return (math.floor(now / self.interval_seconds) + 1) * self.interval_seconds
+
+    async def ticks(self, end_time: Optional[float] = None, fire_immediately: bool = False) -> AsyncIterator[Dict]:
+        """Yield one dict per tick until `end_time` (epoch seconds), if given.
+
+        The consumer's work between iterations is the tick's duration; the dict yielded for
+        each tick carries its scheduled time, start lag and how many boundaries were skipped
+        since the previous tick.
+        """
+        now = self.clock()
+        scheduled = now if fire_immediately else self.next_boundary(now)
+        skipped = 0
+
+        while end_time is None or scheduled < end_time:
+            delay = scheduled - self.clock()
+            if delay > 0:
+                await self.sleep(delay)
+
+            started = self.clock()
+            tick = {
+                "index": self.ticks_fired,
+                "scheduled_at": scheduled,
+                "started_at": started,
+                "start_lag_seconds": max(0.0, started - scheduled),
+                "skipped_ticks": skipped,
+            }
+            self.ticks_fired += 1
+            yield tick
+
+            # Work for this tick is done; find the next boundary we can still make
+            finished = self.clock()
+            next_scheduled = self.next_boundary(scheduled)
+            if finished >= next_scheduled:
+                self.overruns += 1
+                target = self.next_boundary(finished)
+                skipped = int(round((target - next_scheduled) / self.interval_seconds))
+                self.ticks_skipped += skipped
+                next_scheduled = target
+            else:
+                skipped = 0
+            scheduled = next_scheduled
+
+    def tick_report(self, tick: Dict) -> Dict:
+        """Timing record for a finished tick, suitable for storing in its data point"""
+        duration = self.clock() - tick["started_at"]
+        return {
+            "scheduled_at": tick["scheduled_at"],
+            "start_lag_seconds": tick["start_lag_seconds"],
+            "duration_seconds": duration,
+            "skipped_ticks": tick["skipped_ticks"],
+            "overrun": tick["started_at"] + duration >= self.next_boundary(tick["scheduled_at"]),
+        }
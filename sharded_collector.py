@@ -0,0 +1,431 @@
+"""Coordinator/worker collection mode for tracking thousands of traders.
+
+The coordinator screens the leaderboard, partitions the active traders across worker
+processes by a stable hash of the address, and fetches prices once per tick. Each worker has
+its own event loop, pooled HyperliquidClient and rate budget; per tick it fetches its shard's
+positions and returns only per-coin aggregates and compact positions, which the coordinator
+merges into one data point with the same layout as the single-process collector's.
+
+The Info API budget is per IP: workers sharing one egress IP must split it (the default),
+while workers behind separate IPs can each be given the full budget.
+
+Usage: python sharded_collector.py [hours] [--traders 2000] [--workers 4] [--interval-minutes 5]
+"""
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from aggregation import AGGREGATE_FIELDS, aggregate_all, build_position_index, empty_aggregate
+from backtest import HyperliquidBacktest
+from hl_client import DEFAULT_INFO_WEIGHT, HYPERLIQUID_INFO_API, INFO_REQUEST_WEIGHTS, INFO_WEIGHT_PER_MINUTE, \
+    LEADERBOARD_API, HyperliquidClient
+from position_history import compact_index, expand_state
+from scheduler import FixedRateScheduler
+
+PRICE_FETCH_WEIGHT = INFO_REQUEST_WEIGHTS.get("metaAndAssetCtxs", DEFAULT_INFO_WEIGHT)
+# The coordinator's own Info calls are one price fetch per tick. Its client bursts a quarter of
+# its budget, so this lets a fetch through at once and covers one-minute ticks with a retry
+COORDINATOR_WEIGHT_PER_MINUTE = 4 * PRICE_FETCH_WEIGHT
+
+
+def shard_of(address: str, shards: int) -> int:
+    """Stable shard for an address, so each worker keeps its traders (and activity cache) across refreshes"""
+    return zlib.crc32(address.lower().encode()) % shards
+
+
+class CollectorShard:
+    """Worker-side state: one shard's traders, client and activity cache"""
+
+    def __init__(self, index: int, info_url: str, leaderboard_url: str, weight_per_minute: float,
+                 max_connections: int = 50, screening_concurrency: int = 20):
+        self.index = index
+        client = HyperliquidClient(info_url, leaderboard_url, weight_per_minute=weight_per_minute,
+                                   max_connections=max_connections)
+        self.backtest = HyperliquidBacktest(info_url, leaderboard_url, client=client)
+        self.backtest.screening_concurrency = screening_concurrency
+        # The coordinator reports screening; workers only print errors and warnings
+        self.backtest.screening_progress = False
+        self.traders: List[str] = []
+
+    async def screen(self, addresses: List[str]) -> List[str]:
+        """Addresses of this shard that hold open positions (rank order kept)"""
+        return await self.backtest.screen_active_traders(addresses, len(addresses))
+
+    async def assign(self, addresses: List[str]) -> int:
+        self.traders = list(addresses)
+        return len(self.traders)
+
+    async def collect(self, prices: Dict[str, float]) -> Dict:
+        """Fetch this shard's positions and reduce them to mergeable aggregates"""
+        start = time.perf_counter()
+        sent_before = self.backtest.client.requests_sent
+        positions = await self.backtest.get_all_positions(self.traders)
+        fetched = time.perf_counter()
+        ok = [p for p in positions if p["ok"]]
+        self.backtest.activity.record_positions(positions, self.backtest.has_open_positions)
+        return {
+            "shard": self.index,
+            # Every aggregate field is a sum over traders, so shards merge by addition
+            "aggregates": aggregate_all(ok, prices),
+            "positions": compact_index(build_position_index(positions, prices)),
+            "failed": [p["address"] for p in positions if not p["ok"]],
+            "fetch_seconds": fetched - start,
+            "reduce_seconds": time.perf_counter() - fetched,
+            "requests": self.backtest.client.requests_sent - sent_before,
+        }
+
+    async def stats(self) -> Dict:
+        return {"shard": self.index, "traders": len(self.traders), **self.backtest.client.stats(),
+                "activity": self.backtest.activity.stats()}
+
+
+def worker_main(conn, index: int, info_url: str, leaderboard_url: str, weight_per_minute: float,
+                max_connections: int, screening_concurrency: int):
+    """Worker process: run commands from the coordinator until told to stop.
+
+    Commands run concurrently (a re-screen must not hold up the next collect), so each reply
+    carries the id of the request it answers.
+    """
+    # Workers share the coordinator's stdout: flush each error line as it happens
+    sys.stdout.reconfigure(line_buffering=True)
+
+    async def handle(shard: CollectorShard, request_id: int, command: str, args: tuple):
+        try:
+            conn.send((request_id, "ok", await getattr(shard, command)(*args)))
+        except Exception as e:
+            conn.send((request_id, "error", f"{type(e).__name__}: {e}"))
+
+    async def serve():
+        shard = CollectorShard(index, info_url, leaderboard_url, weight_per_minute, max_connections,
+                               screening_concurrency)
+        tasks = set()
+        try:
+            while True:
+                request_id, command, args = await asyncio.to_thread(conn.recv)
+                if command == "stop":
+                    break
+                task = asyncio.create_task(handle(shard, request_id, command, args))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await shard.backtest.client.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def merge_aggregates(parts: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    merged: Dict[str, Dict] = {}
+    for part in parts:
+        for coin, aggregate in part.items():
+            total = merged.setdefault(coin, empty_aggregate())
+            for field in AGGREGATE_FIELDS:
+                total[field] += aggregate[field]
+    return merged
+
+
+class ShardedCollector:
+    """Coordinator: screening, price fetches, shard fan-out and merging into one data point per tick.
+
+    Storage, metrics, tick bookkeeping and analysis are HyperliquidBacktest's, so the data
+    points land in the same store with the same layout.
+    """
+
+    def __init__(self, backtest: HyperliquidBacktest, workers: int = 4,
+                 weight_per_minute: float = INFO_WEIGHT_PER_MINUTE, shared_ip: bool = True,
+                 max_connections: int = 50, screening_concurrency: int = 20,
+                 coordinator_weight_per_minute: float = COORDINATOR_WEIGHT_PER_MINUTE):
+        self.backtest = backtest
+        self.workers = max(1, workers)
+        self.shared_ip = shared_ip
+        # Sharing one IP means sharing its budget: the coordinator's price fetches come out of it
+        # first and the workers split the rest
+        self.coordinator_weight_per_minute = min(coordinator_weight_per_minute, weight_per_minute)
+        backtest.client.set_weight_per_minute(self.coordinator_weight_per_minute)
+        if shared_ip:
+            self.worker_weight_per_minute = (weight_per_minute - self.coordinator_weight_per_minute) / self.workers
+        else:
+            self.worker_weight_per_minute = weight_per_minute
+        self.max_connections = max_connections
+        self.screening_concurrency = screening_concurrency
+        self._processes: List = []
+        self._conns: List = []
+        self._readers: List[asyncio.Task] = []
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._request_ids = itertools.count()
+        self._next_traders: Optional[List[str]] = None  # screened in the background, assigned at the next tick
+        self.last_tick: Dict = {}
+
+        metrics = backtest.metrics
+        self.shard_seconds = metrics.histogram(
+            "sharded_shard_seconds", "Time each worker took to fetch and reduce its shard", ("shard",))
+        self.shard_traders = metrics.gauge("sharded_shard_traders", "Traders assigned to each worker", ("shard",))
+
+    # ---- workers ------------------------------------------------------------------------
+
+    def start(self):
+        """Spawn the workers; call from the coordinator's event loop, which reads their replies"""
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(self.workers):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(
+                target=worker_main, name=f"collector-shard-{i}", daemon=True,
+                args=(child, i, self.backtest.hyperliquid_api, self.backtest.leaderboard_api,
+                      self.worker_weight_per_minute, self.max_connections, self.screening_concurrency))
+            process.start()
+            self._processes.append(process)
+            self._conns.append(parent)
+            self._readers.append(asyncio.create_task(self._read_replies(i, parent)))
+
+    def stop(self):
+        for conn in self._conns:
+            try:
+                conn.send((None, "stop", ()))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        for conn in self._conns:
+            conn.close()
+        for reader in self._readers:
+            reader.cancel()
+        self._processes, self._conns, self._readers = [], [], []
+
+    async def _read_replies(self, i: int, conn):
+        """Resolve each worker reply's pending call, in whatever order the worker finishes them"""
+        try:
+            while True:
+                request_id, status, result = await asyncio.to_thread(conn.recv)
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((status, result))
+        except (EOFError, OSError):
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_result(("error", f"shard {i} exited"))
+
+    async def _call(self, i: int, command: str, *args):
+        request_id = next(self._request_ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        self._conns[i].send((request_id, command, args))
+        status, result = await future
+        if status != "ok":
+            raise RuntimeError(f"shard {i} {command} failed: {result}")
+        return result
+
+    async def call_all(self, command: str, per_shard_args: Optional[List[tuple]] = None) -> List:
+        """Run a command on every worker concurrently; results in shard order"""
+        per_shard_args = per_shard_args or [()] * self.workers
+        return await asyncio.gather(*[self._call(i, command, *args) for i, args in enumerate(per_shard_args)])
+
+    def partition(self, addresses: List[str]) -> List[List[str]]:
+        shards: List[List[str]] = [[] for _ in range(self.workers)]
+        for address in addresses:
+            shards[shard_of(address, self.workers)].append(address)
+        return shards
+
+    # ---- screening ----------------------------------------------------------------------
+
+    async def screen(self, target_count: int, window_factor: float = 2.0) -> List[str]:
+        """Top `target_count` leaderboard accounts with open positions, screened by the workers.
+
+        Without a shared rank cut-off each worker checks its whole part of the window, so the
+        window is kept to `window_factor` times the target.
+        """
+        limit = int(target_count * window_factor)
+        data = await self.backtest.client.post_leaderboard({
+            "limit": limit, "offset": 0,
+            "sort": {"timePeriod": "allTime", "type": "pnl", "direction": "desc"},
+        })
+        if "error" in data:
+            print(f"Error fetching leaderboard: {data['error']}")
+            return []
+        ranked = [row["ethAddress"] for row in data["leaderboardRows"]]
+        print(f"Fetched {len(ranked)} traders from leaderboard, screening across {self.workers} worker(s)...")
+
+        start = time.perf_counter()
+        results = await self.call_all("screen", [(shard,) for shard in self.partition(ranked)])
+        active = set().union(*results)
+        traders = [address for address in ranked if address in active][:target_count]
+        print(f"✅ Found {len(traders)} active traders in {time.perf_counter() - start:.1f}s")
+        return traders
+
+    async def assign(self, traders: List[str]):
+        shards = self.partition(traders)
+        await self.call_all("assign", [(shard,) for shard in shards])
+        for i, shard in enumerate(shards):
+            self.shard_traders.set(len(shard), shard=i)
+
+    async def refresh_traders(self, target_count: int):
+        """Re-screen the leaderboard; the next tick swaps the new list in"""
+        backtest = self.backtest
+        print(f"🔄 Refreshing top {target_count} active traders list...")
+        timings: Dict[str, float] = {}
+        # Workers reuse their activity caches, so this only probes what changed
+        with backtest.phase("trader_refresh", timings):
+            traders = await self.screen(target_count)
+        backtest.last_trader_refresh_seconds = timings["trader_refresh"]
+        if not traders:
+            print("   ⚠️ Failed to refresh traders, using previous list")
+            return
+        self._next_traders = traders
+
+    async def refresh_traders_periodically(self, target_count: int, interval_seconds: float):
+        """Background task: re-screen without delaying collection ticks"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.refresh_traders(target_count)
+            except Exception as e:
+                print(f"Error refreshing traders: {e}")
+
+    async def swap_in_traders(self):
+        """Assign the latest re-screened list, between ticks so each data point uses one list"""
+        if self._next_traders is None:
+            return
+        traders, self._next_traders = self._next_traders, None
+        added = len(set(traders) - set(self.backtest.traders))
+        removed = len(set(self.backtest.traders) - set(traders))
+        await self.assign(traders)
+        self.backtest.traders = traders
+        self.backtest.traders_updated_at = datetime.now()
+        print(f"🔁 Swapped in refreshed traders: {added} added, {removed} dropped")
+
+    # ---- collection ---------------------------------------------------------------------
+
+    async def collect_data_point(self, traders: List[str]) -> Dict:
+        backtest = self.backtest
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        with backtest.phase("prices", timings):
+            prices = await backtest.price_feed.get_prices()
+        with backtest.phase("positions", timings):
+            shards = await self.call_all("collect", [(prices,)] * self.workers)
+
+        with backtest.phase("aggregation", timings):
+            aggregated = merge_aggregates([shard["aggregates"] for shard in shards])
+        failed = [address for shard in shards for address in shard["failed"]]
+        with backtest.phase("position_index", timings):
+            state = {}
+            for shard in shards:
+                state.update(shard["positions"])
+            position_index = expand_state(state, prices)
+        timings["collect"] = time.perf_counter() - start
+
+        for shard in shards:
+            self.shard_seconds.observe(shard["fetch_seconds"] + shard["reduce_seconds"], shard=shard["shard"])
+        self.last_tick = {
+            "workers": self.workers,
+            "shards": [{**{k: shard[k] for k in ("shard", "fetch_seconds", "reduce_seconds", "requests")},
+                        "traders": len(shard["positions"]) + len(shard["failed"])} for shard in shards],
+        }
+
+        data_point = backtest.assemble_data_point(traders, aggregated, position_index, failed, prices,
+                                                  backtest.price_feed.last_fetch_ok, timings)
+        data_point["sharding"] = self.last_tick
+        return data_point
+
+    def budget_warning(self, traders: int, interval_seconds: float) -> Optional[str]:
+        """A message if the rate budget cannot cover one lookup per trader per tick"""
+        # Both budgets as the clients' token buckets pace them (90% of the nominal rate)
+        available = self.worker_weight_per_minute * self.workers * 0.9
+        needed = traders * INFO_REQUEST_WEIGHTS["clearinghouseState"] * 60 / interval_seconds
+        reserved = f" after {self.coordinator_weight_per_minute:,.0f} reserved for prices" if self.shared_ip else ""
+        if needed > available:
+            return (f"⚠️ {traders} traders every {interval_seconds / 60:g} min need {needed:,.0f} weight/min "
+                    f"but the workers have {available:,.0f}{reserved}; ticks will overrun. Give workers "
+                    f"separate IPs (--separate-ips) or track fewer traders")
+        prices_needed = PRICE_FETCH_WEIGHT * 60 / interval_seconds
+        if prices_needed > self.coordinator_weight_per_minute * 0.9:
+            return (f"⚠️ A price fetch every {interval_seconds / 60:g} min needs {prices_needed:,.0f} weight/min "
+                    f"but the coordinator has {self.coordinator_weight_per_minute * 0.9:,.0f}; price fetches "
+                    f"will be throttled")
+        return None
+
+    async def run(self, target_count: int = 2000, duration_hours: float = 24, interval_minutes: float = 5):
+        backtest = self.backtest
+        print(f"Starting sharded collection of the top {target_count} active traders with {self.workers} "
+              f"worker(s), {interval_minutes} minute intervals for {duration_hours} hours")
+        warning = self.budget_warning(target_count, interval_minutes * 60)
+        if warning:
+            print(warning)
+
+        self.start()
+        compaction_task = refresh_task = None
+        try:
+            backtest.traders = await self.screen(target_count)
+            if not backtest.traders:
+                print("Failed to get active traders. Make sure the leaderboard API is running.")
+                return
+            await self.assign(backtest.traders)
+            backtest.traders_updated_at = datetime.now()
+            data_points = backtest.load_existing_data()
+
+            scheduler = FixedRateScheduler(interval_minutes * 60)
+            compaction_task = asyncio.create_task(
+                backtest.compact_periodically(backtest.compaction_interval_seconds))
+            refresh_task = asyncio.create_task(
+                self.refresh_traders_periodically(target_count, backtest.trader_refresh_seconds))
+            async for tick in scheduler.ticks(end_time=time.time() + duration_hours * 3600):
+                print(f"\nCollecting data point {tick['index'] + 1}")
+                if tick["skipped_ticks"]:
+                    print(f"⚠️ Previous tick overran, skipped {tick['skipped_ticks']} tick(s)")
+                    backtest.skipped_ticks.inc(tick["skipped_ticks"])
+                try:
+                    await self.swap_in_traders()
+                    data_point = await self.collect_data_point(list(backtest.traders))
+                    backtest.record_tick(data_points, data_point, scheduler, tick)
+                    slowest = max(self.last_tick["shards"], key=lambda s: s["fetch_seconds"])
+                    print(f"Shards: slowest #{slowest['shard']} {slowest['fetch_seconds']:.2f}s "
+                          f"for {slowest['traders']} traders")
+                except Exception as e:
+                    print(f"Error collecting data point: {e}")
+        finally:
+            for task in (compaction_task, refresh_task):
+                if task is not None:
+                    task.cancel()
+            self.stop()
+            await backtest.client.close()
+
+        print(f"\nCollection finished: {scheduler.ticks_fired} ticks, "
+              f"{scheduler.overruns} overrun(s), {scheduler.ticks_skipped} skipped")
+        backtest.analyze_results(data_points)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Collect data points for thousands of traders across worker processes")
+    parser.add_argument("hours", type=float, nargs="?", default=24)
+    parser.add_argument("--traders", type=int, default=2000, help="top active traders to track")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--interval-minutes", type=float, default=5.0)
+    parser.add_argument("--weight-per-minute", type=float, default=INFO_WEIGHT_PER_MINUTE,
+                        help="Info API budget per IP (default: %(default)s)")
+    parser.add_argument("--coordinator-weight-per-minute", type=float, default=COORDINATOR_WEIGHT_PER_MINUTE,
+                        help="share of the budget reserved for the coordinator's price fetches "
+                             "(default: %(default)s)")
+    parser.add_argument("--separate-ips", action="store_true",
+                        help="workers egress from different IPs, so each gets the full budget")
+    parser.add_argument("--info-url", default=HYPERLIQUID_INFO_API)
+    parser.add_argument("--leaderboard-url", default=LEADERBOARD_API)
+    args = parser.parse_args(argv)
+
+    backtest = HyperliquidBacktest(args.info_url, args.leaderboard_url)
+    collector = ShardedCollector(backtest, args.workers, args.weight_per_minute, shared_ip=not args.separate_ips,
+                                 coordinator_weight_per_minute=args.coordinator_weight_per_minute)
+    asyncio.run(collector.run(args.traders, args.hours, args.interval_minutes))
+
+
+if __name__ == "__main__":
+    main()
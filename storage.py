@@ -0,0 +1,266 @@
+import argparse
+import glob
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DATA_DIR = "data"
+LEGACY_PATTERN = "backtest_data_*.json"
+
+# (segment sequence number, byte offset within that segment)
+StorePosition = Tuple[int, int]
+
+
+class SegmentStore:
+    """Append-only store of data points, one JSON record per line, in rotated segment files.
+
+    Each tick appends a single line to the active segment and fsyncs it, so a crash loses at
+    most the tick being written. Segments rotate once they reach `max_segment_records` records
+    or `max_segment_bytes` bytes. A torn trailing line left by a crash mid-write is truncated
+    the next time the store is opened for writing.
+    """
+
+    SEGMENT_RE = re.compile(r"^segment_(\d{8})\.jsonl$")
+
+    def __init__(self, directory: str = DATA_DIR, max_segment_records: int = 2016,
+                 max_segment_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_segment_records = max_segment_records  # 2016 = one week at 5-minute ticks
+        self.max_segment_bytes = max_segment_bytes
+        self._active_seq: Optional[int] = None
+        self._active_records = 0
+        self._active_bytes = 0
+        self.last_append_bytes = 0  # bytes written by the most recent append
+
+    # ---- layout -------------------------------------------------------------------------
+
+    def segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"segment_{seq:08d}.jsonl")
+
+    def segments(self) -> List[int]:
+        """Sequence numbers of all segments, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        seqs = []
+        for name in os.listdir(self.directory):
+            match = self.SEGMENT_RE.match(name)
+            if match:
+                seqs.append(int(match.group(1)))
+        return sorted(seqs)
+
+    def total_bytes(self) -> int:
+        return sum(os.path.getsize(self.segment_path(seq)) for seq in self.segments())
+
+    def is_empty(self) -> bool:
+        return all(os.path.getsize(self.segment_path(seq)) == 0 for seq in self.segments())
+
+    # ---- writing ------------------------------------------------------------------------
+
+    def _recover_segment(self, seq: int) -> Tuple[int, int]:
+        """Truncate a torn trailing line; return (record count, byte size) of the segment"""
+        path = self.segment_path(seq)
+        with open(path, "rb") as f:
+            content = f.read()
+
+        valid_end = content.rfind(b"\n") + 1
+        if valid_end < len(content):
+            print(f"⚠️ Truncating {len(content) - valid_end} bytes of incomplete record from {path}")
+            with open(path, "r+b") as f:
+                f.truncate(valid_end)
+                f.flush()
+                os.fsync(f.fileno())
+
+        return content.count(b"\n", 0, valid_end), valid_end
+
+    def _open_active(self):
+        os.makedirs(self.directory, exist_ok=True)
+        seqs = self.segments()
+        if seqs:
+            self._active_seq = seqs[-1]
+            self._active_records, self._active_bytes = self._recover_segment(self._active_seq)
+        else:
+            self._active_seq = 1
+            self._active_records, self._active_bytes = 0, 0
+
+    def _needs_rotation(self) -> bool:
+        return (self._active_records >= self.max_segment_records
+                or self._active_bytes >= self.max_segment_bytes)
+
+    def append(self, record: Dict):
+        """Durably append one record"""
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict]):
+        """Append several records with a single fsync per touched segment"""
+        if self._active_seq is None:
+            self._open_active()
+
+        pending = list(records)
+        self.last_append_bytes = 0
+        while pending:
+            if self._needs_rotation():
+                self._active_seq += 1
+                self._active_records, self._active_bytes = 0, 0
+
+            room = self.max_segment_records - self._active_records
+            batch, pending = pending[:room], pending[room:]
+            lines = b"".join(
+                json.dumps(record, default=str, separators=(",", ":")).encode("utf-8") + b"\n"
+                for record in batch
+            )
+            with open(self.segment_path(self._active_seq), "ab") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._active_records += len(batch)
+            self._active_bytes += len(lines)
+            self.last_append_bytes += len(lines)
+
+    # ---- reading ------------------------------------------------------------------------
+
+    def _read_segment(self, seq: int, offset: int = 0) -> Tuple[List[Dict], int]:
+        """Read complete records from `offset`; return them with the offset after the last one"""
+        path = self.segment_path(seq)
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                content = f.read()
+        except FileNotFoundError:
+            return [], offset
+
+        # Ignore a trailing partial line that the writer has not finished yet
+        complete = content.rfind(b"\n") + 1
+        records = []
+        for line in content[:complete].splitlines():
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping corrupt record in {path}")
+        return records, offset + complete
+
+    def iter_records(self, segments: Optional[Iterable[int]] = None) -> Iterator[Dict]:
+        """Iterate over all records (or those of `segments`), oldest first"""
+        for seq in self.segments() if segments is None else segments:
+            records, _ = self._read_segment(seq)
+            yield from records
+
+    def first_record(self, seq: int) -> Optional[Dict]:
+        """A segment's first record, reading only its first line (None if empty or unreadable)"""
+        try:
+            with open(self.segment_path(seq), "rb") as f:
+                line = f.readline()
+        except FileNotFoundError:
+            return None
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
+
+    def read_all(self) -> List[Dict]:
+        return list(self.iter_records())
+
+    def read_since(self, position: Optional[StorePosition] = None) -> Tuple[List[Dict], StorePosition]:
+        """Read records appended after `position` (or everything if None).
+
+        Returns the new records and the position to pass on the next call.
+        """
+        start_seq, start_offset = position if position else (0, 0)
+        records: List[Dict] = []
+        end = (start_seq, start_offset)
+        for seq in self.segments():
+            if seq < start_seq:
+                continue
+            offset = start_offset if seq == start_seq else 0
+            new_records, new_offset = self._read_segment(seq, offset)
+            records.extend(new_records)
+            end = (seq, new_offset)
+        return records, end
+
+    def end_position(self) -> StorePosition:
+        """Position just after the last complete record"""
+        seqs = self.segments()
+        if not seqs:
+            return (0, 0)
+        _, offset = self._read_segment(seqs[-1])
+        return (seqs[-1], offset)
+
+    def read_tail(self, n: int) -> List[Dict]:
+        """Read the last `n` records, touching only the newest segments"""
+        if n <= 0:
+            return []
+        tail: List[Dict] = []
+        for seq in reversed(self.segments()):
+            records, _ = self._read_segment(seq)
+            tail = records + tail
+            if len(tail) >= n:
+                break
+        return tail[-n:]
+
+    def last_record(self) -> Optional[Dict]:
+        tail = self.read_tail(1)
+        return tail[0] if tail else None
+
+
+def convert_legacy_json(store: SegmentStore, files: Optional[List[str]] = None) -> int:
+    """Import records from legacy `backtest_data_*.json` files into the store.
+
+    Each legacy backup holds the full history up to its save time, so records are
+    de-duplicated by timestamp and only those newer than the store's last record
+    are appended. Returns the number of records imported.
+    """
+    if files is None:
+        files = sorted(glob.glob(LEGACY_PATTERN))
+
+    by_timestamp: Dict[str, Dict] = {}
+    for path in files:
+        try:
+            with open(path, "r") as f:
+                records = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not read {path}: {e}")
+            continue
+        for record in records:
+            by_timestamp[str(record["timestamp"])] = record
+
+    last = store.last_record()
+    last_timestamp = str(last["timestamp"]) if last else ""
+    new_records = [by_timestamp[ts] for ts in sorted(by_timestamp) if ts > last_timestamp]
+
+    if new_records:
+        store.append_many(new_records)
+    print(f"Imported {len(new_records)} data points from {len(files)} legacy file(s) into {store.directory}/")
+    return len(new_records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the append-only data point store")
+    parser.add_argument("--dir", default=DATA_DIR, help="store directory (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="import legacy backtest_data_*.json files")
+    convert.add_argument("files", nargs="*", help=f"files to import (default: {LEGACY_PATTERN})")
+
+    subparsers.add_parser("info", help="show segment and record counts")
+
+    args = parser.parse_args()
+    store = SegmentStore(args.dir)
+
+    if args.command == "convert":
+        convert_legacy_json(store, args.files or None)
+    elif args.command == "info":
+        total = 0
+        for seq in store.segments():
+            records, size = store._read_segment(seq)
+            total += len(records)
+            print(f"  {os.path.basename(store.segment_path(seq))}: {len(records)} records, {size / 1024:.1f} KiB")
+        print(f"Total: {total} records in {len(store.segments())} segment(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 import requests
 import json
+import os
+
+# Point at a local api_server.py (e.g. one backed by fake_hyperliquid.py) with API_URL
+API_URL = os.environ.get("API_URL", "http://167.172.74.216:8000")
 
 # Test the API endpoints
 print("Testing API endpoints...")
 
 # Test traders endpoint
 print("\n1. Testing /api/traders endpoint:")
-response = requests.get("http://167.172.74.216:8000/api/traders")
+response = requests.get(f"{API_URL}/api/traders")
 if response.ok:
     traders = response.json()
     print(f"   - Found {len(traders)} traders")
@@ -26,13 +30,13 @@ else:
 
 # Test current data structure
 print("\n2. Testing /api/current-data endpoint:")
-response = requests.get("http://167.172.74.216:8000/api/current-data")
+response = requests.get(f"{API_URL}/api/current-data")
 if response.ok:
     data = response.json()
     print(f"   - Timestamp: {data.get('timestamp')}")
-    print(f"   - Has trader_positions: {'trader_positions' in data}")
-    if 'trader_positions' in data:
-        positions = data['trader_positions']
+    print(f"   - Has position_index: {'position_index' in data}")
+    if 'position_index' in data:
+        positions = data['position_index']
         print(f"   - Number of traders with positions: {len(positions)}")
         # Show sample position
         for addr, pos in list(positions.items())[:1]:
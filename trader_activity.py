@@ -0,0 +1,84 @@
+import time
+from typing import Dict, List, Optional
+
+
+class TraderActivityCache:
+    """When each address was last seen with and without open positions.
+
+    Collection ticks feed every successful positions fetch in, so the tracked traders' verdicts
+    are never older than one tick. A trader refresh only has to look up addresses without a
+    usable verdict: newcomers to the leaderboard window, active verdicts older than
+    `active_ttl_seconds`, and inactive addresses whose backoff has run out. The backoff starts
+    at `inactive_backoff_seconds` and doubles with every consecutive inactive check, up to
+    `max_inactive_backoff_seconds`, so long-dormant accounts are rarely looked up again.
+    """
+
+    def __init__(self, active_ttl_seconds: float = 900.0, inactive_backoff_seconds: float = 3600.0,
+                 max_inactive_backoff_seconds: float = 6 * 3600.0, clock=time.time):
+        self.active_ttl_seconds = active_ttl_seconds
+        self.inactive_backoff_seconds = inactive_backoff_seconds
+        self.max_inactive_backoff_seconds = max_inactive_backoff_seconds
+        self.clock = clock
+        # address (lowercase) -> {"active", "checked_at", "last_active", "last_inactive", "inactive_streak"}
+        self._entries: Dict[str, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(self, address: str, active: bool, at: Optional[float] = None):
+        """Store the verdict of a successful positions fetch"""
+        at = self.clock() if at is None else at
+        key = address.lower()
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = {"last_active": None, "last_inactive": None, "inactive_streak": 0}
+        if entry.get("checked_at") is not None and at < entry["checked_at"]:
+            return  # an older result finishing late must not overwrite a newer one
+        entry["active"] = active
+        entry["checked_at"] = at
+        if active:
+            entry["last_active"] = at
+            entry["inactive_streak"] = 0
+        else:
+            entry["last_inactive"] = at
+            entry["inactive_streak"] += 1
+
+    def record_positions(self, positions: List[Dict], is_active, at: Optional[float] = None):
+        """Record every successful fetch of a tick; failed fetches leave the previous verdict"""
+        at = self.clock() if at is None else at
+        for p in positions:
+            if p.get("ok"):
+                self.record(p["address"], is_active(p), at)
+
+    def backoff_seconds(self, address: str) -> float:
+        entry = self._entries.get(address.lower())
+        streak = entry["inactive_streak"] if entry else 0
+        if streak <= 0:
+            return 0.0
+        return min(self.inactive_backoff_seconds * 2 ** (streak - 1), self.max_inactive_backoff_seconds)
+
+    def verdict(self, address: str, now: Optional[float] = None) -> Optional[bool]:
+        """True/False while the cached verdict is still usable, None if the address must be checked"""
+        entry = self._entries.get(address.lower())
+        if entry is None:
+            return None
+        age = (self.clock() if now is None else now) - entry["checked_at"]
+        if entry["active"]:
+            return True if age < self.active_ttl_seconds else None
+        return False if age < self.backoff_seconds(address) else None
+
+    def forget(self, keep: List[str]):
+        """Drop entries for addresses that are no longer in `keep` (e.g. left the leaderboard window)"""
+        keep_keys = {address.lower() for address in keep}
+        for key in [key for key in self._entries if key not in keep_keys]:
+            del self._entries[key]
+
+    def stats(self, now: Optional[float] = None) -> Dict:
+        now = self.clock() if now is None else now
+        verdicts = [self.verdict(key, now) for key in self._entries]
+        return {
+            "addresses": len(self._entries),
+            "active": sum(1 for v in verdicts if v is True),
+            "inactive": sum(1 for v in verdicts if v is False),
+            "stale": sum(1 for v in verdicts if v is None),
+        }
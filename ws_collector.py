@@ -0,0 +1,540 @@
+"""WebSocket collector: keeps tracked traders' positions current from fill events.
+
+Instead of polling clearinghouseState for every trader each tick, the collector subscribes
+to `userFills` for every tracked address (spread over a pool of connections) and `allMids`
+for prices, applies fills to an in-memory position book and writes a snapshot of the book
+at any cadence. A periodic REST poll reconciles the book, correcting fills missed during
+reconnects or before a subscription was confirmed.
+
+The public API limits user-specific subscriptions per IP, so large trader lists need
+several egress IPs. Traders whose subscription the server has not confirmed (rejected past
+the limit, or not yet resubscribed after a reconnect) are polled over REST each snapshot and
+listed under `fetch_status.unsubscribed_traders`.
+
+Usage:
+    python ws_collector.py 24 --snapshot-seconds 30 --reconcile-minutes 5
+    # against the local stand-in:
+    python fake_hyperliquid.py --tick-seconds 2 &
+    HYPERLIQUID_INFO_API=http://127.0.0.1:8099/info LEADERBOARD_API=http://127.0.0.1:8099/leaderboard \\
+        HYPERLIQUID_WS_API=ws://127.0.0.1:8099/ws python ws_collector.py 1 --snapshot-seconds 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+import aiohttp
+
+from backtest import HyperliquidBacktest
+from hl_client import HYPERLIQUID_WS_API
+from scheduler import FixedRateScheduler
+
+
+class PositionBook:
+    """Positions of tracked traders, maintained from fills and seeded/reconciled from REST.
+
+    Each fill carries the position size before it (`startPosition`), so applying it sets the
+    size exactly rather than accumulating deltas; a duplicated or replayed fill cannot drift
+    the book. Fills older than a trader's last REST snapshot are ignored.
+    """
+
+    def __init__(self, size_tolerance: float = 1e-5):
+        self.size_tolerance = size_tolerance
+        self.positions: Dict[str, Dict[str, Dict]] = {}  # address -> coin -> {size, entry_px, leverage}
+        self.as_of: Dict[str, int] = {}  # address -> epoch ms of the REST snapshot it was seeded from
+        self.mids: Dict[str, float] = {}
+        self.mids_updated_at: Optional[float] = None
+        self.fills_applied = 0
+        self.fills_ignored = 0
+
+    def seed(self, address: str, asset_positions: List[Dict], as_of_ms: int) -> int:
+        """Replace a trader's positions with a REST result; returns how many coins disagreed"""
+        fresh = {}
+        for entry in asset_positions:
+            position = entry["position"]
+            size = float(position["szi"])
+            if size == 0.0:
+                continue
+            leverage = position.get("leverage") or {}
+            fresh[position["coin"]] = {
+                "size": size,
+                "entry_px": float(position["entryPx"]) if position.get("entryPx") is not None else None,
+                "leverage": leverage.get("value") if isinstance(leverage, dict) else leverage,
+            }
+
+        corrections = 0
+        if address in self.positions:
+            held = self.positions[address]
+            for coin in set(held) | set(fresh):
+                old = held.get(coin, {}).get("size", 0.0)
+                new = fresh.get(coin, {}).get("size", 0.0)
+                if abs(old - new) > max(self.size_tolerance, 1e-6 * abs(new)):
+                    corrections += 1
+        self.positions[address] = fresh
+        self.as_of[address] = as_of_ms
+        return corrections
+
+    def apply_fill(self, address: str, fill: Dict) -> bool:
+        if address not in self.positions or fill.get("time", 0) < self.as_of.get(address, 0):
+            self.fills_ignored += 1
+            return False
+
+        coin = fill["coin"]
+        start, size, price = float(fill["startPosition"]), float(fill["sz"]), float(fill["px"])
+        end = start + size if fill["side"] == "B" else start - size
+        held = self.positions[address]
+        current = held.get(coin)
+
+        if abs(end) < 1e-9:
+            held.pop(coin, None)
+        else:
+            if current is None or current["entry_px"] is None or (current["size"] > 0) != (end > 0):
+                entry_px = price  # new position or flipped side
+            elif abs(end) > abs(current["size"]):
+                added = abs(end) - abs(current["size"])
+                entry_px = (current["entry_px"] * abs(current["size"]) + price * added) / abs(end)
+            else:
+                entry_px = current["entry_px"]  # reducing keeps the entry price
+            held[coin] = {"size": end, "entry_px": entry_px,
+                          "leverage": current["leverage"] if current else None}
+        self.fills_applied += 1
+        return True
+
+    def update_mids(self, mids: Dict[str, str]):
+        for coin, price in mids.items():
+            try:
+                self.mids[coin] = float(price)
+            except (TypeError, ValueError):
+                continue
+        self.mids_updated_at = time.monotonic()
+
+    def drop(self, addresses: Set[str]):
+        for address in addresses:
+            self.positions.pop(address, None)
+            self.as_of.pop(address, None)
+
+    def snapshot(self, addresses: List[str]) -> List[Dict]:
+        """Positions in the same shape as HyperliquidBacktest.get_user_positions results"""
+        now = datetime.now()
+        snapshot = []
+        for address in addresses:
+            held = self.positions.get(address)
+            positions = [
+                {"type": "oneWay", "position": {
+                    "coin": coin, "szi": position["size"], "entryPx": position["entry_px"],
+                    "leverage": {"value": position["leverage"]} if position["leverage"] is not None else None,
+                }}
+                for coin, position in (held or {}).items()
+            ]
+            snapshot.append({"address": address, "positions": positions, "timestamp": now, "ok": held is not None})
+        return snapshot
+
+
+class _Connection:
+    """One WebSocket connection carrying a subset of the pool's subscriptions"""
+
+    def __init__(self, pool: "SubscriptionPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.users: Set[str] = set()
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.task: Optional[asyncio.Task] = None
+        self.connects = 0
+        self.subscribed = asyncio.Event()  # set once the current connection has sent its subscriptions
+
+    @property
+    def carries_mids(self) -> bool:
+        return self.index == 0
+
+    async def send(self, method: str, subscription: Optional[Dict] = None):
+        if self.ws is None or self.ws.closed:
+            return  # (Re)subscribed from self.users on the next connect
+        message = {"method": method}
+        if subscription is not None:
+            message["subscription"] = subscription
+        await self.ws.send_str(json.dumps(message))
+
+    async def run(self):
+        attempt = 0
+        while True:
+            try:
+                async with self.pool.session.ws_connect(self.pool.url, heartbeat=None) as ws:
+                    self.ws = ws
+                    self.connects += 1
+                    if self.connects > 1:
+                        self.pool.reconnects += 1
+                        # Fills may have been missed while disconnected
+                        self.pool.on_resubscribe(set(self.users))
+                    attempt = 0
+                    if self.carries_mids:
+                        await self.send("subscribe", {"type": "allMids"})
+                    for user in list(self.users):
+                        await self.send("subscribe", {"type": "userFills", "user": user})
+                    self.subscribed.set()
+                    await self._read(ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WebSocket {self.index} error: {type(e).__name__}: {e}")
+            finally:
+                self.ws = None
+                self.subscribed.clear()
+                # Subscriptions die with the connection; users are unconfirmed until resubscribed
+                self.pool.confirmed -= self.users
+            attempt += 1
+            await asyncio.sleep(random.uniform(0, min(30.0, 0.5 * 2 ** attempt)))
+
+    async def _read(self, ws: aiohttp.ClientWebSocketResponse):
+        ping_seconds = self.pool.ping_seconds
+        while True:
+            try:
+                msg = await ws.receive(timeout=ping_seconds)
+            except asyncio.TimeoutError:
+                # Idle: the server drops connections silent for 60s, so keep it alive
+                await self.send("ping")
+                msg = await ws.receive(timeout=ping_seconds)
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                self.pool.messages += 1
+                message = json.loads(msg.data)
+                self.pool.handle_control(self, message)
+                self.pool.on_message(message)
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                return
+
+
+class SubscriptionPool:
+    """userFills subscriptions spread over pooled connections, plus allMids on the first one.
+
+    Addresses keep their connection when the tracked list changes; only the difference is
+    (un)subscribed. `on_resubscribe(addresses)` is called after a reconnect so the caller can
+    reconcile traders whose fills may have been missed.
+
+    A user counts as covered only once the server confirms its subscription. Rejected
+    subscriptions (e.g. past the per-IP user limit) come back as `error` messages that do not
+    name the user, so anything left unconfirmed is reported by `unconfirmed` for the caller
+    to poll over REST instead.
+    """
+
+    def __init__(self, url: str, on_message: Callable[[Dict], None],
+                 on_resubscribe: Callable[[Set[str]], None], users_per_connection: int = 50,
+                 ping_seconds: float = 30.0):
+        self.url = url
+        self.on_message = on_message
+        self.on_resubscribe = on_resubscribe
+        self.users_per_connection = users_per_connection
+        self.ping_seconds = ping_seconds
+        self.connections: List[_Connection] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.messages = 0
+        self.reconnects = 0
+        self.confirmed: Set[str] = set()
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    def _add_connection(self) -> _Connection:
+        connection = _Connection(self, len(self.connections))
+        connection.task = asyncio.create_task(connection.run())
+        self.connections.append(connection)
+        return connection
+
+    def handle_control(self, connection: _Connection, message: Dict):
+        """Track subscription confirmations and errors"""
+        channel = message.get("channel")
+        if channel == "subscriptionResponse":
+            data = message.get("data") or {}
+            subscription = data.get("subscription") or {}
+            user = subscription.get("user", "").lower()
+            if subscription.get("type") == "userFills" and user in connection.users:
+                if data.get("method") == "subscribe":
+                    self.confirmed.add(user)
+                else:
+                    self.confirmed.discard(user)
+        elif channel == "error":
+            self.errors += 1
+            if message.get("data") != self.last_error:
+                print(f"⚠️ WebSocket {connection.index} subscription error: {message.get('data')}")
+            self.last_error = message.get("data")
+
+    def unconfirmed(self, addresses: List[str]) -> Set[str]:
+        """Addresses whose userFills subscription the server has not confirmed"""
+        return {address.lower() for address in addresses} - self.confirmed
+
+    async def set_users(self, addresses: List[str]):
+        wanted = {address.lower() for address in addresses}
+        if not self.connections:
+            self._add_connection()  # allMids even before any user is tracked
+
+        for connection in self.connections:
+            for user in connection.users - wanted:
+                connection.users.discard(user)
+                self.confirmed.discard(user)
+                await connection.send("unsubscribe", {"type": "userFills", "user": user})
+
+        assigned = set().union(*(c.users for c in self.connections))
+        for user in sorted(wanted - assigned):
+            connection = next((c for c in self.connections if len(c.users) < self.users_per_connection), None)
+            if connection is None:
+                connection = self._add_connection()
+            connection.users.add(user)
+            await connection.send("subscribe", {"type": "userFills", "user": user})
+
+    async def wait_subscribed(self, timeout: float = 10.0) -> bool:
+        """Wait until every connection is up and every user confirmed; False on timeout"""
+        async def confirmed():
+            await asyncio.gather(*(c.subscribed.wait() for c in self.connections))
+            users = set().union(*(c.users for c in self.connections))
+            while users - self.confirmed:
+                await asyncio.sleep(0.05)
+
+        try:
+            await asyncio.wait_for(confirmed(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self):
+        for connection in self.connections:
+            if connection.task is not None:
+                connection.task.cancel()
+        await asyncio.gather(*(c.task for c in self.connections if c.task), return_exceptions=True)
+        self.connections = []
+        if self._session is not None:
+            await self._session.close()
+
+    def stats(self) -> Dict:
+        return {
+            "connections": len(self.connections),
+            "connected": sum(1 for c in self.connections if c.ws is not None and not c.ws.closed),
+            "subscriptions": sum(len(c.users) for c in self.connections) + (1 if self.connections else 0),
+            "confirmed_users": len(self.confirmed),
+            "subscription_errors": self.errors,
+            "last_error": self.last_error,
+            "messages": self.messages,
+            "reconnects": self.reconnects,
+        }
+
+
+class WebSocketCollector:
+    """Collector mode that snapshots a fill-driven position book instead of polling every trader.
+
+    Reuses HyperliquidBacktest for screening, REST lookups, aggregation, storage and metrics,
+    so its data points have the same shape as the polling collector's, plus a `ws` section.
+    """
+
+    def __init__(self, backtest: HyperliquidBacktest, ws_url: str = HYPERLIQUID_WS_API,
+                 snapshot_seconds: float = 60.0, reconcile_seconds: float = 300.0,
+                 users_per_connection: int = 50, max_mids_age: float = 60.0):
+        self.backtest = backtest
+        self.snapshot_seconds = snapshot_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self.max_mids_age = max_mids_age
+        self.book = PositionBook()
+        self.pool = SubscriptionPool(ws_url, self.handle_message, self.mark_stale, users_per_connection)
+        self._stale: Set[str] = set()
+        # address -> fills received while a REST lookup for it is in flight, replayed after the seed
+        self._reconciling: Dict[str, List[Dict]] = {}
+        self.last_reconcile: Dict = {}
+
+        metrics = backtest.metrics
+        self.ws_messages = metrics.counter("ws_messages_total", "WebSocket messages received", ("channel",))
+        self.fill_count = metrics.counter("ws_fills_total", "Fills received", ("applied",))
+        self.corrections = metrics.counter(
+            "ws_reconcile_corrections_total", "Positions the REST reconcile found out of date")
+        self.connections_gauge = metrics.gauge("ws_connections", "Open WebSocket connections")
+
+    def handle_message(self, message: Dict):
+        channel = message.get("channel")
+        self.ws_messages.inc(channel=channel)
+        data = message.get("data") or {}
+        if channel == "allMids":
+            self.book.update_mids(data.get("mids", {}))
+        elif channel == "userFills" and not data.get("isSnapshot"):
+            # Snapshots replay history the REST seed already reflects
+            user = data.get("user", "").lower()
+            fills = data.get("fills", [])
+            if user in self._reconciling:
+                self._reconciling[user].extend(fills)
+            for fill in fills:
+                self.fill_count.inc(applied=self.book.apply_fill(user, fill))
+
+    def mark_stale(self, addresses: Set[str]):
+        self._stale |= addresses
+
+    async def reconcile(self, addresses: Optional[List[str]] = None) -> Dict:
+        """Re-seed traders from clearinghouseState and count positions the book had wrong"""
+        addresses = [a.lower() for a in (addresses if addresses is not None else self.backtest.traders)]
+        timings: Dict[str, float] = {}
+        # Fills that arrive while the lookups run are buffered and re-applied on top of the seed:
+        # the REST snapshot may predate them. Fills carry their start size, so re-applying one
+        # the snapshot already reflects leaves the position unchanged.
+        owned = [a for a in addresses if a not in self._reconciling]
+        for address in owned:
+            self._reconciling[address] = []
+        as_of = int(time.time() * 1000)
+        corrections = failed = replayed = 0
+        try:
+            with self.backtest.phase("reconcile", timings):
+                results = await self.backtest.get_all_positions(addresses)
+            for result in results:
+                address = result["address"]
+                if result["ok"]:
+                    corrections += self.book.seed(address, result["positions"], as_of)
+                    for fill in self._reconciling.get(address, []):
+                        if fill.get("time", 0) >= as_of and self.book.apply_fill(address, fill):
+                            replayed += 1
+                else:
+                    failed += 1
+                    self._stale.add(address)
+        finally:
+            for address in owned:
+                self._reconciling.pop(address, None)
+        self.corrections.inc(corrections)
+        self.last_reconcile = {"at": datetime.now(), "traders": len(addresses), "failed": failed,
+                               "corrections": corrections, "fills_replayed": replayed,
+                               "seconds": timings["reconcile"]}
+        return self.last_reconcile
+
+    async def reconcile_periodically(self):
+        next_full = time.monotonic() + self.reconcile_seconds
+        while True:
+            await asyncio.sleep(min(5.0, self.reconcile_seconds))
+            try:
+                if time.monotonic() >= next_full:
+                    next_full = time.monotonic() + self.reconcile_seconds
+                    self._stale.clear()
+                    result = await self.reconcile()
+                    print(f"🔁 Reconciled {result['traders']} traders in {result['seconds']:.1f}s: "
+                          f"{result['corrections']} correction(s), {result['failed']} failed")
+                elif self._stale:
+                    stale, self._stale = list(self._stale), set()
+                    await self.reconcile(stale)
+            except Exception as e:
+                print(f"Error reconciling positions: {e}")
+
+    async def refresh_traders_periodically(self):
+        while True:
+            await asyncio.sleep(self.backtest.trader_refresh_seconds)
+            try:
+                old = {a.lower() for a in self.backtest.traders}
+                await self.backtest.refresh_traders()
+                # Keyed lowercase like the book and the subscriptions, as at startup
+                new = self.backtest.traders = [a.lower() for a in self.backtest.traders]
+                await self.pool.set_users(new)
+                if not await self.pool.wait_subscribed():
+                    print(f"⚠️ {len(self.pool.unconfirmed(new))} trader subscription(s) not confirmed; "
+                          f"polling them over REST each snapshot")
+                self.book.drop(old - set(new))
+                # Subscribe first, then seed, so no fill falls between the two
+                await self.reconcile([a for a in new if a not in old])
+            except Exception as e:
+                print(f"Error refreshing traders: {e}")
+
+    async def snapshot_data_point(self, traders: List[str]) -> Dict:
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        with self.backtest.phase("prices", timings):
+            mids_age = (time.monotonic() - self.book.mids_updated_at
+                        if self.book.mids_updated_at is not None else None)
+            if mids_age is not None and mids_age <= self.max_mids_age:
+                prices, prices_ok = dict(self.book.mids), True
+            else:
+                # No recent allMids push: fall back to the (cached) REST price feed
+                prices = await self.backtest.price_feed.get_prices()
+                prices_ok = self.backtest.price_feed.last_fetch_ok
+        with self.backtest.phase("positions", timings):
+            positions = self.book.snapshot(traders)
+            # No confirmed subscription means no fills: poll those traders like the REST collector
+            unconfirmed = self.pool.unconfirmed(traders)
+            if unconfirmed:
+                as_of = int(time.time() * 1000)
+                polled = {r["address"]: r for r in await self.backtest.get_all_positions(sorted(unconfirmed))}
+                for address, result in polled.items():
+                    if result["ok"]:
+                        self.book.seed(address, result["positions"], as_of)
+                positions = [polled.get(p["address"].lower(), p) for p in positions]
+
+        data_point = self.backtest.build_data_point(traders, positions, prices, prices_ok, timings, start)
+        data_point["fetch_status"]["unsubscribed_traders"] = sorted(unconfirmed)
+        pool_stats = self.pool.stats()
+        self.connections_gauge.set(pool_stats["connected"])
+        data_point["source"] = "websocket"
+        data_point["ws"] = {
+            **pool_stats,
+            "fills_applied": self.book.fills_applied,
+            "fills_ignored": self.book.fills_ignored,
+            "unconfirmed_users": len(unconfirmed),
+            "polled_users": sum(1 for address in unconfirmed if polled[address]["ok"]),
+            "mids_age_seconds": mids_age,
+            "last_reconcile": self.last_reconcile,
+        }
+        return data_point
+
+    async def run(self, duration_hours: float = 24):
+        backtest = self.backtest
+        print(f"Starting WebSocket collector for {duration_hours} hours, snapshots every {self.snapshot_seconds}s, "
+              f"REST reconcile every {self.reconcile_seconds / 60:.0f} minutes")
+
+        backtest.traders = [a.lower() for a in await backtest.get_top_traders_with_positions(100)]
+        if not backtest.traders:
+            print("Failed to get active traders. Make sure the leaderboard API is running.")
+            return
+        backtest.traders_updated_at = datetime.now()
+        data_points = backtest.load_existing_data()
+
+        # Subscribe first, then seed from REST, so no fill falls between the two
+        await self.pool.set_users(backtest.traders)
+        if not await self.pool.wait_subscribed():
+            print(f"⚠️ {len(self.pool.unconfirmed(backtest.traders))} trader subscription(s) not confirmed; "
+                  f"polling them over REST each snapshot")
+        result = await self.reconcile()
+        print(f"📡 Subscribed to {len(backtest.traders)} traders over {len(self.pool.connections)} connection(s); "
+              f"seeded {result['traders'] - result['failed']} from REST")
+
+        scheduler = FixedRateScheduler(self.snapshot_seconds)
+        tasks = [asyncio.create_task(self.reconcile_periodically()),
+                 asyncio.create_task(self.refresh_traders_periodically()),
+                 asyncio.create_task(backtest.compact_periodically(backtest.compaction_interval_seconds))]
+        try:
+            async for tick in scheduler.ticks(end_time=time.time() + duration_hours * 3600):
+                print(f"\nSnapshot {tick['index'] + 1}")
+                try:
+                    data_point = await self.snapshot_data_point(list(backtest.traders))
+                    backtest.record_tick(data_points, data_point, scheduler, tick)
+                except Exception as e:
+                    print(f"Error collecting data point: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.pool.close()
+            await backtest.client.close()
+
+        print(f"\nCollection finished: {scheduler.ticks_fired} snapshots, {self.book.fills_applied} fills applied, "
+              f"{self.pool.reconnects} reconnect(s)")
+        backtest.analyze_results(data_points)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Collect position snapshots from WebSocket fill subscriptions")
+    parser.add_argument("hours", type=float, nargs="?", default=24)
+    parser.add_argument("--snapshot-seconds", type=float, default=60.0, help="data point cadence (default: %(default)s)")
+    parser.add_argument("--reconcile-minutes", type=float, default=5.0, help="full REST reconcile interval")
+    parser.add_argument("--users-per-connection", type=int, default=50)
+    parser.add_argument("--ws-url", default=HYPERLIQUID_WS_API)
+    args = parser.parse_args(argv)
+
+    collector = WebSocketCollector(HyperliquidBacktest(), args.ws_url, args.snapshot_seconds,
+                                   args.reconcile_minutes * 60, args.users_per_connection)
+    asyncio.run(collector.run(args.hours))
+
+
+if __name__ == "__main__":
+    main()